@@ -1290,32 +1290,40 @@ export class AIPortfolioGenerator {
       
       console.log('📦 Repository name:', repoName);
       
-      // Prepare files for deployment
-      const files = [
-        {
-          path: 'index.html',
-          content: this.portfolioHtml,
-          encoding: 'utf-8'
-        }
-      ];
-      
-      console.log('📤 Deploying to GitHub Pages...');
-      
-      // Deploy using one-click deploy endpoint
-      const deployResponse = await apiService.deployToGithub({
+      const deployData = {
         repo: repoName,
         branch: 'main',
         path: '/',
-        files: files,
         message: 'Deploy portfolio via SkillSlate'
-      });
+      };
+      
+      if (this.portfolioId) {
+        // Saved portfolio - the server builds the site files from it
+        deployData.portfolioId = this.portfolioId;
+      } else {
+        deployData.files = [
+          {
+            path: 'index.html',
+            content: this.portfolioHtml,
+            encoding: 'utf-8'
+          }
+        ];
+      }
       
-      if (!deployResponse.message || deployResponse.message !== 'Deployed') {
+      console.log('📤 Deploying to GitHub Pages...');
+      
+      // Deploy using one-click deploy endpoint (queued; the URL is returned right away)
+      const deployResponse = await apiService.deployToGithub(deployData);
+      
+      if (!deployResponse.requestId) {
         throw new Error(deployResponse.message || 'Deployment failed');
       }
       
+      // Only report success once the job is live
+      const deployResult = await apiService.waitForDeploy(deployResponse.requestId);
+      
       console.log('✅ Deployment successful!');
-      console.log('🌐 Portfolio URL:', deployResponse.url);
+      console.log('🌐 Portfolio URL:', deployResult.url || deployResponse.url);
       
       // Hide loading notification
       notifications.hideLoading();
@@ -1324,7 +1332,7 @@ export class AIPortfolioGenerator {
       // Update portfolio with deployment info
       await apiService.updatePortfolio(this.portfolioId, {
         status: 'deployed',
-        url: deployResponse.url,
+        url: deployResult.url || deployResponse.url,
         githubRepo: repoName
       });
       
@@ -1333,7 +1341,7 @@ export class AIPortfolioGenerator {
       
       // Update state to complete
       this.step = 'complete';
-      this.deploymentUrl = deployResponse.url;
+      this.deploymentUrl = deployResult.url || deployResponse.url;
       window.app.renderPage(this.render());
       
       // Don't auto-navigate - let user see the success page and deployment URL
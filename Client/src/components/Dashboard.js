@@ -452,6 +452,10 @@ export class Dashboard {
     try {
       notifications.showLoading('Deploying portfolio...');
       const response = await apiService.deployPortfolio(portfolioId);
+      if (response.success) {
+        // Queued; wait for the job to go live before reporting success
+        await apiService.waitForDeploy(response.requestId);
+      }
       notifications.hideLoading();
       
       if (response.success) {
@@ -464,7 +468,7 @@ export class Dashboard {
     } catch (error) {
       console.error('Error deploying portfolio:', error);
       notifications.hideLoading();
-      notifications.error('Failed to deploy portfolio. Please try again.');
+      notifications.error(`Failed to deploy portfolio: ${error.message || 'Please try again.'}`);
     }
   }
 
@@ -219,6 +219,27 @@ class ApiService {
         });
     }
 
+    async getDeployStatus(deployId) {
+        return this.request(`/github/deploy/${deployId}`);
+    }
+
+    // Deploys are queued (202); poll until the job is live or failed
+    async waitForDeploy(deployId, { intervalMs = 2000, timeoutMs = 10 * 60 * 1000, onState } = {}) {
+        const deadline = Date.now() + timeoutMs;
+        while (Date.now() < deadline) {
+            const status = await this.getDeployStatus(deployId);
+            if (onState) onState(status.state);
+            if (status.state === 'live') {
+                return status;
+            }
+            if (status.state === 'failed') {
+                throw new Error(status.error || 'Deployment failed');
+            }
+            await new Promise((resolve) => setTimeout(resolve, intervalMs));
+        }
+        throw new Error('Deployment is taking longer than expected; check its status later');
+    }
+
     // PUT request helper
     async put(endpoint, data) {
         return this.request(endpoint, {
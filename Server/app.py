@@ -1,46 +1,40 @@
+import config.env  # noqa: F401 -- load .env before anything reads os.environ
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 from datetime import datetime
+import logging
 import os
-from dotenv import load_dotenv
 from config.database import db_instance
+from config.settings import SettingsError, configure_logging, install, load_settings
 from routes.auth import auth_bp
 from routes.github import github_bp
 from routes.portfolio import portfolio_bp
 from routes.ai_portfolio import ai_portfolio_bp
+from models.indexes import ensure_indexes
+from utils.deploy_pipeline import resume_jobs, start_sweeper
+from utils.pages_status import start_reconciler
+from utils import token_crypto, warmup
+from utils.github_ratelimit import RateLimitExceeded
 
-# Load environment variables from .env file
-from pathlib import Path
-env_path = Path(__file__).resolve().parent / '.env'
-print(f"Looking for .env file at: {env_path}")
-load_dotenv(dotenv_path=env_path, verbose=True)
+def create_app(settings=None):
+    """Create and configure the Flask application
 
-# Debug: Print environment variables
-print("Environment variables loaded:")
-print(f"GITHUB_CLIENT_ID: {'Set' if os.getenv('GITHUB_CLIENT_ID') else 'Not set'}")
-print(f"GITHUB_CLIENT_SECRET: {'Set' if os.getenv('GITHUB_CLIENT_SECRET') else 'Not set'}")
-print(f"GITHUB_REDIRECT_URI: {os.getenv('GITHUB_REDIRECT_URI')}")
-print(f"GITHUB_SCOPES: {os.getenv('GITHUB_SCOPES')}")
+    Settings are read from the environment here, once, unless given.
+    """
+    settings = settings or load_settings()
+    install(settings)
+    configure_logging(settings)
+    token_crypto.configure(settings.token_encryption_key)
 
-def create_app():
-    """Create and configure the Flask application"""
     app = Flask(__name__)
-    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
+    app.config['SETTINGS'] = settings
+    app.config['SECRET_KEY'] = settings.secret_key
     
     # Initialize CORS with more permissive settings for development
-    frontend_url = os.getenv('FRONTEND_URL', 'http://localhost:3001')
-    allowed_origins = [
-        frontend_url,
-        'http://localhost:3000',
-        'http://localhost:3001',
-        'http://localhost:5173',
-        'http://127.0.0.1:3001'
-    ]
-    
     CORS(app, 
          resources={
              r"/api/*": {
-                 "origins": allowed_origins,
+                 "origins": list(settings.cors_origins),
                  "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
                  "allow_headers": ["Content-Type", "Authorization", "Accept"],
                  "supports_credentials": True
@@ -64,6 +58,13 @@ def create_app():
             'database': 'connected' if db_instance.client else 'disconnected'
         })
     
+    # Readiness probe: route traffic to a worker only once it has warmed up
+    @app.route('/api/ready', methods=['GET'])
+    def readiness_check():
+        """Readiness endpoint (503 until this worker's warm-up has finished)"""
+        status = warmup.status()
+        return jsonify(status), 200 if status['ready'] else 503
+    
     # Error handlers
     @app.errorhandler(404)
     def not_found(error):
@@ -73,33 +74,53 @@ def create_app():
     def internal_error(error):
         return jsonify({'message': 'Internal server error'}), 500
     
+    # GitHub budget exhausted (any blueprint that calls GitHub)
+    @app.errorhandler(RateLimitExceeded)
+    def rate_limited(error):
+        return jsonify({'message': str(error), 'retryAfter': error.retry_after}), 429, {'Retry-After': str(error.retry_after)}
+    
     return app
 
 if __name__ == '__main__':
+    try:
+        app = create_app()
+    except SettingsError as e:
+        print(f"❌ Invalid configuration: {e}")
+        exit(1)
+    settings = app.config['SETTINGS']
+    
     # Connect to database
     if not db_instance.connect():
         print("❌ Failed to connect to database. Exiting...")
         exit(1)
     
     # Create indexes for better performance
-    users_collection = db_instance.get_collection('users')
-    if users_collection is not None:
-        users_collection.create_index('email', unique=True)
-        print("📊 Database indexes created")
-    
-    # Create and run the app
-    app = create_app()
+    ensure_indexes()
+    print("📊 Database indexes created")
     
-    port = int(os.environ.get('PORT', 5000))
-    debug = os.environ.get('FLASK_ENV') == 'development'
+    # In debug mode the reloader's watcher process runs this too; only the
+    # server process (WERKZEUG_RUN_MAIN=true) starts background work
+    if not settings.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        # Pick up deploys interrupted by the last shutdown
+        resumed = resume_jobs()
+        if resumed:
+            print(f"🔁 Resumed {resumed} deployment(s)")
+        # ...and ones whose worker dies while this server runs
+        start_sweeper()
+        
+        # Fallback for Pages build outcomes that never arrive by webhook
+        start_reconciler()
+        
+        # Open connections and load libraries before the first request
+        warmup.run()
     
-    print(f"🚀 Starting SkillSlate API server on port {port}")
+    print(f"🚀 Starting SkillSlate API server on port {settings.port}")
     print(f"📊 MongoDB connected to: {db_instance.mongodb_uri}")
-    print(f"🔧 Debug mode: {debug}")
+    print(f"🔧 Debug mode: {settings.debug}")
     print(f"🌐 CORS enabled for frontend origins")
     
     try:
-        app.run(host='0.0.0.0', port=port, debug=debug)
+        app.run(host='0.0.0.0', port=settings.port, debug=settings.debug)
     except KeyboardInterrupt:
         print("\n🛑 Shutting down server...")
         db_instance.disconnect()
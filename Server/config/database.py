@@ -1,6 +1,13 @@
 from pymongo import MongoClient
 import os
 
+def client_options():
+    """Connection settings shared by the sync and async clients"""
+    return {
+        'maxPoolSize': int(os.environ.get('MONGODB_MAX_POOL_SIZE', 100)),
+        'serverSelectionTimeoutMS': int(os.environ.get('MONGODB_SERVER_SELECTION_TIMEOUT_MS', 30000))
+    }
+
 class Database:
     def __init__(self):
         self.mongodb_uri = os.environ.get('MONGODB_URI', 'mongodb://localhost:27017/')
@@ -11,7 +18,7 @@ class Database:
     def connect(self):
         """Connect to MongoDB"""
         try:
-            self.client = MongoClient(self.mongodb_uri)
+            self.client = MongoClient(self.mongodb_uri, **client_options())
             self.db = self.client[self.database_name]
             # Test connection
             self.client.admin.command('ping')
@@ -0,0 +1,14 @@
+"""
+Loads Server/.env into the environment
+
+Imported first by app.py (and so by every entry point), before any module
+reads os.environ at import time. Python runs it once per process; variables
+already set in the environment win over the file.
+"""
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+ENV_PATH = Path(__file__).resolve().parent.parent / '.env'
+
+load_dotenv(dotenv_path=ENV_PATH)
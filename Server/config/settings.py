@@ -0,0 +1,290 @@
+"""
+Application settings
+
+Read from the environment once, when the app is created, validated, and kept
+on app.config['SETTINGS'] as an immutable object. Request handlers read it via
+get_settings() instead of parsing os.environ themselves; so do deploy workers
+and background loops, which run outside a request and get the settings of the
+app created last in the process.
+"""
+import base64
+import binascii
+import logging
+import os
+from importlib.util import find_spec
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Mapping, Optional, Tuple
+
+from flask import current_app, has_app_context
+
+DEFAULT_SECRET_KEY = 'your-secret-key-change-in-production'
+
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+# Dev-server origins allowed alongside FRONTEND_URL
+DEV_ORIGINS = (
+    'http://localhost:3000',
+    'http://localhost:3001',
+    'http://localhost:5173',
+    'http://127.0.0.1:3001'
+)
+
+# Warm-up steps (utils/warmup.py), all run by default
+WARMUP_STEPS = ('mongo', 'openai', 'github', 'parsers')
+
+logger = logging.getLogger(__name__)
+
+_installed: Optional['Settings'] = None
+
+
+class SettingsError(ValueError):
+    """Invalid or missing configuration"""
+
+
+@dataclass(frozen=True)
+class GitHubOAuthSettings:
+    client_id: str
+    client_secret: str = field(repr=False)
+    redirect_uri: str
+    scopes: str
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.client_id and self.client_secret)
+
+
+@dataclass(frozen=True)
+class GitHubApiSettings:
+    api_url: str
+    web_url: str
+    pool_maxsize: int
+    cache_max_entries: int
+    cache_mongo: bool
+    rate_limit_reserve: int
+    rate_limit_max_wait: float
+    token_cache_seconds: float
+
+
+@dataclass(frozen=True)
+class DeploySettings:
+    workers: int
+    blob_upload_workers: int
+    inline_tree_max_bytes: int
+    precompress: bool
+    events_timeout_seconds: int
+
+
+@dataclass(frozen=True)
+class PagesSettings:
+    webhook_secret: str = field(repr=False)
+    webhook_url: str
+    reconcile_seconds: int
+
+    @property
+    def webhooks_enabled(self) -> bool:
+        return bool(self.webhook_secret and self.webhook_url)
+
+
+@dataclass(frozen=True)
+class WarmupSettings:
+    steps: Tuple[str, ...]
+    mongo_connections: int
+    timeout_seconds: float
+
+
+@dataclass(frozen=True)
+class Settings:
+    secret_key: str = field(repr=False)
+    token_encryption_key: str = field(repr=False)
+    env: str
+    port: int
+    frontend_url: str
+    cors_origins: Tuple[str, ...]
+    log_level: str
+    token_expiration: timedelta
+    github_oauth: GitHubOAuthSettings
+    github: GitHubApiSettings
+    deploy: DeploySettings
+    pages: PagesSettings
+    warmup: WarmupSettings
+
+    @property
+    def debug(self) -> bool:
+        return self.env == 'development'
+
+
+def _int(env: Mapping[str, str], name: str, default: int, minimum: int = 0) -> int:
+    raw = env.get(name)
+    if raw in (None, ''):
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise SettingsError(f'{name} must be an integer, got {raw!r}')
+    if value < minimum:
+        raise SettingsError(f'{name} must be at least {minimum}, got {value}')
+    return value
+
+
+def _float(env: Mapping[str, str], name: str, default: float, minimum: float = 0) -> float:
+    raw = env.get(name)
+    if raw in (None, ''):
+        return default
+    try:
+        value = float(raw)
+    except ValueError:
+        raise SettingsError(f'{name} must be a number, got {raw!r}')
+    if value < minimum:
+        raise SettingsError(f'{name} must be at least {minimum}, got {value}')
+    return value
+
+
+def _flag(env: Mapping[str, str], name: str) -> bool:
+    raw = env.get(name) or '0'
+    if raw not in ('0', '1'):
+        raise SettingsError(f'{name} must be 0 or 1, got {raw!r}')
+    return raw == '1'
+
+
+def _url(env: Mapping[str, str], name: str, default: str) -> str:
+    value = env.get(name) or default
+    if value and not value.startswith(('http://', 'https://')):
+        raise SettingsError(f'{name} must be an http(s) URL, got {value!r}')
+    return value.rstrip('/')
+
+
+def _warmup_steps(env: Mapping[str, str]) -> Tuple[str, ...]:
+    raw = env.get('WARMUP_STEPS')
+    if raw is None:
+        return WARMUP_STEPS
+    steps = tuple(s.strip() for s in raw.split(',') if s.strip())
+    unknown = [s for s in steps if s not in WARMUP_STEPS]
+    if unknown:
+        raise SettingsError(f"WARMUP_STEPS has unknown steps {', '.join(unknown)} (known: {', '.join(WARMUP_STEPS)})")
+    return steps
+
+
+def _fernet_key(env: Mapping[str, str], name: str) -> str:
+    raw = env.get(name) or ''
+    if not raw:
+        return ''
+    try:
+        valid = len(base64.urlsafe_b64decode(raw.encode('ascii'))) == 32
+    except (binascii.Error, UnicodeEncodeError, ValueError):
+        valid = False
+    if not valid:
+        raise SettingsError(f'{name} must be a Fernet key (32 url-safe base64-encoded bytes)')
+    return raw
+
+
+def load_settings(env: Optional[Mapping[str, str]] = None) -> Settings:
+    """
+    Build and validate settings from the environment
+
+    Args:
+        env: Variables to read (defaults to os.environ)
+
+    Raises:
+        SettingsError: if a value is malformed, or the default SECRET_KEY is
+            used (or TOKEN_ENCRYPTION_KEY is missing) outside development
+    """
+    env = os.environ if env is None else env
+
+    app_env = env.get('FLASK_ENV', 'production')
+    secret_key = env.get('SECRET_KEY') or DEFAULT_SECRET_KEY
+    if secret_key == DEFAULT_SECRET_KEY and app_env != 'development':
+        raise SettingsError('SECRET_KEY must be set outside development')
+
+    token_encryption_key = _fernet_key(env, 'TOKEN_ENCRYPTION_KEY')
+    if not token_encryption_key and app_env != 'development':
+        raise SettingsError('TOKEN_ENCRYPTION_KEY must be set outside development')
+    if token_encryption_key and find_spec('cryptography') is None:
+        raise SettingsError('TOKEN_ENCRYPTION_KEY is set but the cryptography package is not installed')
+
+    log_level = env.get('LOG_LEVEL', 'INFO').upper()
+    if not isinstance(logging.getLevelName(log_level), int):
+        raise SettingsError(f'LOG_LEVEL must be a logging level name, got {log_level!r}')
+
+    frontend_url = env.get('FRONTEND_URL', 'http://localhost:3001').rstrip('/')
+    redirect_uri = env.get('GITHUB_REDIRECT_URI', 'http://localhost:5000/api/github/callback')
+    if not redirect_uri.startswith(('http://', 'https://')):
+        raise SettingsError(f'GITHUB_REDIRECT_URI must be an http(s) URL, got {redirect_uri!r}')
+
+    webhook_secret = env.get('GITHUB_WEBHOOK_SECRET', '')
+    webhook_url = _url(env, 'GITHUB_WEBHOOK_URL', '')
+
+    return Settings(
+        secret_key=secret_key,
+        token_encryption_key=token_encryption_key,
+        env=app_env,
+        port=_int(env, 'PORT', 5000, minimum=1),
+        frontend_url=frontend_url,
+        cors_origins=tuple(dict.fromkeys((frontend_url, *DEV_ORIGINS))),
+        log_level=log_level,
+        token_expiration=timedelta(hours=_int(env, 'TOKEN_EXPIRATION_HOURS', 24, minimum=1)),
+        github_oauth=GitHubOAuthSettings(
+            client_id=env.get('GITHUB_CLIENT_ID', ''),
+            client_secret=env.get('GITHUB_CLIENT_SECRET', ''),
+            redirect_uri=redirect_uri,
+            scopes=env.get('GITHUB_SCOPES', 'repo,workflow,pages:write')
+        ),
+        github=GitHubApiSettings(
+            api_url=_url(env, 'GITHUB_API_URL', 'https://api.github.com'),
+            web_url=_url(env, 'GITHUB_WEB_URL', 'https://github.com'),
+            pool_maxsize=_int(env, 'GITHUB_POOL_MAXSIZE', 20, minimum=1),
+            cache_max_entries=_int(env, 'GITHUB_CACHE_MAX_ENTRIES', 1024),
+            cache_mongo=_flag(env, 'GITHUB_CACHE_MONGO'),
+            rate_limit_reserve=_int(env, 'GITHUB_RATE_LIMIT_RESERVE', 100),
+            rate_limit_max_wait=_float(env, 'GITHUB_RATE_LIMIT_MAX_WAIT', 60),
+            token_cache_seconds=_float(env, 'GITHUB_TOKEN_CACHE_SECONDS', 60)
+        ),
+        deploy=DeploySettings(
+            workers=_int(env, 'DEPLOY_WORKERS', 4, minimum=1),
+            blob_upload_workers=_int(env, 'GITHUB_BLOB_UPLOAD_WORKERS', 4, minimum=1),
+            inline_tree_max_bytes=_int(env, 'GITHUB_INLINE_TREE_MAX_BYTES', 256 * 1024),
+            precompress=_flag(env, 'SITE_PRECOMPRESS'),
+            events_timeout_seconds=_int(env, 'DEPLOY_EVENTS_TIMEOUT_SECONDS', 120, minimum=1)
+        ),
+        pages=PagesSettings(
+            webhook_secret=webhook_secret,
+            webhook_url=webhook_url,
+            # With webhooks the reconciler is only a fallback, so it can be slow
+            reconcile_seconds=_int(env, 'PAGES_RECONCILE_SECONDS', 300 if webhook_secret and webhook_url else 30, minimum=1)
+        ),
+        warmup=WarmupSettings(
+            steps=_warmup_steps(env),
+            # About the number of request threads
+            mongo_connections=_int(env, 'WARMUP_MONGO_CONNECTIONS', _int(env, 'GUNICORN_THREADS', 8, minimum=1), minimum=1),
+            timeout_seconds=_float(env, 'WARMUP_TIMEOUT_SECONDS', 10)
+        )
+    )
+
+
+def configure_logging(settings: Settings):
+    """Log at the configured level, to stderr unless the server (e.g. gunicorn) already installed handlers"""
+    logging.basicConfig(level=settings.log_level, format=LOG_FORMAT)
+    logging.getLogger().setLevel(settings.log_level)
+    if not settings.github_oauth.configured:
+        logger.warning('GitHub OAuth is not configured (GITHUB_CLIENT_ID/GITHUB_CLIENT_SECRET missing)')
+
+
+def install(settings: Settings):
+    """Make settings what get_settings() returns outside a request (create_app calls this)"""
+    global _installed
+    _installed = settings
+
+
+def get_settings() -> Settings:
+    """
+    Settings of the app handling the current request
+
+    Outside a request (deploy workers, background loops, scripts) these are
+    the installed settings, loaded from the environment if no app has been
+    created yet.
+    """
+    if has_app_context():
+        return current_app.config['SETTINGS']
+    if _installed is None:
+        install(load_settings())
+    return _installed
@@ -6,38 +6,52 @@ Automatically restarts when files change
 
 import os
 import sys
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
 
 # Suppress Flask debug messages
 import logging
 logging.getLogger('werkzeug').setLevel(logging.ERROR)
 
-from app import create_app, db_instance
+from app import create_app, db_instance  # also loads .env
+from config.settings import SettingsError
+from models.indexes import ensure_indexes
+from utils.deploy_pipeline import resume_jobs, start_sweeper
+from utils.pages_status import start_reconciler
+from utils import warmup
 
 def main():
     """Main function to start the development server with auto-reload"""
     print("🚀 Starting SkillSlate API (Development Mode)...")
     
+    try:
+        app = create_app()
+    except SettingsError as e:
+        print(f"❌ Invalid configuration: {e}")
+        return 1
+    
     # Connect to database
     if not db_instance.connect():
         print("❌ Database connection failed")
         return 1
     
     # Create indexes
-    users_collection = db_instance.get_collection('users')
-    if users_collection is not None:
-        try:
-            users_collection.create_index('email', unique=True)
-        except Exception:
-            pass  # Index might already exist
+    try:
+        ensure_indexes()
+    except Exception:
+        pass  # Index might already exist
     
-    # Create and run the app
-    app = create_app()
+    # The reloader runs this script twice: a watcher process that only
+    # restarts the server, and the server itself (WERKZEUG_RUN_MAIN=true).
+    # Background work belongs to the server alone.
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        # Pick up deploys interrupted by the last shutdown
+        resume_jobs()
+        start_sweeper()
+        start_reconciler()
+        
+        # In the background, so reloads stay quick; /api/ready reports when done
+        warmup.start()
     
-    port = int(os.environ.get('PORT', 5000))
+    port = app.config['SETTINGS'].port
     
     print(f"✅ Server ready at http://localhost:{port}")
     print("📡 API endpoints available")
@@ -0,0 +1 @@
+# Development and benchmarking tools (not imported by the app)
@@ -0,0 +1,150 @@
+"""
+Deploy benchmark against the fake GitHub API
+
+Runs the real deploy pipeline (utils.deploy_pipeline) against
+devtools.fake_github for 1/10/100-file sites and reports wall-clock latency
+and GitHub API calls per deploy, for three scenarios per size:
+
+    first   new repository, every file pushed
+    noop    redeploy of identical content
+    edit    redeploy with one file changed
+
+Needs MongoDB (MONGODB_URI); records are written to a separate database
+(--database, default skillslate_bench) and removed afterwards.
+
+Usage (from Server/):
+    python -m devtools.bench_deploy --sizes 1 10 100 --latency-ms 50 --json bench.json
+"""
+import argparse
+import base64
+import json
+import os
+import statistics
+import time
+from dataclasses import replace
+
+from bson import ObjectId
+
+from config.database import db_instance
+from config.settings import install, load_settings
+from devtools.fake_github import FakeGitHubServer
+from models.github_token import GitHubTokenStore
+from models.indexes import ensure_indexes
+from models.site_deployment import SiteDeployment, JOB_TERMINAL_STATES
+from utils import deploy_pipeline, github_client
+
+SCENARIOS = ('first', 'noop', 'edit')
+
+
+def make_site(n: int, revision: int = 0):
+    """n files: index.html, a stylesheet, pages, and a binary image every tenth file"""
+    files = [
+        { 'path': 'index.html', 'content': f'<!doctype html><title>Bench</title><h1>Home r{revision}</h1>' },
+        { 'path': 'style.css', 'content': 'body { font-family: sans-serif; }\n' * 40 }
+    ][:n]
+    for i in range(len(files), n):
+        if i % 10 == 9:
+            data = bytes((i * 31 + j) % 256 for j in range(32 * 1024))
+            files.append({ 'path': f'img/{i}.png', 'content': base64.b64encode(data).decode('ascii'), 'encoding': 'base64' })
+        else:
+            files.append({ 'path': f'pages/{i}.html', 'content': f'<h2>Page {i}</h2>' + '<p>lorem ipsum</p>' * 50 })
+    return files
+
+
+def wait_for(job_id: str, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        doc = SiteDeployment.get_job(job_id)
+        if doc and doc['job']['state'] in JOB_TERMINAL_STATES:
+            return doc
+        time.sleep(0.01)
+    raise TimeoutError(f'deploy {job_id} did not finish in {timeout}s')
+
+
+def run_deploy(server, user_id, login, repo, files, timeout):
+    server.github.reset_stats()
+    github_client.reset_metrics()
+
+    start = time.perf_counter()
+    doc, _ = deploy_pipeline.enqueue(user_id, repo, login, files, message='Benchmark deploy')
+    doc = wait_for(str(doc['job']['id']), timeout)
+    elapsed = time.perf_counter() - start
+
+    stats = server.github.get_stats()
+    return {
+        'state': doc['job']['state'],
+        'error': doc['job'].get('error'),
+        'seconds': round(elapsed, 3),
+        'calls': stats['total'],
+        'notModified': stats['notModified'],
+        'endpoints': { k: v['count'] for k, v in sorted(stats['endpoints'].items()) }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark deploys against the fake GitHub API')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--runs', type=int, default=3, help='Repetitions per size (fresh repo each)')
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--jitter-ms', type=float, default=10)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--settle-seconds', type=float, default=0,
+                        help='Pause after repo creation (the fake needs none; GitHub needs ~2)')
+    parser.add_argument('--database', default=os.environ.get('BENCH_DATABASE_NAME', 'skillslate_bench'))
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--json', dest='json_path', help='Write results to this file')
+    args = parser.parse_args()
+
+    server = FakeGitHubServer(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate).start()
+    settings = load_settings({ 'FLASK_ENV': 'development', **os.environ })
+    install(replace(settings, github=replace(settings.github, api_url=server.url)))
+    deploy_pipeline.REPO_SETTLE_SECONDS = args.settle_seconds
+    deploy_pipeline.PAGES_RETRY_SECONDS = 0.2
+
+    db_instance.database_name = args.database
+    if not db_instance.connect():
+        raise SystemExit(1)
+    ensure_indexes()
+
+    user_id = str(ObjectId())
+    login = server.github.config['login']
+    GitHubTokenStore.upsert_for_user(user_id, 'bench-token', login=login)
+
+    results = []
+    try:
+        for size in args.sizes:
+            for run in range(args.runs):
+                repo = f'bench-{size}-{run}-{user_id[-6:]}'
+                first = make_site(size)
+                edited = [dict(f) for f in first]
+                edited[0]['content'] = make_site(1, revision=1)[0]['content']
+
+                for scenario, files in zip(SCENARIOS, (first, first, edited)):
+                    result = run_deploy(server, user_id, login, repo, files, args.timeout)
+                    result.update({ 'files': size, 'run': run, 'scenario': scenario })
+                    results.append(result)
+                    if result['state'] != 'live':
+                        print(f"❌ {size} files/{scenario}: {result['error']}")
+    finally:
+        SiteDeployment.collection().delete_many({ 'userId': ObjectId(user_id) })
+        GitHubTokenStore.delete_for_user(user_id)
+        server.stop()
+
+    print(f"\n{'files':>6} {'scenario':>9} {'median s':>9} {'max s':>7} {'calls':>6} {'304s':>5}")
+    for size in args.sizes:
+        for scenario in SCENARIOS:
+            rows = [r for r in results if r['files'] == size and r['scenario'] == scenario]
+            if not rows:
+                continue
+            seconds = [r['seconds'] for r in rows]
+            print(f"{size:>6} {scenario:>9} {statistics.median(seconds):>9.3f} {max(seconds):>7.3f} "
+                  f"{statistics.median(r['calls'] for r in rows):>6.0f} {statistics.median(r['notModified'] for r in rows):>5.0f}")
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({ 'latencyMs': args.latency_ms, 'jitterMs': args.jitter_ms, 'results': results }, f, indent=2)
+        print(f"\n📝 Results written to {args.json_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""
+Launcher benchmark: Flask's development server vs gunicorn
+
+Starts the API under each launcher in turn and measures /api/health latency
+and throughput from concurrent keep-alive clients, optionally while other
+clients hold deploy-status event streams (SSE) open, which is what ties up
+the development server in practice.
+
+    flask      python start.py (Flask's built-in server)
+    gunicorn   gunicorn -c gunicorn.conf.py wsgi:app
+
+Both launchers need MongoDB (MONGODB_URI). With --sse, a user and a deploy
+job that never finishes are created in the --database database (default
+skillslate_bench) and removed afterwards.
+
+Usage (from Server/):
+    python -m devtools.bench_server --clients 32 --seconds 15 --sse 50 --json server-bench.json
+"""
+import argparse
+import base64
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import jwt
+import requests
+from requests.adapters import HTTPAdapter
+from bson import ObjectId
+
+LAUNCHERS = {
+    'flask': [sys.executable, 'start.py'],
+    'gunicorn': [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app']
+}
+
+BENCH_SECRET_KEY = 'bench-secret-key'
+BENCH_TOKEN_ENCRYPTION_KEY = base64.urlsafe_b64encode(b'bench-token-encryption-key-32byt').decode('ascii')
+
+
+def wait_until_up(base_url: str, proc, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f'server exited with {proc.returncode}')
+        try:
+            if requests.get(f'{base_url}/api/health', timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f'server at {base_url} did not come up in {timeout}s')
+
+
+def create_stream_fixture(database: str):
+    """A user and a deploy job stuck in 'uploading' (leased, so no worker runs it)"""
+    from config.database import db_instance
+    from models.site_deployment import SiteDeployment
+
+    db_instance.database_name = database
+    if not db_instance.connect():
+        raise SystemExit(1)
+    user_id = db_instance.get_collection('users').insert_one({
+        'name': 'Bench', 'email': f'bench-{ObjectId()}@example.test', 'password': None, 'githubConnected': True
+    }).inserted_id
+    now = datetime.utcnow()
+    job_id = ObjectId()
+    SiteDeployment.collection().insert_one({
+        'userId': user_id, 'repo': f'bench-{job_id}', 'createdAt': now, 'updatedAt': now,
+        'job': { 'id': job_id, 'requestId': job_id, 'requests': [job_id], 'state': 'uploading', 'queuedAt': now,
+                 'history': [], 'leaseOwner': 'bench', 'leaseUntil': now + timedelta(days=1) }
+    })
+    token = jwt.encode({ 'user_id': str(user_id), 'exp': now + timedelta(hours=1) }, BENCH_SECRET_KEY, algorithm='HS256')
+    return user_id, job_id, token
+
+
+def drop_stream_fixture(user_id, job_id):
+    from config.database import db_instance
+    from models.site_deployment import SiteDeployment
+    SiteDeployment.collection().delete_one({ 'job.id': job_id })
+    db_instance.get_collection('users').delete_one({ '_id': user_id })
+
+
+def hold_stream(url: str, token: str, stop: threading.Event, opened: list):
+    try:
+        with requests.get(url, headers={ 'Authorization': f'Bearer {token}' }, stream=True, timeout=(5, None)) as res:
+            opened.append(res.status_code)
+            for _ in res.iter_lines():
+                if stop.is_set():
+                    break
+    except requests.RequestException:
+        opened.append(None)
+
+
+def load(base_url: str, clients: int, seconds: float):
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def client():
+        session = requests.Session()
+        # Browsers retry once when a kept-alive connection turns out to be
+        # closed (a recycled gunicorn worker); do the same
+        session.mount('http://', HTTPAdapter(max_retries=1))
+        mine, failed = [], 0
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                ok = session.get(f'{base_url}/api/health', timeout=10).ok
+            except requests.RequestException:
+                ok = False
+            if ok:
+                mine.append((time.perf_counter() - start) * 1000)
+            else:
+                failed += 1
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    latencies.sort()
+    pick = lambda q: round(latencies[min(len(latencies) - 1, int(q * len(latencies)))], 2) if latencies else None
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': round(len(latencies) / seconds, 1),
+        'p50Ms': pick(0.50),
+        'p99Ms': pick(0.99),
+        'meanMs': round(statistics.fmean(latencies), 2) if latencies else None
+    }
+
+
+def run_launcher(name: str, args, fixture):
+    env = { **os.environ, 'PORT': str(args.port), 'DATABASE_NAME': args.database, 'SECRET_KEY': BENCH_SECRET_KEY,
+            'TOKEN_ENCRYPTION_KEY': os.environ.get('TOKEN_ENCRYPTION_KEY') or BENCH_TOKEN_ENCRYPTION_KEY,
+            'FLASK_ENV': 'production', 'GUNICORN_ACCESS_LOG': '', 'LOG_LEVEL': 'WARNING' }
+    base_url = f'http://127.0.0.1:{args.port}'
+    proc = subprocess.Popen(LAUNCHERS[name], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    stop = threading.Event()
+    streams, opened = [], []
+    try:
+        wait_until_up(base_url, proc)
+        if fixture and args.sse:
+            url = f'{base_url}/api/github/deploy/{fixture[1]}/events'
+            streams = [threading.Thread(target=hold_stream, args=(url, fixture[2], stop, opened), daemon=True)
+                       for _ in range(args.sse)]
+            for t in streams:
+                t.start()
+            time.sleep(1)
+        result = load(base_url, args.clients, args.seconds)
+        result.update({ 'launcher': name, 'streamsOpen': sum(1 for s in opened if s == 200) })
+        return result
+    finally:
+        stop.set()
+        proc.terminate()
+        try:
+            proc.wait(timeout=40)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Flask dev server against gunicorn')
+    parser.add_argument('--launchers', nargs='+', choices=sorted(LAUNCHERS), default=['flask', 'gunicorn'])
+    parser.add_argument('--clients', type=int, default=32, help='Concurrent /api/health clients')
+    parser.add_argument('--seconds', type=float, default=15)
+    parser.add_argument('--sse', type=int, default=0, help='Deploy event streams held open during the run')
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--database', default=os.environ.get('BENCH_DATABASE_NAME', 'skillslate_bench'))
+    parser.add_argument('--json', dest='json_path', help='Write results to this file')
+    args = parser.parse_args()
+
+    fixture = create_stream_fixture(args.database) if args.sse else None
+    results = []
+    try:
+        for name in args.launchers:
+            results.append(run_launcher(name, args, fixture))
+    finally:
+        if fixture:
+            drop_stream_fixture(fixture[0], fixture[1])
+
+    print(f"\n{'launcher':>9} {'streams':>8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for r in results:
+        print(f"{r['launcher']:>9} {r['streamsOpen']:>8} {r['rps']:>8} {r['p50Ms']!s:>8} {r['p99Ms']!s:>8} {r['errors']:>7}")
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({ 'clients': args.clients, 'seconds': args.seconds, 'sse': args.sse, 'results': results }, f, indent=2)
+        print(f"\n📝 Results written to {args.json_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,537 @@
+"""
+Local stand-in for the GitHub REST API
+
+Covers the endpoints the GitHub routes and deploy pipeline use: OAuth token
+exchange, /user, /user/emails, repos, git refs/commits/trees/blobs, Pages
+(the latest build is always 'built' at the branch head) and repo hooks
+(stored, never delivered). State is in memory. Any token is accepted and maps to one user (--login).
+
+Knobs, settable on the command line or at runtime via POST /_fake/config:
+
+    latency_ms, jitter_ms   added to every request
+    rate_limit              calls per token per rate_window seconds; sends
+                            X-RateLimit-* headers and 403s when spent
+    error_rate              fraction of API calls answered with a random 5xx
+    pages_delay             seconds after repo creation during which enabling
+                            Pages returns 404 (like a freshly created repo)
+    faults                  [{ method, path (regex), status, times, retryAfter }]
+                            answered instead of the real handler
+
+GET /_fake/stats returns call counts per endpoint; POST /_fake/reset clears
+state and stats.
+
+Usage (from Server/):
+    python -m devtools.fake_github --port 5055 --latency-ms 50
+    GITHUB_API_URL=http://localhost:5055 GITHUB_WEB_URL=http://localhost:5055 python dev.py
+
+Tree, commit and ref SHAs are not git-compatible; blob SHAs are, so the
+deploy's unchanged-file detection works against it.
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from copy import deepcopy
+
+from flask import Flask, Response, jsonify, request
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+DEFAULT_CONFIG = {
+    'login': 'octocat',
+    'latency_ms': 0,
+    'jitter_ms': 0,
+    'rate_limit': 5000,
+    'rate_window': 3600,
+    'error_rate': 0.0,
+    'pages_delay': 0.0,
+    'faults': []
+}
+
+
+def _sha(kind: str, data: bytes) -> str:
+    return hashlib.sha1(b'%s %d\0' % (kind.encode(), len(data)) + data).hexdigest()
+
+
+class FakeGitHub:
+    """In-memory repositories plus call accounting"""
+
+    def __init__(self, config=None):
+        self.lock = threading.Lock()
+        self.config = { **deepcopy(DEFAULT_CONFIG), **(config or {}) }
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.repos = {}
+            self.budgets = {}
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = { 'total': 0, 'notModified': 0, 'faults': 0, 'rateLimited': 0, 'endpoints': {} }
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return deepcopy(self.stats)
+
+    # -- git objects ------------------------------------------------------
+
+    def put_blob(self, repo, data: bytes) -> str:
+        sha = _sha('blob', data)
+        repo['objects'][sha] = ('blob', data)
+        return sha
+
+    def put_tree(self, repo, entries: dict) -> str:
+        body = '\n'.join(f'{p} {s}' for p, s in sorted(entries.items())).encode()
+        sha = _sha('tree', body)
+        repo['objects'][sha] = ('tree', dict(entries))
+        return sha
+
+    def put_commit(self, repo, tree: str, parents: list, message: str) -> str:
+        body = json.dumps({ 'tree': tree, 'parents': parents, 'message': message, 'at': time.time() }).encode()
+        sha = _sha('commit', body)
+        repo['objects'][sha] = ('commit', { 'tree': tree, 'parents': parents, 'message': message })
+        return sha
+
+    def get_object(self, repo, sha, kind):
+        obj = repo['objects'].get(sha)
+        return obj[1] if obj and obj[0] == kind else None
+
+    def is_ancestor(self, repo, ancestor: str, sha: str) -> bool:
+        seen, stack = set(), [sha]
+        while stack:
+            current = stack.pop()
+            if current == ancestor:
+                return True
+            if current in seen:
+                continue
+            seen.add(current)
+            commit = self.get_object(repo, current, 'commit')
+            if commit:
+                stack.extend(commit['parents'])
+        return False
+
+    def create_repo(self, owner: str, name: str, auto_init: bool):
+        repo = { 'owner': owner, 'name': name, 'default_branch': 'main', 'objects': {}, 'refs': {},
+                 'pages': None, 'hooks': [], 'createdAt': time.time() }
+        if auto_init:
+            readme = self.put_blob(repo, f'# {name}\n'.encode())
+            tree = self.put_tree(repo, { 'README.md': readme })
+            repo['refs']['main'] = self.put_commit(repo, tree, [], 'Initial commit')
+        self.repos[f'{owner}/{name}'.lower()] = repo
+        return repo
+
+    # -- rate limit -------------------------------------------------------
+
+    def spend(self, token: str):
+        """Charge one call to token; returns (allowed, headers)"""
+        now = time.time()
+        budget = self.budgets.get(token)
+        if budget is None or budget['reset'] <= now:
+            budget = self.budgets[token] = { 'used': 0, 'reset': now + self.config['rate_window'] }
+        limit = self.config['rate_limit']
+        allowed = budget['used'] < limit
+        if allowed:
+            budget['used'] += 1
+        headers = {
+            'X-RateLimit-Limit': str(limit),
+            'X-RateLimit-Remaining': str(max(0, limit - budget['used'])),
+            'X-RateLimit-Used': str(budget['used']),
+            'X-RateLimit-Reset': str(int(budget['reset'])),
+            'X-RateLimit-Resource': 'core'
+        }
+        return allowed, headers
+
+    def record(self, key: str, status: int):
+        self.stats['total'] += 1
+        entry = self.stats['endpoints'].setdefault(key, { 'count': 0, 'statuses': {} })
+        entry['count'] += 1
+        entry['statuses'][str(status)] = entry['statuses'].get(str(status), 0) + 1
+
+    def take_fault(self, method: str, path: str):
+        for fault in self.config['faults']:
+            if fault.get('method', method).upper() != method:
+                continue
+            if not re.search(fault.get('path', ''), path):
+                continue
+            if fault.get('times') is not None:
+                if fault['times'] <= 0:
+                    continue
+                fault['times'] -= 1
+            return fault
+        return None
+
+
+def create_app(config=None) -> Flask:
+    app = Flask(__name__)
+    gh = FakeGitHub(config)
+    app.config['FAKE_GITHUB'] = gh
+
+    def error(status, message, **extra):
+        return jsonify({ 'message': message, 'documentation_url': 'https://docs.github.com/rest', **extra }), status
+
+    def find_repo(owner, name):
+        return gh.repos.get(f'{owner}/{name}'.lower())
+
+    def token():
+        auth = request.headers.get('Authorization', '')
+        return auth.split(' ', 1)[1] if ' ' in auth else None
+
+    @app.before_request
+    def simulate():
+        if request.path.startswith('/_fake'):
+            return None
+        cfg = gh.config
+        delay = cfg['latency_ms'] + random.uniform(0, cfg['jitter_ms'])
+        if delay:
+            time.sleep(delay / 1000)
+
+        with gh.lock:
+            fault = gh.take_fault(request.method, request.path)
+            if fault:
+                gh.stats['faults'] += 1
+                headers = { 'Retry-After': str(fault['retryAfter']) } if fault.get('retryAfter') is not None else {}
+                return Response(json.dumps({ 'message': 'Injected fault' }), fault['status'], headers, mimetype='application/json')
+            if cfg['error_rate'] and random.random() < cfg['error_rate']:
+                gh.stats['faults'] += 1
+                return error(random.choice((500, 502, 503)), 'Server Error')
+
+        if request.path.startswith('/login/oauth'):
+            return None
+        if not token():
+            return error(401, 'Requires authentication')
+        return None
+
+    @app.after_request
+    def account(response):
+        if request.path.startswith('/_fake'):
+            return response
+        rule = request.url_rule.rule if request.url_rule else request.path
+        with gh.lock:
+            if request.method == 'GET' and response.status_code == 200 and response.direct_passthrough is False:
+                etag = '"%s"' % hashlib.sha1(response.get_data()).hexdigest()
+                response.headers['ETag'] = etag
+                if request.headers.get('If-None-Match') == etag:
+                    # Conditional hits don't count against the rate limit
+                    gh.stats['notModified'] += 1
+                    gh.record(f'{request.method} {rule}', 304)
+                    return Response(status=304, headers={ 'ETag': etag })
+
+            if not request.path.startswith('/login/oauth'):
+                allowed, headers = gh.spend(token() or '')
+                response.headers.update(headers)
+                if not allowed:
+                    gh.stats['rateLimited'] += 1
+                    gh.record(f'{request.method} {rule}', 403)
+                    limited = Response(json.dumps({ 'message': 'API rate limit exceeded' }), 403, mimetype='application/json')
+                    limited.headers.update(headers)
+                    return limited
+            gh.record(f'{request.method} {rule}', response.status_code)
+        return response
+
+    # -- control ----------------------------------------------------------
+
+    @app.get('/_fake/stats')
+    def fake_stats():
+        return jsonify(gh.get_stats())
+
+    @app.post('/_fake/reset')
+    def fake_reset():
+        gh.reset()
+        return jsonify({ 'ok': True })
+
+    @app.post('/_fake/config')
+    def fake_config():
+        body = request.get_json(silent=True) or {}
+        with gh.lock:
+            gh.config.update({ k: v for k, v in body.items() if k in DEFAULT_CONFIG })
+            return jsonify(deepcopy(gh.config))
+
+    # -- OAuth and user ---------------------------------------------------
+
+    @app.post('/login/oauth/access_token')
+    def access_token():
+        payload = request.get_json(silent=True) or request.form
+        code = payload.get('code')
+        if not code:
+            return jsonify({ 'error': 'bad_verification_code', 'error_description': 'The code passed is incorrect or expired.' })
+        return jsonify({ 'access_token': f'fake-{code}', 'token_type': 'bearer', 'scope': 'repo,user:email' })
+
+    @app.get('/user')
+    def user():
+        login = gh.config['login']
+        return jsonify({ 'login': login, 'id': 1, 'name': login.title(), 'email': None,
+                         'avatar_url': f'https://avatars.example.test/{login}' })
+
+    @app.get('/user/emails')
+    def user_emails():
+        return jsonify([{ 'email': f"{gh.config['login']}@example.test", 'primary': True, 'verified': True, 'visibility': 'private' }])
+
+    # -- repos ------------------------------------------------------------
+
+    def repo_json(repo):
+        return { 'name': repo['name'], 'full_name': f"{repo['owner']}/{repo['name']}", 'private': False,
+                 'default_branch': repo['default_branch'], 'owner': { 'login': repo['owner'] } }
+
+    @app.get('/repos/<owner>/<name>')
+    def get_repo(owner, name):
+        repo = find_repo(owner, name)
+        return jsonify(repo_json(repo)) if repo else error(404, 'Not Found')
+
+    @app.post('/user/repos')
+    def create_repo():
+        body = request.get_json(silent=True) or {}
+        name = body.get('name') or ''
+        if not re.fullmatch(r'[A-Za-z0-9._-]+', name):
+            return error(422, 'Repository creation failed.', errors=[{ 'message': 'name is invalid' }])
+        with gh.lock:
+            if find_repo(gh.config['login'], name):
+                return error(422, 'Repository creation failed.', errors=[{ 'message': 'name already exists on this account' }])
+            repo = gh.create_repo(gh.config['login'], name, bool(body.get('auto_init')))
+        return jsonify(repo_json(repo)), 201
+
+    # -- git data ---------------------------------------------------------
+
+    @app.get('/repos/<owner>/<name>/git/refs/heads/<path:branch>')
+    def get_ref(owner, name, branch):
+        repo = find_repo(owner, name)
+        if not repo or branch not in repo['refs']:
+            return error(404, 'Not Found')
+        return jsonify({ 'ref': f'refs/heads/{branch}', 'object': { 'type': 'commit', 'sha': repo['refs'][branch] } })
+
+    @app.post('/repos/<owner>/<name>/git/refs')
+    def create_ref(owner, name):
+        repo = find_repo(owner, name)
+        if not repo:
+            return error(404, 'Not Found')
+        body = request.get_json(silent=True) or {}
+        branch = (body.get('ref') or '').removeprefix('refs/heads/')
+        with gh.lock:
+            if branch in repo['refs']:
+                return error(422, 'Reference already exists')
+            if not gh.get_object(repo, body.get('sha'), 'commit'):
+                return error(422, 'Object does not exist')
+            repo['refs'][branch] = body['sha']
+        return jsonify({ 'ref': f'refs/heads/{branch}', 'object': { 'type': 'commit', 'sha': body['sha'] } }), 201
+
+    @app.patch('/repos/<owner>/<name>/git/refs/heads/<path:branch>')
+    def update_ref(owner, name, branch):
+        repo = find_repo(owner, name)
+        if not repo:
+            return error(404, 'Not Found')
+        body = request.get_json(silent=True) or {}
+        with gh.lock:
+            if branch not in repo['refs']:
+                return error(422, 'Reference does not exist')
+            if not gh.get_object(repo, body.get('sha'), 'commit'):
+                return error(422, 'Object does not exist')
+            if not body.get('force') and not gh.is_ancestor(repo, repo['refs'][branch], body['sha']):
+                return error(422, 'Update is not a fast forward')
+            repo['refs'][branch] = body['sha']
+        return jsonify({ 'ref': f'refs/heads/{branch}', 'object': { 'type': 'commit', 'sha': body['sha'] } })
+
+    @app.get('/repos/<owner>/<name>/git/commits/<sha>')
+    def get_commit(owner, name, sha):
+        repo = find_repo(owner, name)
+        commit = gh.get_object(repo, sha, 'commit') if repo else None
+        if not commit:
+            return error(404, 'Not Found')
+        return jsonify({ 'sha': sha, 'message': commit['message'], 'tree': { 'sha': commit['tree'] },
+                         'parents': [{ 'sha': p } for p in commit['parents']] })
+
+    @app.post('/repos/<owner>/<name>/git/commits')
+    def create_commit(owner, name):
+        repo = find_repo(owner, name)
+        if not repo:
+            return error(404, 'Not Found')
+        body = request.get_json(silent=True) or {}
+        with gh.lock:
+            if not gh.get_object(repo, body.get('tree'), 'tree'):
+                return error(422, 'Tree SHA does not exist')
+            parents = body.get('parents') or []
+            if any(not gh.get_object(repo, p, 'commit') for p in parents):
+                return error(422, 'Parent SHA does not exist or is not a commit object')
+            sha = gh.put_commit(repo, body['tree'], parents, body.get('message', ''))
+        return jsonify({ 'sha': sha, 'tree': { 'sha': body['tree'] }, 'parents': [{ 'sha': p } for p in parents] }), 201
+
+    @app.get('/repos/<owner>/<name>/git/trees/<sha>')
+    def get_tree(owner, name, sha):
+        repo = find_repo(owner, name)
+        tree = gh.get_object(repo, sha, 'tree') if repo else None
+        if tree is None:
+            return error(404, 'Not Found')
+        items = [{ 'path': p, 'mode': '100644', 'type': 'blob', 'sha': s, 'size': len(repo['objects'][s][1]) }
+                 for p, s in sorted(tree.items())]
+        return jsonify({ 'sha': sha, 'tree': items, 'truncated': False })
+
+    @app.post('/repos/<owner>/<name>/git/trees')
+    def create_tree(owner, name):
+        repo = find_repo(owner, name)
+        if not repo:
+            return error(404, 'Not Found')
+        body = request.get_json(silent=True) or {}
+        with gh.lock:
+            entries = {}
+            if body.get('base_tree'):
+                base = gh.get_object(repo, body['base_tree'], 'tree')
+                if base is None:
+                    return error(422, 'base_tree is not a valid tree oid')
+                entries.update(base)
+            for item in body.get('tree', []):
+                path = item.get('path')
+                if 'content' in item:
+                    entries[path] = gh.put_blob(repo, item['content'].encode('utf-8'))
+                elif item.get('sha') is None:
+                    entries.pop(path, None)
+                elif gh.get_object(repo, item['sha'], 'blob') is None:
+                    return error(422, f"Invalid tree info: sha for {path} does not exist")
+                else:
+                    entries[path] = item['sha']
+            sha = gh.put_tree(repo, entries)
+        return jsonify({ 'sha': sha, 'truncated': False }), 201
+
+    @app.post('/repos/<owner>/<name>/git/blobs')
+    def create_blob(owner, name):
+        repo = find_repo(owner, name)
+        if not repo:
+            return error(404, 'Not Found')
+        body = request.get_json(silent=True) or {}
+        content = body.get('content', '')
+        data = base64.b64decode(content) if body.get('encoding') == 'base64' else content.encode('utf-8')
+        with gh.lock:
+            sha = gh.put_blob(repo, data)
+        return jsonify({ 'sha': sha }), 201
+
+    # -- pages ------------------------------------------------------------
+
+    def pages_json(repo):
+        return { 'status': 'built', 'cname': None, 'source': repo['pages'],
+                 'html_url': f"https://{repo['owner']}.github.io/{repo['name']}/" }
+
+    @app.get('/repos/<owner>/<name>/pages')
+    def get_pages(owner, name):
+        repo = find_repo(owner, name)
+        if not repo or not repo['pages']:
+            return error(404, 'Not Found')
+        return jsonify(pages_json(repo))
+
+    @app.post('/repos/<owner>/<name>/pages')
+    def enable_pages(owner, name):
+        repo = find_repo(owner, name)
+        if not repo or time.time() - repo['createdAt'] < gh.config['pages_delay']:
+            return error(404, 'Not Found')
+        if repo['pages']:
+            return error(409, 'GitHub Pages is already enabled.')
+        body = request.get_json(silent=True) or {}
+        source = body.get('source') or {}
+        if source.get('branch') not in repo['refs']:
+            return error(422, 'The branch does not exist')
+        repo['pages'] = source
+        return jsonify(pages_json(repo)), 201
+
+    @app.get('/repos/<owner>/<name>/pages/builds/latest')
+    def latest_pages_build(owner, name):
+        repo = find_repo(owner, name)
+        if not repo or not repo['pages']:
+            return error(404, 'Not Found')
+        return jsonify({ 'status': 'built', 'error': { 'message': None },
+                         'commit': repo['refs'].get(repo['pages'].get('branch')),
+                         'updated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()) })
+
+    # -- hooks ------------------------------------------------------------
+
+    @app.get('/repos/<owner>/<name>/hooks')
+    def list_hooks(owner, name):
+        repo = find_repo(owner, name)
+        return jsonify(repo['hooks']) if repo else error(404, 'Not Found')
+
+    @app.post('/repos/<owner>/<name>/hooks')
+    def create_hook(owner, name):
+        repo = find_repo(owner, name)
+        if not repo:
+            return error(404, 'Not Found')
+        body = request.get_json(silent=True) or {}
+        config = { k: v for k, v in (body.get('config') or {}).items() if k != 'secret' }
+        with gh.lock:
+            if any(h['config'].get('url') == config.get('url') for h in repo['hooks']):
+                return error(422, 'Validation Failed', errors=[{ 'message': 'Hook already exists on this repository' }])
+            hook = { 'id': len(repo['hooks']) + 1, 'name': 'web', 'active': body.get('active', True),
+                     'events': body.get('events', ['push']), 'config': config }
+            repo['hooks'].append(hook)
+        return jsonify(hook), 201
+
+    return app
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class FakeGitHubServer:
+    """Run the fake in a background thread (for benchmarks and scripts)"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, quiet: bool = True, **config):
+        self.app = create_app(config)
+        self.server = make_server(host, port, self.app, threaded=True, request_handler=_QuietHandler if quiet else None)
+        self.url = f'http://{host}:{self.server.server_port}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def github(self) -> FakeGitHub:
+        return self.app.config['FAKE_GITHUB']
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+
+def parse_fault(spec: str) -> dict:
+    """METHOD:PATH_REGEX:STATUS[:TIMES[:RETRY_AFTER]]"""
+    parts = spec.split(':')
+    if len(parts) < 3:
+        raise argparse.ArgumentTypeError('fault must be METHOD:PATH_REGEX:STATUS[:TIMES[:RETRY_AFTER]]')
+    fault = { 'method': parts[0].upper(), 'path': parts[1], 'status': int(parts[2]) }
+    if len(parts) > 3 and parts[3]:
+        fault['times'] = int(parts[3])
+    if len(parts) > 4 and parts[4]:
+        fault['retryAfter'] = int(parts[4])
+    return fault
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the GitHub REST API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--login', default=DEFAULT_CONFIG['login'])
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--rate-limit', type=int, default=DEFAULT_CONFIG['rate_limit'])
+    parser.add_argument('--rate-window', type=int, default=DEFAULT_CONFIG['rate_window'])
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--pages-delay', type=float, default=0.0)
+    parser.add_argument('--fault', type=parse_fault, action='append', default=[],
+                        help='Inject a response: METHOD:PATH_REGEX:STATUS[:TIMES[:RETRY_AFTER]]')
+    args = parser.parse_args()
+
+    server = FakeGitHubServer(
+        args.host, args.port, quiet=False, login=args.login, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        rate_limit=args.rate_limit, rate_window=args.rate_window, error_rate=args.error_rate,
+        pages_delay=args.pages_delay, faults=args.fault
+    )
+    print(f"🧪 Fake GitHub API listening on {server.url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Import-time profile of the API (python -X importtime)
+
+Imports the app in fresh interpreters and summarizes where cold-start time
+goes, grouped by top-level package. Modules in LAZY_MODULES must not be
+imported at startup (they load on first use or during worker warm-up).
+
+The committed report (devtools/importtime.json) is the reference; --check
+fails if a lazy module is imported at startup or the total grew by more than
+--tolerance over it. Timings depend on the machine, so refresh the report
+(--write) from the same kind of box when a change is intended.
+
+Usage (from Server/):
+    python -m devtools.import_profile               # print the summary
+    python -m devtools.import_profile --write       # refresh devtools/importtime.json
+    python -m devtools.import_profile --check
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+REPORT_PATH = os.path.join(os.path.dirname(__file__), 'importtime.json')
+
+# Heavy optional dependencies that must stay off the import path of `app`
+LAZY_MODULES = ('openai', 'PyPDF2', 'pdfplumber', 'docx')
+
+
+def profile_once(module: str):
+    """{module: (self_us, cumulative_us)} for one cold interpreter"""
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f'import {module} failed:\n{proc.stderr[-2000:]}')
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def summarize(runs, top: int):
+    totals = [sum(s for s, _ in r.values()) for r in runs]
+    by_package = defaultdict(list)
+    for r in runs:
+        grouped = defaultdict(int)
+        for name, (self_us, _) in r.items():
+            grouped[name.split('.')[0]] += self_us
+        for package, us in grouped.items():
+            by_package[package].append(us)
+    packages = sorted(((p, statistics.median(v)) for p, v in by_package.items()), key=lambda x: -x[1])
+    return {
+        'python': sys.version.split()[0],
+        'runs': len(runs),
+        'totalMs': round(statistics.median(totals) / 1000, 1),
+        'modules': len(runs[0]),
+        'packages': [{ 'name': p, 'ms': round(us / 1000, 1) } for p, us in packages[:top]],
+        'lazyImported': sorted({ m.split('.')[0] for r in runs for m in r } & set(LAZY_MODULES))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize python -X importtime for the API')
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--write', action='store_true', help=f'Save the summary to {os.path.basename(REPORT_PATH)}')
+    parser.add_argument('--check', action='store_true', help='Compare against the saved summary')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='Allowed growth of the total for --check')
+    args = parser.parse_args()
+
+    profile_once(args.module)  # compile .pyc files so they don't count
+    summary = summarize([profile_once(args.module) for _ in range(args.runs)], args.top)
+
+    print(f"\nimport {args.module}: {summary['totalMs']} ms, {summary['modules']} modules "
+          f"(median of {summary['runs']}, Python {summary['python']})\n")
+    for p in summary['packages']:
+        print(f"{p['ms']:>9.1f} ms  {p['name']}")
+
+    if args.write:
+        with open(REPORT_PATH, 'w') as f:
+            json.dump(summary, f, indent=2)
+            f.write('\n')
+        print(f"\n📝 Summary written to {REPORT_PATH}")
+
+    if args.check:
+        failed = False
+        if summary['lazyImported']:
+            print(f"\n❌ Imported at startup but should be lazy: {', '.join(summary['lazyImported'])}")
+            failed = True
+        with open(REPORT_PATH) as f:
+            reference = json.load(f)
+        limit = reference['totalMs'] * (1 + args.tolerance)
+        if summary['totalMs'] > limit:
+            print(f"\n❌ Import time {summary['totalMs']} ms exceeds {limit:.1f} ms "
+                  f"({reference['totalMs']} ms + {args.tolerance:.0%})")
+            failed = True
+        if failed:
+            sys.exit(1)
+        print(f"\n✅ Within {args.tolerance:.0%} of the reference ({reference['totalMs']} ms)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+gunicorn settings for the production server
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Worker model: deploy-status SSE streams and AI generation hold a request open
+for seconds to minutes while mostly waiting on I/O, so workers are threaded
+(gthread) or cooperative (gevent) rather than gunicorn's default sync workers,
+where one open stream takes a whole process. Every value can be overridden
+through the environment (GUNICORN_*), and gunicorn's own GUNICORN_CMD_ARGS
+still applies on top.
+"""
+import multiprocessing
+import os
+import sys
+
+# 'gthread' (default) or 'gevent'
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+
+if worker_class == 'gevent':
+    try:
+        # Patch before the app is preloaded, or its sockets/locks stay blocking
+        from gevent import monkey
+        monkey.patch_all()
+    except ImportError:
+        print("⚠️ gevent is not installed; using gthread workers", file=sys.stderr)
+        worker_class = 'gthread'
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+
+# Threaded workers each serve `threads` requests at once, so fewer processes are
+# needed than for sync workers; gevent is one process per core.
+_cores = multiprocessing.cpu_count()
+workers = int(os.getenv('GUNICORN_WORKERS', os.getenv('WEB_CONCURRENCY',
+                                                         _cores if worker_class == 'gevent' else min(2 * _cores + 1, 12))))
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# Import the app (and validate settings) once in the master; workers fork from it.
+# Connections are opened after the fork, in post_fork.
+preload_app = True
+
+# Worker heartbeat, not a request limit: threaded/gevent workers keep
+# notifying the master while a stream is open
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+
+# On restart/deploy, SSE clients are cut off after this and reconnect
+# (EventSource does so automatically); don't wait out a 10-minute stream
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# Longer than the load balancer's idle timeout (60s on most), so the balancer
+# closes idle connections first and never reuses one gunicorn just dropped
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 75))
+
+# Recycle workers to bound slow leaks (AI client buffers, caches); the jitter
+# keeps workers from restarting all at once. A recycled worker closes its
+# idle keep-alive connections, so keep this well above the health-check rate.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 500))
+
+# '-' is stdout; set empty to turn access logging off
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-') or None
+loglevel = os.getenv('LOG_LEVEL', 'info').lower()
+
+
+def on_starting(server):
+    from wsgi import prepare_database
+    if not prepare_database():
+        server.log.error('Database unavailable; not starting')
+        sys.exit(1)
+
+
+def post_fork(server, worker):
+    # Includes warm-up (utils/warmup.py), bounded per step by
+    # WARMUP_TIMEOUT_SECONDS so it finishes well within `timeout`
+    from wsgi import init_worker
+    if not init_worker():
+        server.log.error('Worker %s could not connect to the database', worker.pid)
+        sys.exit(server.WORKER_BOOT_ERROR)
@@ -0,0 +1,32 @@
+from datetime import datetime
+from pymongo.errors import DuplicateKeyError
+from config.database import db_instance
+
+
+class DataKey:
+    """Data encryption keys, stored wrapped (encrypted) with the master key"""
+
+    @staticmethod
+    def collection():
+        return db_instance.get_collection('data_keys')
+
+    @staticmethod
+    def create_indexes():
+        DataKey.collection().create_index('name', unique=True)
+
+    @staticmethod
+    def get_or_create(name: str, wrapped_key: bytes):
+        """The key named name, stored with wrapped_key if it doesn't exist yet (first writer wins)"""
+        col = DataKey.collection()
+        doc = col.find_one({ 'name': name })
+        if doc:
+            return doc
+        try:
+            col.insert_one({ 'name': name, 'wrappedKey': wrapped_key, 'createdAt': datetime.utcnow() })
+        except DuplicateKeyError:
+            pass  # another worker created it first
+        return col.find_one({ 'name': name })
+
+    @staticmethod
+    def get(key_id):
+        return DataKey.collection().find_one({ '_id': key_id })
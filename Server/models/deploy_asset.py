@@ -0,0 +1,70 @@
+import base64
+import hashlib
+from datetime import datetime
+from bson import ObjectId
+from gridfs import GridFSBucket
+from config.database import db_instance
+
+# Read/write granularity when streaming assets in and out of GridFS
+CHUNK_SIZE = 255 * 1024
+
+# base64 characters per decode step (a multiple of 4)
+B64_CHUNK_CHARS = 4 * 64 * 1024
+
+
+class DeployAsset:
+    """Binary deploy files held in GridFS until their deploy job has pushed them"""
+
+    @staticmethod
+    def bucket():
+        return GridFSBucket(db_instance.db, bucket_name='deploy_assets', chunk_size_bytes=CHUNK_SIZE)
+
+    @staticmethod
+    def create_indexes():
+        db_instance.get_collection('deploy_assets.files').create_index('metadata.requestId')
+
+    @staticmethod
+    def put_stream(stream, size: int, path: str, user_id: str, request_id: ObjectId):
+        """Copy a binary stream of known size into GridFS; returns the deploy file reference"""
+        sha = hashlib.sha1(b'blob %d\0' % size)
+        with DeployAsset.bucket().open_upload_stream(path, metadata=DeployAsset.metadata(user_id, request_id)) as upload:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                sha.update(chunk)
+                upload.write(chunk)
+            asset_id = upload._id
+        return { 'path': path, 'assetId': asset_id, 'sha': sha.hexdigest(), 'size': size, 'encoding': 'base64' }
+
+    @staticmethod
+    def put_base64(content: str, path: str, user_id: str, request_id: ObjectId):
+        """Decode base64 content into GridFS piecewise; returns the deploy file reference"""
+        if '\n' in content:
+            content = ''.join(content.split())  # line-wrapped base64
+        size = len(content) * 3 // 4 - content[-2:].count('=')
+        sha = hashlib.sha1(b'blob %d\0' % size)
+        with DeployAsset.bucket().open_upload_stream(path, metadata=DeployAsset.metadata(user_id, request_id)) as upload:
+            for start in range(0, len(content), B64_CHUNK_CHARS):
+                chunk = base64.b64decode(content[start:start + B64_CHUNK_CHARS])
+                sha.update(chunk)
+                upload.write(chunk)
+            asset_id = upload._id
+        return { 'path': path, 'assetId': asset_id, 'sha': sha.hexdigest(), 'size': size, 'encoding': 'base64' }
+
+    @staticmethod
+    def metadata(user_id: str, request_id: ObjectId):
+        return { 'userId': ObjectId(user_id), 'requestId': request_id, 'createdAt': datetime.utcnow() }
+
+    @staticmethod
+    def open(asset_id):
+        """File-like GridOut for an asset"""
+        return DeployAsset.bucket().open_download_stream(asset_id)
+
+    @staticmethod
+    def delete_for_requests(request_ids):
+        """Drop the assets uploaded with these deploy requests"""
+        files = db_instance.get_collection('deploy_assets.files')
+        bucket = DeployAsset.bucket()
+        for doc in files.find({ 'metadata.requestId': { '$in': list(request_ids) } }, { '_id': 1 }):
+            bucket.delete(doc['_id'])
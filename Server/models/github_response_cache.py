@@ -0,0 +1,32 @@
+from datetime import datetime
+from config.database import db_instance
+
+# Entries untouched for this long are dropped by MongoDB's TTL monitor
+CACHE_TTL_SECONDS = 7 * 24 * 3600
+
+
+class GitHubResponseCache:
+    """Shared tier of the GitHub conditional-request cache (see utils.github_cache)"""
+
+    @staticmethod
+    def collection():
+        return db_instance.get_collection('github_response_cache')
+
+    @staticmethod
+    def create_indexes():
+        col = GitHubResponseCache.collection()
+        col.create_index('updatedAt', expireAfterSeconds=CACHE_TTL_SECONDS)
+
+    @staticmethod
+    def get(key: str):
+        col = GitHubResponseCache.collection()
+        return col.find_one({ '_id': key })
+
+    @staticmethod
+    def put(key: str, entry: dict):
+        col = GitHubResponseCache.collection()
+        col.update_one(
+            { '_id': key },
+            { '$set': { **entry, 'updatedAt': datetime.utcnow() } },
+            upsert=True
+        )
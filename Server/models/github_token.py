@@ -1,6 +1,19 @@
+import threading
+import time
 from datetime import datetime
 from bson import ObjectId
 from config.database import db_instance
+from config.settings import get_settings
+from utils import token_crypto
+from utils.token_crypto import TokenDecryptionError
+
+# A looked-up token is served from this process's memory for
+# github.token_cache_seconds. Writes here invalidate it at once; other
+# workers see a change within that time.
+TOKEN_CACHE_MAX_ENTRIES = 10000
+
+_cache = {}
+_cache_lock = threading.Lock()
 
 
 class GitHubTokenStore:
@@ -13,34 +26,108 @@ class GitHubTokenStore:
         col = GitHubTokenStore.collection()
         col.update_one(
             { 'userId': ObjectId(user_id) },
-            { '$set': {
-                'accessToken': access_token,
-                'tokenType': token_type,
-                'scope': scope,
-                'login': login,
-                'updatedAt': datetime.utcnow()
-            }, '$setOnInsert': {
-                'createdAt': datetime.utcnow()
-            }},
+            GitHubTokenStore.upsert_update(access_token, token_type, scope, login),
             upsert=True
         )
+        GitHubTokenStore.cache_token(user_id, {
+            'access_token': access_token, 'token_type': token_type, 'scope': scope, 'login': login
+        })
+
+    @staticmethod
+    def upsert_update(access_token: str, token_type: str, scope: str | None, login: str | None):
+        """Build the update document used by upsert_for_user (encrypts the token if configured)"""
+        update = { '$set': {
+            'tokenType': token_type,
+            'scope': scope,
+            'login': login,
+            'updatedAt': datetime.utcnow()
+        }, '$setOnInsert': {
+            'createdAt': datetime.utcnow()
+        }}
+        if token_crypto.enabled():
+            ciphertext, key_id = token_crypto.encrypt(access_token)
+            update['$set'].update({ 'accessTokenEnc': ciphertext, 'keyId': key_id })
+            update['$unset'] = { 'accessToken': '' }
+        else:
+            update['$set']['accessToken'] = access_token
+            update['$unset'] = { 'accessTokenEnc': '', 'keyId': '' }
+        return update
 
     @staticmethod
     def get_for_user(user_id: str):
+        """The user's token, from this process's cache when fresh"""
+        cached = GitHubTokenStore.cached_token(user_id)
+        if cached:
+            return cached
+
         col = GitHubTokenStore.collection()
         doc = col.find_one({ 'userId': ObjectId(user_id) })
+        token = GitHubTokenStore.to_token(doc)
+        if token:
+            if doc.get('accessToken') and token_crypto.enabled():
+                GitHubTokenStore.encrypt_stored(doc)
+            GitHubTokenStore.cache_token(user_id, token)
+        return token
+
+    @staticmethod
+    def to_token(doc):
+        """Convert a stored token document to the dict returned by get_for_user"""
         if not doc:
             return None
+        access_token = doc.get('accessToken')
+        if doc.get('accessTokenEnc') is not None:
+            try:
+                access_token = token_crypto.decrypt(doc['accessTokenEnc'], doc.get('keyId'))
+            except TokenDecryptionError as e:
+                print(f"❌ Cannot read GitHub token for user {doc.get('userId')}: {e}")
+                return None
         return {
-            'access_token': doc.get('accessToken'),
+            'access_token': access_token,
             'token_type': doc.get('tokenType', 'bearer'),
             'scope': doc.get('scope'),
             'login': doc.get('login')
         }
 
+    @staticmethod
+    def encrypt_stored(doc):
+        """Replace a plaintext token stored before encryption was configured"""
+        col = GitHubTokenStore.collection()
+        ciphertext, key_id = token_crypto.encrypt(doc['accessToken'])
+        col.update_one(
+            { '_id': doc['_id'], 'accessToken': doc['accessToken'] },
+            { '$set': { 'accessTokenEnc': ciphertext, 'keyId': key_id }, '$unset': { 'accessToken': '' } }
+        )
+
+    @staticmethod
+    def cached_token(user_id: str):
+        """The user's token from this process's cache, or None if missing or stale"""
+        with _cache_lock:
+            entry = _cache.get(str(user_id))
+        if entry and entry[0] > time.monotonic():
+            return dict(entry[1])
+        return None
+
+    @staticmethod
+    def cache_token(user_id: str, token: dict):
+        ttl = get_settings().github.token_cache_seconds
+        now = time.monotonic()
+        with _cache_lock:
+            if len(_cache) >= TOKEN_CACHE_MAX_ENTRIES:
+                for key in [k for k, (expires, _) in _cache.items() if expires <= now]:
+                    del _cache[key]
+                if len(_cache) >= TOKEN_CACHE_MAX_ENTRIES:
+                    del _cache[next(iter(_cache))]
+            _cache[str(user_id)] = (now + ttl, dict(token))
+
+    @staticmethod
+    def invalidate(user_id: str):
+        """Drop the user's token from this process's cache"""
+        with _cache_lock:
+            _cache.pop(str(user_id), None)
+
     @staticmethod
     def delete_for_user(user_id: str):
         """Delete a user's GitHub token."""
         col = GitHubTokenStore.collection()
+        GitHubTokenStore.invalidate(user_id)
         return col.delete_one({ 'userId': ObjectId(user_id) })
-
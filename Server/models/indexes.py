@@ -0,0 +1,18 @@
+from models.user import User
+from models.portfolio import Portfolio
+from models.portfolio_revision import PortfolioRevision
+from models.github_response_cache import GitHubResponseCache
+from models.site_deployment import SiteDeployment
+from models.deploy_asset import DeployAsset
+from models.data_key import DataKey
+
+
+def ensure_indexes():
+    """Create all collection indexes (safe to call on every startup)"""
+    User.get_collection().create_index('email', unique=True)
+    Portfolio.create_indexes()
+    PortfolioRevision.create_indexes()
+    GitHubResponseCache.create_indexes()
+    SiteDeployment.create_indexes()
+    DeployAsset.create_indexes()
+    DataKey.create_indexes()
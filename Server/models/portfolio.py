@@ -1,7 +1,24 @@
 from datetime import datetime
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, InsertOne, UpdateOne, DeleteOne
+import base64
 from config.database import db_instance
 
+# Fields a client may change through PUT /api/portfolio/<id>
+UPDATABLE_FIELDS = ('name', 'template', 'status', 'url', 'githubRepo')
+
+PORTFOLIO_STATUSES = ('draft', 'building', 'deployed', 'failed')
+
+# Operations accepted by POST /api/portfolio/bulk
+BULK_OPS = ('create', 'update', 'delete', 'status')
+
+# Projection for summary responses (leaves out the heavy html/data/content fields)
+SUMMARY_PROJECTION = {'html': 0, 'data': 0, 'content': 0}
+
+# Listing order; (createdAt, _id) is the keyset used by pagination cursors
+LIST_SORT = [('createdAt', DESCENDING), ('_id', DESCENDING)]
+
 class Portfolio:
     def __init__(self, user_id, name, template, status='draft', url=None, github_repo=None, data=None, html=None):
         self.user_id = user_id
@@ -23,9 +40,9 @@ class Portfolio:
         """Get the portfolios collection"""
         return db_instance.get_collection('portfolios')
     
-    def save(self):
-        """Save portfolio to database"""
-        portfolio_doc = {
+    def to_document(self):
+        """Build the MongoDB document for this portfolio"""
+        return {
             'userId': ObjectId(self.user_id),
             'name': self.name,
             'template': self.template,
@@ -40,16 +57,68 @@ class Portfolio:
             'html': self.html,
             'settings': self.settings
         }
-        
+    
+    def save(self):
+        """Save portfolio to database"""
         collection = self.get_collection()
-        result = collection.insert_one(portfolio_doc)
+        result = collection.insert_one(self.to_document())
         return result.inserted_id
     
     @staticmethod
-    def find_by_user_id(user_id):
-        """Find all portfolios for a user"""
+    def create_indexes():
+        """Create indexes backing the per-user listing queries"""
+        collection = Portfolio.get_collection()
+        collection.create_index([('userId', ASCENDING)] + LIST_SORT)
+        collection.create_index([('userId', ASCENDING), ('status', ASCENDING)] + LIST_SORT)
+        collection.create_index([('userId', ASCENDING), ('template', ASCENDING)] + LIST_SORT)
+    
+    @staticmethod
+    def find_by_user_id(user_id, limit=None, cursor=None, status=None, template=None, projection=None):
+        """Find portfolios for a user, newest first
+        
+        With a limit, returns one page; pass the cursor from
+        Portfolio.encode_cursor(last_doc) to fetch the page after it.
+        """
         collection = Portfolio.get_collection()
-        return list(collection.find({'userId': ObjectId(user_id)}).sort('createdAt', -1))
+        query = Portfolio.user_query(user_id, cursor, status, template)
+        
+        results = collection.find(query, projection).sort(LIST_SORT)
+        if limit:
+            results = results.limit(limit)
+        return list(results)
+    
+    @staticmethod
+    def user_query(user_id, cursor=None, status=None, template=None):
+        """Build the listing filter used by find_by_user_id"""
+        query = {'userId': ObjectId(user_id)}
+        
+        if status:
+            query['status'] = status
+        if template:
+            query['template'] = template
+        if cursor:
+            created_at, last_id = Portfolio.decode_cursor(cursor)
+            query['$or'] = [
+                {'createdAt': {'$lt': created_at}},
+                {'createdAt': created_at, '_id': {'$lt': last_id}}
+            ]
+        return query
+    
+    @staticmethod
+    def encode_cursor(portfolio_doc):
+        """Build an opaque pagination cursor pointing after this document"""
+        raw = f"{portfolio_doc['createdAt'].isoformat()}|{portfolio_doc['_id']}"
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+    
+    @staticmethod
+    def decode_cursor(cursor):
+        """Decode a pagination cursor into (createdAt, _id); raises ValueError if malformed"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+            created_at, last_id = raw.split('|', 1)
+            return datetime.fromisoformat(created_at), ObjectId(last_id)
+        except (ValueError, InvalidId, UnicodeError) as e:
+            raise ValueError('Invalid cursor') from e
     
     @staticmethod
     def find_by_id(portfolio_id):
@@ -70,6 +139,23 @@ class Portfolio:
     def update_status(portfolio_id, status, url=None, github_repo=None):
         """Update portfolio status"""
         collection = Portfolio.get_collection()
+        collection.update_one(
+            {'_id': ObjectId(portfolio_id)},
+            {'$set': Portfolio.status_update(status, url, github_repo)}
+        )
+    
+    @staticmethod
+    def restore_status(portfolio_id, status):
+        """Set a 'building' portfolio back to status (a no-op if it has moved on since)"""
+        collection = Portfolio.get_collection()
+        collection.update_one(
+            {'_id': ObjectId(portfolio_id), 'status': 'building'},
+            {'$set': {'status': status, 'updatedAt': datetime.utcnow()}}
+        )
+    
+    @staticmethod
+    def status_update(status, url=None, github_repo=None):
+        """Build the $set document for a status change"""
         update_data = {
             'status': status,
             'updatedAt': datetime.utcnow()
@@ -81,11 +167,7 @@ class Portfolio:
             update_data['githubRepo'] = github_repo
         if status == 'deployed':
             update_data['lastDeployed'] = datetime.utcnow()
-        
-        collection.update_one(
-            {'_id': ObjectId(portfolio_id)},
-            {'$set': update_data}
-        )
+        return update_data
     
     @staticmethod
     def update_content(portfolio_id, content, settings=None):
@@ -115,6 +197,40 @@ class Portfolio:
             {'$set': update_data}
         )
     
+    @staticmethod
+    def update_fields(portfolio_id, user_id, fields):
+        """Set the whitelisted fields that differ from the stored portfolio.
+
+        Returns the updated document without html/data/content, or None if
+        not found. When nothing changes, nothing is written (updatedAt stays).
+        Raises ValueError if a field value is invalid.
+        """
+        collection = Portfolio.get_collection()
+        update_data = Portfolio.validate_fields({k: v for k, v in fields.items() if k in UPDATABLE_FIELDS})
+        owner_filter = {'_id': ObjectId(portfolio_id), 'userId': ObjectId(user_id)}
+        
+        current = collection.find_one(owner_filter, SUMMARY_PROJECTION)
+        if not current:
+            return None
+        update_data = {k: v for k, v in update_data.items() if current.get(k) != v}
+        if not update_data:
+            return current
+        update_data['updatedAt'] = datetime.utcnow()
+        
+        return collection.find_one_and_update(
+            owner_filter,
+            {'$set': update_data},
+            projection=SUMMARY_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+    
+    @staticmethod
+    def validate_fields(fields):
+        """Check client-supplied field values (PUT and bulk); returns fields or raises ValueError"""
+        if 'status' in fields and fields['status'] not in PORTFOLIO_STATUSES:
+            raise ValueError(f"status must be one of: {', '.join(PORTFOLIO_STATUSES)}")
+        return fields
+    
     @staticmethod
     def delete_portfolio(portfolio_id, user_id):
         """Delete portfolio (only if owned by user)"""
@@ -125,6 +241,73 @@ class Portfolio:
         })
         return result.deleted_count > 0
     
+    @staticmethod
+    def find_owned_ids(portfolio_ids, user_id):
+        """Return the subset of portfolio_ids (ObjectIds) owned by the user"""
+        collection = Portfolio.get_collection()
+        docs = collection.find(
+            {'_id': {'$in': list(portfolio_ids)}, 'userId': ObjectId(user_id)},
+            {'_id': 1}
+        )
+        return {doc['_id'] for doc in docs}
+    
+    @staticmethod
+    def to_bulk_request(user_id, item):
+        """Convert one bulk API item into (pymongo write model, portfolio ID)
+        
+        Raises ValueError when the item is malformed.
+        """
+        op = item.get('op')
+        if op not in BULK_OPS:
+            raise ValueError(f"op must be one of: {', '.join(BULK_OPS)}")
+        
+        if op == 'create':
+            if not item.get('name') or not item.get('template'):
+                raise ValueError('name and template are required')
+            status = Portfolio.validate_fields({'status': item.get('status', 'draft')})['status']
+            portfolio = Portfolio(
+                user_id=user_id,
+                name=item['name'],
+                template=item['template'],
+                status=status,
+                url=item.get('url'),
+                github_repo=item.get('githubRepo')
+            )
+            document = portfolio.to_document()
+            document['_id'] = ObjectId()
+            return InsertOne(document), str(document['_id'])
+        
+        portfolio_id = Portfolio.parse_id(item.get('id'))
+        owner_filter = {'_id': portfolio_id, 'userId': ObjectId(user_id)}
+        
+        if op == 'delete':
+            return DeleteOne(owner_filter), str(portfolio_id)
+        
+        if op == 'status':
+            Portfolio.validate_fields({'status': item.get('status')})
+            return UpdateOne(owner_filter, {'$set': Portfolio.status_update(item['status'])}), str(portfolio_id)
+        
+        fields = {k: v for k, v in (item.get('fields') or {}).items() if k in UPDATABLE_FIELDS}
+        if not fields:
+            raise ValueError(f"fields must include one of: {', '.join(UPDATABLE_FIELDS)}")
+        Portfolio.validate_fields(fields)
+        fields['updatedAt'] = datetime.utcnow()
+        return UpdateOne(owner_filter, {'$set': fields}), str(portfolio_id)
+    
+    @staticmethod
+    def parse_id(portfolio_id):
+        """Parse a portfolio ID string; raises ValueError if invalid"""
+        try:
+            return ObjectId(portfolio_id)
+        except (InvalidId, TypeError) as e:
+            raise ValueError('Invalid portfolio id') from e
+    
+    @staticmethod
+    def bulk_write(requests, ordered=True):
+        """Run write models in one round trip (raises BulkWriteError on write errors)"""
+        collection = Portfolio.get_collection()
+        return collection.bulk_write(requests, ordered=ordered)
+    
     @staticmethod
     def count_by_user(user_id):
         """Count portfolios for a user"""
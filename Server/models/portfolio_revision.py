@@ -0,0 +1,190 @@
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
+from config.database import db_instance
+from utils.revision_diff import json_diff, json_patch_apply, text_diff, text_patch_apply
+
+# Store a full copy every N revisions so reconstruction replays at most N-1 deltas
+SNAPSHOT_INTERVAL = 10
+
+# Retention: number of most recent revisions kept per portfolio
+MAX_REVISIONS = 50
+
+# Tries to claim a revision number when concurrent changes keep taking it
+RECORD_ATTEMPTS = 5
+
+
+class PortfolioRevision:
+    """History of a portfolio's data/html, stored as snapshots plus deltas.
+
+    Revision 1 is always a snapshot. Every later revision holds either a full
+    snapshot (each SNAPSHOT_INTERVAL revisions) or a delta from the revision
+    before it: a JSON Patch for data and a line delta for html.
+    """
+
+    @staticmethod
+    def collection():
+        return db_instance.get_collection('portfolio_revisions')
+
+    @staticmethod
+    def create_indexes():
+        col = PortfolioRevision.collection()
+        col.create_index([('portfolioId', ASCENDING), ('rev', DESCENDING)], unique=True)
+
+    @staticmethod
+    def latest_rev(portfolio_id: str):
+        col = PortfolioRevision.collection()
+        doc = col.find_one(
+            { 'portfolioId': ObjectId(portfolio_id) },
+            { 'rev': 1 },
+            sort=[('rev', DESCENDING)]
+        )
+        return doc['rev'] if doc else 0
+
+    @staticmethod
+    def record(portfolio_id: str, user_id: str, prev_data, prev_html, data, html, note: str | None = None):
+        """Record a change from (prev_data, prev_html) to (data, html).
+
+        prev_* must be the portfolio's stored content before the change, which
+        is also the content of the latest revision. Returns the new revision number.
+
+        The (portfolioId, rev) index is unique: if a concurrent change claims
+        the number first, the next one is taken.
+        """
+        col = PortfolioRevision.collection()
+        for attempt in range(RECORD_ATTEMPTS):
+            latest = PortfolioRevision.latest_rev(portfolio_id)
+
+            if latest == 0:
+                # First change: keep the original content as the base snapshot
+                try:
+                    col.insert_one(PortfolioRevision._snapshot_doc(portfolio_id, user_id, 1, prev_data, prev_html, 'Initial version'))
+                except DuplicateKeyError:
+                    # A concurrent change recorded it first
+                    if attempt == RECORD_ATTEMPTS - 1:
+                        raise
+                    continue
+                latest = 1
+
+            rev = latest + 1
+            # After losing a race the latest revision is another change, not
+            # prev_*, so a delta from prev_* wouldn't apply: store a snapshot
+            if attempt or (rev - 1) % SNAPSHOT_INTERVAL == 0:
+                doc = PortfolioRevision._snapshot_doc(portfolio_id, user_id, rev, data, html, note)
+            else:
+                doc = {
+                    'portfolioId': ObjectId(portfolio_id),
+                    'userId': ObjectId(user_id),
+                    'rev': rev,
+                    'kind': 'delta',
+                    'dataPatch': json_diff(prev_data, data),
+                    'htmlDelta': text_diff(prev_html, html),
+                    'note': note,
+                    'createdAt': datetime.utcnow()
+                }
+            try:
+                col.insert_one(doc)
+                break
+            except DuplicateKeyError:
+                if attempt == RECORD_ATTEMPTS - 1:
+                    raise
+
+        PortfolioRevision.prune(portfolio_id)
+        return rev
+
+    @staticmethod
+    def list_for_portfolio(portfolio_id: str, user_id: str):
+        """List revision metadata, newest first (without content)"""
+        col = PortfolioRevision.collection()
+        return list(col.find(
+            { 'portfolioId': ObjectId(portfolio_id), 'userId': ObjectId(user_id) },
+            { 'rev': 1, 'kind': 1, 'note': 1, 'createdAt': 1 }
+        ).sort('rev', DESCENDING))
+
+    @staticmethod
+    def reconstruct(portfolio_id: str, user_id: str, rev: int):
+        """Rebuild (data, html) as of a revision, or None if it doesn't exist"""
+        col = PortfolioRevision.collection()
+        query = { 'portfolioId': ObjectId(portfolio_id), 'userId': ObjectId(user_id) }
+
+        base = col.find_one(
+            { **query, 'kind': 'snapshot', 'rev': { '$lte': rev } },
+            sort=[('rev', DESCENDING)]
+        )
+        if not base:
+            return None
+
+        data, html = base.get('data'), base.get('html')
+        if base['rev'] == rev:
+            return data, html
+
+        deltas = list(col.find(
+            { **query, 'rev': { '$gt': base['rev'], '$lte': rev } }
+        ).sort('rev', ASCENDING))
+        if not deltas or deltas[-1]['rev'] != rev:
+            return None
+
+        for delta in deltas:
+            data = json_patch_apply(data, delta.get('dataPatch', []))
+            html = text_patch_apply(html, delta.get('htmlDelta', []))
+        return data, html
+
+    @staticmethod
+    def prune(portfolio_id: str, keep: int = MAX_REVISIONS):
+        """Drop revisions beyond the retention window.
+
+        If the oldest kept revision is a delta it is rewritten as a snapshot
+        first, so every kept revision stays reconstructable.
+        """
+        col = PortfolioRevision.collection()
+        latest = PortfolioRevision.latest_rev(portfolio_id)
+        cutoff = latest - keep + 1
+        if cutoff <= 1:
+            return
+
+        oldest = col.find_one({ 'portfolioId': ObjectId(portfolio_id), 'rev': cutoff })
+        if oldest and oldest['kind'] == 'delta':
+            content = PortfolioRevision.reconstruct(portfolio_id, str(oldest['userId']), cutoff)
+            if content is None:
+                return
+            data, html = content
+            col.update_one(
+                { '_id': oldest['_id'] },
+                { '$set': { 'kind': 'snapshot', 'data': data, 'html': html },
+                  '$unset': { 'dataPatch': '', 'htmlDelta': '' } }
+            )
+
+        col.delete_many({ 'portfolioId': ObjectId(portfolio_id), 'rev': { '$lt': cutoff } })
+
+    @staticmethod
+    def delete_for_portfolio(portfolio_id: str):
+        col = PortfolioRevision.collection()
+        return col.delete_many({ 'portfolioId': ObjectId(portfolio_id) })
+
+    @staticmethod
+    def delete_for_portfolios(portfolio_ids):
+        col = PortfolioRevision.collection()
+        return col.delete_many({ 'portfolioId': { '$in': [ObjectId(p) for p in portfolio_ids] } })
+
+    @staticmethod
+    def _snapshot_doc(portfolio_id, user_id, rev, data, html, note):
+        return {
+            'portfolioId': ObjectId(portfolio_id),
+            'userId': ObjectId(user_id),
+            'rev': rev,
+            'kind': 'snapshot',
+            'data': data,
+            'html': html,
+            'note': note,
+            'createdAt': datetime.utcnow()
+        }
+
+    @staticmethod
+    def to_dict(doc):
+        return {
+            'rev': doc['rev'],
+            'kind': doc.get('kind'),
+            'note': doc.get('note'),
+            'createdAt': doc['createdAt'].isoformat() if doc.get('createdAt') else None
+        }
@@ -1,32 +1,380 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from config.database import db_instance
 
+# Deploy job states, in pipeline order (see utils.deploy_pipeline)
+JOB_ACTIVE_STATES = ('queued', 'creating_repo', 'uploading', 'committing', 'enabling_pages')
+JOB_TERMINAL_STATES = ('live', 'failed')
+
+# States in which a job has not read its files yet, so newer content can be swapped in
+JOB_MERGEABLE_STATES = ('queued', 'creating_repo')
+
+# Pages build states (from page_build webhooks; deployment_status events are mapped onto them)
+PAGES_BUILD_STATES = ('queued', 'building', 'built', 'errored')
+PAGES_FINAL_STATES = ('built', 'errored')
+
 
 class SiteDeployment:
     @staticmethod
     def collection():
         return db_instance.get_collection('site_deployments')
 
+    @staticmethod
+    def create_indexes():
+        col = SiteDeployment.collection()
+        col.create_index([('userId', ASCENDING), ('repo', ASCENDING)], unique=True)
+        col.create_index('job.id', sparse=True)
+        col.create_index('job.state', sparse=True)
+        col.create_index([('owner', ASCENDING), ('repo', ASCENDING)], sparse=True)
+        col.create_index('pages.status', sparse=True)
+
     @staticmethod
     def upsert(user_id: str, repo: str, branch: str, url: str | None, last_commit: str | None):
         col = SiteDeployment.collection()
         col.update_one(
             { 'userId': ObjectId(user_id), 'repo': repo },
-            { '$set': {
-                'branch': branch,
-                'url': url,
-                'lastCommit': last_commit,
-                'updatedAt': datetime.utcnow()
-            }, '$setOnInsert': {
-                'createdAt': datetime.utcnow()
-            }},
+            SiteDeployment.upsert_update(branch, url, last_commit),
             upsert=True
         )
 
+    @staticmethod
+    def upsert_update(branch: str, url: str | None, last_commit: str | None):
+        """Build the update document used by upsert"""
+        return { '$set': {
+            'branch': branch,
+            'url': url,
+            'lastCommit': last_commit,
+            'updatedAt': datetime.utcnow()
+        }, '$setOnInsert': {
+            'createdAt': datetime.utcnow()
+        }}
+
     @staticmethod
     def get(user_id: str, repo: str):
         col = SiteDeployment.collection()
         return col.find_one({ 'userId': ObjectId(user_id), 'repo': repo })
 
+    @staticmethod
+    def save_repo_meta(user_id: str, repo: str, **fields):
+        """Remember repo facts (existence, default branch, head/tree SHA, blob SHAs) for the next deploy"""
+        col = SiteDeployment.collection()
+        col.update_one(
+            { 'userId': ObjectId(user_id), 'repo': repo },
+            { '$set': { **{ f'meta.{k}': v for k, v in fields.items() }, 'updatedAt': datetime.utcnow() } }
+        )
+
+    @staticmethod
+    def clear_repo_meta(user_id: str, repo: str, fields: tuple = ()):
+        """Forget the given meta fields, or all of them"""
+        col = SiteDeployment.collection()
+        unset = { f'meta.{k}': '' for k in fields } if fields else { 'meta': '' }
+        col.update_one({ 'userId': ObjectId(user_id), 'repo': repo }, { '$unset': unset })
+
+    @staticmethod
+    def pages_build_started(user_id: str, repo: str, owner: str, commit: str | None):
+        """Record that a push started a Pages build; webhooks (or the reconciler) report how it ends"""
+        col = SiteDeployment.collection()
+        now = datetime.utcnow()
+        col.update_one(
+            { 'userId': ObjectId(user_id), 'repo': repo },
+            { '$set': { 'owner': owner.lower(), 'pages.status': 'building', 'pages.commit': commit, 'pages.source': 'deploy',
+                        'pages.startedAt': now, 'pages.updatedAt': now, 'pages.eventAt': None, 'pages.checkedAt': None },
+              '$unset': { 'pages.error': '' } }
+        )
+
+    @staticmethod
+    def apply_pages_event(owner: str, repo: str, status: str, event_at: datetime, source: str, **fields):
+        """
+        Set the Pages build status of owner/repo from a webhook or reconciler check
+
+        Events older than the one already applied are ignored (deliveries can
+        arrive out of order), as are events for a commit other than the one
+        whose build was last started (a late report on the previous build).
+        Returns the number of records updated.
+        """
+        col = SiteDeployment.collection()
+        update = { '$set': { 'pages.status': status, 'pages.source': source, 'pages.eventAt': event_at,
+                             'pages.updatedAt': datetime.utcnow(), **{ f'pages.{k}': v for k, v in fields.items() } } }
+        if 'error' not in fields:
+            update['$unset'] = { 'pages.error': '' }
+        query = { 'owner': owner.lower(), 'repo': repo,
+                  '$and': [{ '$or': [{ 'pages.eventAt': None }, { 'pages.eventAt': { '$lte': event_at } }] }] }
+        if fields.get('commit'):
+            query['$and'].append({ '$or': [{ 'pages.commit': None }, { 'pages.commit': fields['commit'] }] })
+        result = col.update_many(query, update)
+        return result.modified_count
+
+    @staticmethod
+    def claim_pages_check(checked_before: datetime, started_before: datetime, started_after: datetime):
+        """
+        Take one unfinished Pages build started between started_after and
+        started_before that nobody has checked since checked_before
+
+        Marks it checked so other workers' reconcilers skip it.
+        """
+        col = SiteDeployment.collection()
+        return col.find_one_and_update(
+            { 'owner': { '$exists': True }, 'pages.status': { '$nin': [None, *PAGES_FINAL_STATES] },
+              'pages.startedAt': { '$gt': started_after, '$lt': started_before },
+              '$or': [{ 'pages.checkedAt': None }, { 'pages.checkedAt': { '$lt': checked_before } }] },
+            { '$set': { 'pages.checkedAt': datetime.utcnow() } },
+            return_document=ReturnDocument.AFTER
+        )
+
+    @staticmethod
+    def pages_to_dict(doc):
+        """Pages status as stored locally (no GitHub call)"""
+        pages = (doc or {}).get('pages') or {}
+        updated = pages.get('eventAt') or pages.get('updatedAt')
+        return {
+            'enabled': bool(pages),
+            'status': pages.get('status'),
+            'error': pages.get('error'),
+            'commit': pages.get('commit'),
+            'cname': pages.get('cname'),
+            'html_url': pages.get('htmlUrl') or (doc or {}).get('url'),
+            'last_commit': (doc or {}).get('lastCommit'),
+            'url': (doc or {}).get('url'),
+            'source': pages.get('source'),
+            'updatedAt': updated.isoformat() if updated else None
+        }
+
+    @staticmethod
+    def new_job(request: dict):
+        """A queued job publishing this deploy request"""
+        now = datetime.utcnow()
+        return { **request, 'id': ObjectId(), 'requests': [request['requestId']], 'portfolios': SiteDeployment.request_portfolios(request),
+                 'state': 'queued', 'history': [{ 'state': 'queued', 'at': now }], 'queuedAt': now,
+                 'leaseOwner': None, 'leaseUntil': None }
+
+    @staticmethod
+    def request_portfolios(request: dict):
+        """The portfolio a request deploys, with its status from before the request (for job.portfolios)"""
+        if not request.get('portfolioId'):
+            return []
+        return [{ 'id': request['portfolioId'], 'previousStatus': request.get('portfolioStatus') }]
+
+    @staticmethod
+    def replace_job(job: dict):
+        """Pipeline update installing job and keeping the finished one as previousJob.
+
+        Requests (and portfolios) still waiting in pending are folded into the new job.
+        """
+        return [
+            { '$set': { 'previousJob': '$job', 'job': { '$literal': job }, 'updatedAt': '$$NOW',
+                        'createdAt': { '$ifNull': ['$createdAt', '$$NOW'] } } },
+            { '$set': { 'job.requests': { '$concatArrays': [{ '$ifNull': ['$pending.requests', []] }, '$job.requests'] },
+                        'job.portfolios': { '$concatArrays': [{ '$ifNull': ['$pending.portfolios', []] }, '$job.portfolios'] } } },
+            { '$unset': ['previousJob.files', 'pending'] }
+        ]
+
+    @staticmethod
+    def start_job(user_id: str, repo: str, request: dict):
+        """Start a job for a deploy request on the (user, repo) record.
+
+        Returns the record, or None if a job for this repo is still active.
+        """
+        col = SiteDeployment.collection()
+        try:
+            return col.find_one_and_update(
+                { 'userId': ObjectId(user_id), 'repo': repo, 'job.state': { '$nin': list(JOB_ACTIVE_STATES) } },
+                SiteDeployment.replace_job(SiteDeployment.new_job(request)),
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # The unique (userId, repo) index rejects the upsert while a job is active
+            return None
+
+    @staticmethod
+    def merge_into_job(user_id: str, repo: str, request: dict):
+        """Swap a newer request's content into the active job if it hasn't read its files yet.
+
+        job.portfolios keeps every portfolio folded in, so the ones that end up
+        not published can be reset when the job finishes.
+        Returns the record, or None if the job is past that point (or finished).
+        """
+        col = SiteDeployment.collection()
+        return col.find_one_and_update(
+            { 'userId': ObjectId(user_id), 'repo': repo, 'job.state': { '$in': list(JOB_MERGEABLE_STATES) } },
+            { '$set': { **{ f'job.{k}': v for k, v in request.items() }, 'updatedAt': datetime.utcnow() },
+              '$push': { 'job.requests': request['requestId'],
+                         'job.portfolios': { '$each': SiteDeployment.request_portfolios(request) } } },
+            return_document=ReturnDocument.AFTER
+        )
+
+    @staticmethod
+    def set_pending(user_id: str, repo: str, request: dict):
+        """Queue a request behind the active job, replacing any request already waiting there.
+
+        Returns the record, or None if no job is active any more.
+        """
+        col = SiteDeployment.collection()
+        return col.find_one_and_update(
+            { 'userId': ObjectId(user_id), 'repo': repo, 'job.state': { '$in': list(JOB_ACTIVE_STATES) } },
+            { '$set': { **{ f'pending.{k}': v for k, v in request.items() }, 'updatedAt': datetime.utcnow() },
+              '$push': { 'pending.requests': request['requestId'],
+                         'pending.portfolios': { '$each': SiteDeployment.request_portfolios(request) } } },
+            return_document=ReturnDocument.AFTER
+        )
+
+    @staticmethod
+    def promote_pending(user_id: str, repo: str):
+        """Turn the waiting request into the next job once the current one has finished.
+
+        Returns the record with the new job, or None if nothing is waiting.
+        """
+        col = SiteDeployment.collection()
+        query = { 'userId': ObjectId(user_id), 'repo': repo, 'pending': { '$exists': True },
+                  'job.state': { '$in': list(JOB_TERMINAL_STATES) } }
+        while True:
+            doc = col.find_one(query)
+            if not doc:
+                return None
+            pending = doc['pending']
+            job = SiteDeployment.new_job({ k: v for k, v in pending.items() if k not in ('requests', 'portfolios') })
+            job['requests'], job['portfolios'] = [], []  # replace_job fills these in from pending
+            promoted = col.find_one_and_update(
+                { **query, '_id': doc['_id'], 'pending.requestId': pending['requestId'] },
+                SiteDeployment.replace_job(job),
+                return_document=ReturnDocument.AFTER
+            )
+            if promoted:
+                return promoted
+            # A newer request replaced pending meanwhile; try again with it
+
+    @staticmethod
+    def find_orphaned_pending():
+        """Records with a waiting request but no active job (e.g. a worker died while finishing)"""
+        col = SiteDeployment.collection()
+        return list(col.find(
+            { 'pending': { '$exists': True }, 'job.state': { '$in': list(JOB_TERMINAL_STATES) } },
+            { 'userId': 1, 'repo': 1 }
+        ))
+
+    @staticmethod
+    def get_job(deploy_id: str, user_id: str | None = None):
+        """Find the record for a job id or any deploy request id it covers"""
+        col = SiteDeployment.collection()
+        oid = ObjectId(deploy_id)
+        query = { '$or': [
+            { 'job.id': oid }, { 'job.requests': oid }, { 'pending.requests': oid },
+            { 'previousJob.id': oid }, { 'previousJob.requests': oid }
+        ]}
+        if user_id:
+            query['userId'] = ObjectId(user_id)
+        return col.find_one(query)
+
+    @staticmethod
+    def claim_job(job_id: str, owner: str, lease_seconds: int):
+        """Lease an active job to one worker; returns the record or None if someone else holds it"""
+        col = SiteDeployment.collection()
+        now = datetime.utcnow()
+        return col.find_one_and_update(
+            { 'job.id': ObjectId(job_id), 'job.state': { '$in': list(JOB_ACTIVE_STATES) },
+              '$or': [{ 'job.leaseUntil': None }, { 'job.leaseUntil': { '$lt': now } }, { 'job.leaseOwner': owner }] },
+            { '$set': { 'job.leaseOwner': owner, 'job.leaseUntil': now + timedelta(seconds=lease_seconds) } },
+            return_document=ReturnDocument.AFTER
+        )
+
+    @staticmethod
+    def update_job(job_id: str, owner: str, expected_state: str, state: str | None = None, lease_seconds: int = 0,
+                   unset: tuple = (), **fields):
+        """Set job fields; with state, also record the transition.
+
+        Only applies while owner holds the job's lease and the job is still in
+        expected_state, so a worker whose lease ran out (and was taken over)
+        can't overwrite the new owner's progress. lease_seconds extends the
+        lease; otherwise it is released.
+
+        Returns False if the write was fenced off (the lease was lost).
+        """
+        col = SiteDeployment.collection()
+        now = datetime.utcnow()
+        update = { '$set': { **{ f'job.{k}': v for k, v in fields.items() }, 'updatedAt': now } }
+        update['$set']['job.leaseUntil'] = now + timedelta(seconds=lease_seconds) if lease_seconds else None
+        if state:
+            update['$set']['job.state'] = state
+            update['$push'] = { 'job.history': { 'state': state, 'at': now } }
+        if unset:
+            update['$unset'] = { f'job.{k}': '' for k in unset }
+        result = col.update_one({ 'job.id': ObjectId(job_id), 'job.leaseOwner': owner, 'job.state': expected_state }, update)
+        return result.matched_count > 0
+
+    @staticmethod
+    def renew_lease(job_id: str, owner: str, expected_state: str, lease_seconds: int):
+        """Extend owner's lease on a job still in expected_state; False if the lease was lost"""
+        col = SiteDeployment.collection()
+        result = col.update_one(
+            { 'job.id': ObjectId(job_id), 'job.leaseOwner': owner, 'job.state': expected_state },
+            { '$set': { 'job.leaseUntil': datetime.utcnow() + timedelta(seconds=lease_seconds) } }
+        )
+        return result.matched_count > 0
+
+    @staticmethod
+    def find_resumable_jobs():
+        """Active jobs nobody holds a lease on (e.g. after a worker restart)"""
+        col = SiteDeployment.collection()
+        return list(col.find(
+            { 'job.state': { '$in': list(JOB_ACTIVE_STATES) },
+              '$or': [{ 'job.leaseUntil': None }, { 'job.leaseUntil': { '$lt': datetime.utcnow() } }] },
+            { 'job.id': 1 }
+        ))
+
+    @staticmethod
+    def job_to_dict(doc, deploy_id: str | None = None):
+        """
+        Describe the job (or waiting request) a deploy id refers to
+
+        Without deploy_id, describes the current job. requestId is the request
+        asked about; publishedRequestId is the request whose content the job
+        publishes, so superseded is True when a newer deploy replaced it.
+        """
+        if not doc:
+            return None
+        oid = ObjectId(deploy_id) if deploy_id else None
+
+        pending = doc.get('pending')
+        if oid and pending and oid in pending.get('requests', []):
+            return {
+                'id': None,
+                'repo': doc.get('repo'),
+                'state': 'pending',
+                'url': pending.get('url'),
+                'requestId': str(oid),
+                'publishedRequestId': str(pending['requestId']),
+                'superseded': oid != pending['requestId'],
+                'coalesced': len(pending.get('requests', [])),
+                'waitingFor': str(doc['job']['id'])
+            }
+
+        job = doc.get('job')
+        previous = doc.get('previousJob')
+        if oid and previous and (oid == previous.get('id') or oid in previous.get('requests', [])):
+            job = previous
+        if not job:
+            return None
 
+        published = job.get('requestId')
+        asked = oid if oid and oid != job['id'] else published
+        return {
+            'id': str(job['id']),
+            'repo': doc.get('repo'),
+            'state': job.get('state'),
+            'url': job.get('url'),
+            'commit': job.get('commit'),
+            'changed': job.get('changed'),
+            'pagesEnabled': job.get('pagesEnabled'),
+            'error': job.get('error'),
+            'portfolioId': str(job['portfolioId']) if job.get('portfolioId') else None,
+            'requestId': str(asked) if asked else None,
+            'publishedRequestId': str(published) if published else None,
+            'superseded': bool(asked and published and asked != published),
+            'coalesced': len(job.get('requests', [])),
+            'history': [{ 'state': h['state'], 'at': h['at'].isoformat() } for h in job.get('history', [])],
+            'queuedAt': job['queuedAt'].isoformat() if job.get('queuedAt') else None,
+            'finishedAt': job['finishedAt'].isoformat() if job.get('finishedAt') else None,
+            'pagesBuild': (doc.get('pages') or {}).get('status') if job is doc.get('job') else None
+        }
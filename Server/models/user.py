@@ -17,9 +17,9 @@ class User:
         """Get the users collection"""
         return db_instance.get_collection('users')
     
-    def save(self):
-        """Save user to database"""
-        user_doc = {
+    def to_document(self):
+        """Build the MongoDB document for this user"""
+        return {
             'name': self.name,
             'email': self.email,
             'password': self.password,
@@ -28,9 +28,11 @@ class User:
             'updatedAt': self.updated_at,
             'lastLogin': self.last_login
         }
-        
+    
+    def save(self):
+        """Save user to database"""
         collection = self.get_collection()
-        result = collection.insert_one(user_doc)
+        result = collection.insert_one(self.to_document())
         return result.inserted_id
     
     @staticmethod
@@ -63,6 +65,16 @@ class User:
             {'$set': {'githubConnected': connected, 'updatedAt': datetime.utcnow()}}
         )
     
+    @staticmethod
+    def record_github_login(user_id):
+        """Mark the user GitHub-connected and update their last login time (one write)"""
+        collection = User.get_collection()
+        now = datetime.utcnow()
+        collection.update_one(
+            {'_id': ObjectId(user_id)},
+            {'$set': {'githubConnected': True, 'lastLogin': now, 'updatedAt': now}}
+        )
+    
     @staticmethod
     def to_dict(user_doc):
         """Convert user document to dictionary (without password)"""
@@ -17,11 +17,15 @@ from utils.document_parser import (
     validate_resume_size
 )
 from models.portfolio import Portfolio
+from models.portfolio_revision import PortfolioRevision
 from datetime import datetime
 import json
+import logging
 import time
 import traceback
 
+logger = logging.getLogger(__name__)
+
 ai_portfolio_bp = Blueprint('ai_portfolio', __name__, url_prefix='/api/ai/portfolio')
 
 
@@ -310,6 +314,17 @@ def refine_portfolio_endpoint(current_user, portfolio_id):
             'updatedAt': datetime.utcnow()
         })
         
+        # Keep the change in revision history so it can be undone
+        try:
+            PortfolioRevision.record(
+                portfolio_id, current_user['user_id'],
+                current_data, portfolio.get('html'),
+                updated_data, updated_html,
+                note=user_request[:200]
+            )
+        except Exception:
+            logger.exception('Failed to record revision of portfolio %s', portfolio_id)
+        
         return jsonify({
             'success': True,
             'message': 'Portfolio refined successfully',
@@ -1,11 +1,18 @@
 from flask import Blueprint, request, jsonify
 from flask_bcrypt import Bcrypt
 import jwt
-from datetime import datetime, timedelta
+import logging
+from datetime import datetime
 import os
-import requests
 from functools import wraps
+from config.settings import get_settings
+from models.github_token import GitHubTokenStore
 from models.user import User
+from utils import github_profile
+from utils.github_profile import GitHubProfileError
+from utils.github_ratelimit import RateLimitExceeded
+
+logger = logging.getLogger(__name__)
 
 # Initialize Blueprint
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
@@ -13,10 +20,6 @@ auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 # Initialize Bcrypt
 bcrypt = Bcrypt()
 
-# JWT configuration
-SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
-TOKEN_EXPIRATION = timedelta(hours=24)
-
 def token_required(f):
     """Decorator to require JWT token for protected routes"""
     @wraps(f)
@@ -31,7 +34,7 @@ def token_required(f):
             if token.startswith('Bearer '):
                 token = token[7:]
             
-            data = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+            data = jwt.decode(token, get_settings().secret_key, algorithms=['HS256'])
             current_user = User.find_by_id(data['user_id'])
             
             if not current_user:
@@ -48,10 +51,11 @@ def token_required(f):
 
 def generate_token(user_id):
     """Generate JWT token for user"""
+    settings = get_settings()
     return jwt.encode({
         'user_id': str(user_id),
-        'exp': datetime.utcnow() + TOKEN_EXPIRATION
-    }, SECRET_KEY, algorithm='HS256')
+        'exp': datetime.utcnow() + settings.token_expiration
+    }, settings.secret_key, algorithm='HS256')
 
 @auth_bp.route('/register', methods=['POST'])
 def register():
@@ -175,24 +179,14 @@ def github_login():
         if not access_token:
             return jsonify({'message': 'GitHub access token is required'}), 400
             
-        # Get GitHub user info
-        headers = {
-            'Authorization': f'Bearer {access_token}',
-            'Accept': 'application/vnd.github+json'
-        }
-        response = requests.get('https://api.github.com/user', headers=headers)
-        if not response.ok:
-            return jsonify({'message': 'Failed to get GitHub user info'}), 400
-            
-        github_user = response.json()
+        # GitHub user and emails, fetched concurrently
+        try:
+            profile = github_profile.fetch_profile(access_token)
+        except GitHubProfileError as e:
+            return jsonify({'message': str(e)}), 400
         
-        # Get GitHub user email
-        emails_response = requests.get('https://api.github.com/user/emails', headers=headers)
-        if not emails_response.ok:
-            return jsonify({'message': 'Failed to get GitHub user emails'}), 400
-            
-        github_emails = emails_response.json()
-        primary_email = next((email['email'] for email in github_emails if email['primary']), None)
+        github_user = profile['user']
+        primary_email = profile['email']
         if not primary_email:
             return jsonify({'message': 'No primary email found in GitHub account'}), 400
             
@@ -200,27 +194,27 @@ def github_login():
         user_doc = User.find_by_email(primary_email)
         if user_doc:
             # EXISTING USER: Merge GitHub account with existing email/password account
-            # Update the github_connected flag
-            User.update_github_connection(user_doc['_id'], True)
-            print(f"✅ Linked GitHub account to existing user: {primary_email}")
+            User.record_github_login(user_doc['_id'])
+            user_doc['githubConnected'] = True
+            logger.info('Linked GitHub account to existing user %s', user_doc['_id'])
         else:
             # NEW USER: Create account from GitHub
-            user_doc = User(
+            user = User(
                 name=github_user['name'] or github_user['login'],
                 email=primary_email,
                 password=bcrypt.generate_password_hash(os.urandom(32).hex()).decode('utf-8'),  # Random password for GitHub-only accounts
                 github_connected=True
             )
-            user_id = user_doc.save()
-            user_doc = User.find_by_id(user_id)
-            print(f"✅ Created new user from GitHub: {primary_email}")
+            user.last_login = user.created_at
+            user_doc = {**user.to_document(), '_id': user.save()}
+            logger.info('Created new user %s from GitHub', user_doc['_id'])
+        
+        # Keep the token and login so linking and deploys don't ask GitHub again
+        GitHubTokenStore.upsert_for_user(str(user_doc['_id']), access_token, login=profile['login'])
             
         # Generate JWT token for the user
         token = generate_token(user_doc['_id'])
         
-        # Update last login time
-        User.update_last_login(user_doc['_id'])
-        
         # Return user data with token
         user_data = User.to_dict(user_doc)
         user_data['token'] = token
@@ -230,6 +224,8 @@ def github_login():
             'user': user_data
         }), 200
         
+    except RateLimitExceeded:
+        raise  # 429 with Retry-After (app error handler)
     except Exception as e:
-        print(f"❌ GitHub login error: {str(e)}")
+        logger.exception('GitHub login failed')
         return jsonify({'message': f'GitHub login failed: {str(e)}'}), 500
@@ -1,146 +1,123 @@
-from flask import Blueprint, request, jsonify, redirect
+from flask import Blueprint, Response, request, jsonify, redirect, stream_with_context
+import json
+import logging
 import os
+import time
 import requests
+from bson.errors import InvalidId
 from functools import wraps
+from config.settings import get_settings
 from routes.auth import token_required  # reuse existing auth decorator
 from models.github_token import GitHubTokenStore
 from models.user import User
-from models.site_deployment import SiteDeployment
+from models.portfolio import Portfolio
+from models.site_deployment import SiteDeployment, JOB_TERMINAL_STATES
+from utils import deploy_pipeline, github_client, github_cache, github_profile, github_ratelimit
+from utils.github_deploy import build_tree_items, changed_files, get_tree_shas, stream_file
+from utils.pages_status import handle_event, verify_signature
+from utils.site_build import build_for_request
+from utils.site_bundle import portfolio_files, repo_name
 
 github_bp = Blueprint('github', __name__, url_prefix='/api/github')
 
+logger = logging.getLogger(__name__)
 
-def get_github_oauth_config():
-    client_id = os.getenv('GITHUB_CLIENT_ID')
-    client_secret = os.getenv('GITHUB_CLIENT_SECRET')
-    
-    if not client_id or not client_secret:
-        print("WARNING: GitHub OAuth credentials are missing!")
-        print(f"GITHUB_CLIENT_ID: {'Present' if client_id else 'Missing'}")
-        print(f"GITHUB_CLIENT_SECRET: {'Present' if client_secret else 'Missing'}")
-        
-    config = {
-        'client_id': client_id or '',
-        'client_secret': client_secret or '',
-        'redirect_uri': os.getenv('GITHUB_REDIRECT_URI', 'http://localhost:5000/api/github/callback'),
-        'scopes': os.getenv('GITHUB_SCOPES', 'repo,workflow,pages:write')
-    }
-    
-    # Debug print
-    print("GitHub OAuth Config:", {k: v if k != 'client_secret' else '***' for k, v in config.items()})
-    return config
+DEPLOY_EVENTS_POLL_SECONDS = 1
+
+
+def frontend_callback(params):
+    """Redirect to the frontend's GitHub callback page with these query params"""
+    query = "&".join(f"{k}={requests.utils.quote(str(v))}" for k, v in params.items() if v is not None)
+    return redirect(f"{get_settings().frontend_url}/github-callback?{query}")
 
 
 @github_bp.route('/authorize', methods=['GET'])
 def authorize():
-    cfg = get_github_oauth_config()
+    cfg = get_settings().github_oauth
     state = request.args.get('state')
     
-    if not cfg['client_id']:
-        print("❌ GitHub client ID is missing!")
+    if not cfg.client_id:
+        logger.error('GitHub authorize requested but GITHUB_CLIENT_ID is not set')
         return jsonify({
             'error': 'configuration_error',
             'error_description': 'GitHub OAuth is not properly configured'
         }), 500
     
     if not state:
-        print("❌ No state parameter provided!")
         return jsonify({
             'error': 'invalid_request',
             'error_description': 'State parameter is required'
         }), 400
     
-    try:
-        # URL encode the redirect URI and scopes
-        redirect_uri = requests.utils.quote(cfg['redirect_uri'])
-        scopes = requests.utils.quote(cfg['scopes'])
-        
-        authorize_url = (
-            'https://github.com/login/oauth/authorize'
-            f"?client_id={cfg['client_id']}"
-            f"&redirect_uri={redirect_uri}"
-            f"&scope={scopes}"
-            f"&state={state}"
-            '&allow_signup=true'
-        )
-        
-        print(f"✅ Generated GitHub authorization URL (state: {state})")
-        return jsonify({'url': authorize_url})
-        
-    except Exception as e:
-        print(f"❌ Error generating authorization URL: {str(e)}")
-        return jsonify({
-            'error': 'server_error',
-            'error_description': 'Failed to generate authorization URL'
-        }), 500
+    # URL encode the redirect URI and scopes
+    authorize_url = (
+        f'{get_settings().github.web_url}/login/oauth/authorize'
+        f"?client_id={cfg.client_id}"
+        f"&redirect_uri={requests.utils.quote(cfg.redirect_uri)}"
+        f"&scope={requests.utils.quote(cfg.scopes)}"
+        f"&state={requests.utils.quote(state)}"
+        '&allow_signup=true'
+    )
+    logger.debug('Generated GitHub authorization URL')
+    return jsonify({'url': authorize_url})
 
 
 @github_bp.route('/callback', methods=['GET', 'POST'])
 def callback():
-    print("GitHub Callback received!")
-    
     # Handle both GET (GitHub redirect) and POST (frontend code exchange) requests
     if request.method == 'GET':
-        print("Query params:", dict(request.args))
         code = request.args.get('code')
         state = request.args.get('state')
         error = request.args.get('error')
         error_description = request.args.get('error_description')
     else:  # POST
-        print("Processing code exchange from frontend")
         data = request.get_json(silent=True) or {}
         code = data.get('code')
         state = data.get('state')
         error = data.get('error')
         error_description = data.get('error_description')
+    logger.debug('GitHub callback (%s)', request.method)
 
     # Handle GitHub error response first
     if error:
-        print(f"GitHub Error: {error} - {error_description}")
-        error_params = {
+        logger.info('GitHub OAuth error: %s - %s', error, error_description)
+        return frontend_callback({
             'error': error,
             'error_description': error_description or 'GitHub authentication failed'
-        }
-        frontend_url = os.getenv('FRONTEND_URL', 'http://localhost:3001')
-        return redirect(f"{frontend_url}/github-callback?" + "&".join(f"{k}={requests.utils.quote(str(v))}" for k, v in error_params.items()))
+        })
 
     if not code:
-        print("Error: No code in callback")
-        error_params = {
+        return frontend_callback({
             'error': 'missing_code',
             'error_description': 'No authorization code received from GitHub'
-        }
-        frontend_url = os.getenv('FRONTEND_URL', 'http://localhost:3001')
-        return redirect(f"{frontend_url}/github-callback?" + "&".join(f"{k}={requests.utils.quote(str(v))}" for k, v in error_params.items()))
+        })
 
     # Exchange code for token
-    cfg = get_github_oauth_config()
-    token_url = 'https://github.com/login/oauth/access_token'
+    cfg = get_settings().github_oauth
+    token_url = f'{get_settings().github.web_url}/login/oauth/access_token'
     headers = {'Accept': 'application/json'}
     payload = {
-        'client_id': cfg['client_id'],
-        'client_secret': cfg['client_secret'],
+        'client_id': cfg.client_id,
+        'client_secret': cfg.client_secret,
         'code': code,
-        'redirect_uri': cfg['redirect_uri']
+        'redirect_uri': cfg.redirect_uri
     }
 
     try:
-        print("🔄 Exchanging code for token...")
-        res = requests.post(token_url, headers=headers, json=payload, timeout=15)
+        res = github_client.post(token_url, headers=headers, json=payload)
         
         # Check for HTTP error first
         try:
             res.raise_for_status()
         except requests.exceptions.HTTPError as e:
-            print(f"❌ HTTP error in token exchange: {str(e)}")
+            logger.warning('GitHub token exchange failed: %s', e)
             error_params = {
                 'error': 'token_exchange_failed',
                 'error_description': f'GitHub API error: {str(e)}'
             }
             # For GET requests, redirect to frontend
             if request.method == 'GET':
-                frontend_url = os.getenv('FRONTEND_URL', 'http://localhost:3001')
-                return redirect(f"{frontend_url}/github-callback?" + "&".join(f"{k}={requests.utils.quote(str(v))}" for k, v in error_params.items()))
+                return frontend_callback(error_params)
             # For POST requests, return JSON response
             return jsonify(error_params), 400
             
@@ -148,21 +125,17 @@ def callback():
         try:
             data = res.json()
         except ValueError:
-            print("❌ Invalid JSON response from GitHub")
-            error_params = {
+            logger.warning('GitHub token exchange returned invalid JSON')
+            return frontend_callback({
                 'error': 'invalid_response',
                 'error_description': 'Invalid response from GitHub API'
-            }
-            frontend_url = os.getenv('FRONTEND_URL', 'http://localhost:3001')
-            return redirect(f"{frontend_url}/github-callback?" + "&".join(f"{k}={requests.utils.quote(str(v))}" for k, v in error_params.items()))
-            
-        print("📦 Token response:", {k: '***' if k == 'access_token' else v for k, v in data.items()})
+            })
         
         access_token = data.get('access_token')
         token_type = data.get('token_type', 'bearer')
         
         if not access_token:
-            print("❌ No access token in response")
+            logger.info('GitHub token exchange returned no token: %s', data.get('error'))
             error_params = {
                 'error': 'token_exchange_failed',
                 'error_description': 'Failed to exchange code for access token'
@@ -173,26 +146,18 @@ def callback():
             
             # For GET requests, redirect to frontend
             if request.method == 'GET':
-                frontend_url = os.getenv('FRONTEND_URL', 'http://localhost:3001')
-                return redirect(f"{frontend_url}/github-callback?" + "&".join(f"{k}={requests.utils.quote(str(v))}" for k, v in error_params.items()))
+                return frontend_callback(error_params)
             # For POST requests, return JSON response
             return jsonify(error_params), 400
         
         # For GET requests, redirect back to frontend with the token
         if request.method == 'GET':
-            frontend_url = os.getenv('FRONTEND_URL', 'http://localhost:3001')
-            params = {
+            return frontend_callback({
                 'code': code,
                 'state': state,
                 'access_token': access_token,
                 'token_type': token_type
-            }
-        
-            print("✅ Redirecting to frontend with token")
-            # URL encode each parameter value
-            encoded_params = {k: requests.utils.quote(str(v)) for k, v in params.items() if v is not None}
-            redirect_url = f"{frontend_url}/github-callback?" + "&".join(f"{k}={v}" for k, v in encoded_params.items())
-            return redirect(redirect_url)
+            })
         
         # For POST requests, return JSON response with token
         return jsonify({
@@ -202,26 +167,18 @@ def callback():
         }), 200
         
     except requests.RequestException as e:
-        print("❌ Token exchange failed:", str(e))
+        logger.warning('GitHub token exchange request failed: %s', e)
         error_params = {
             'error': 'request_failed',
             'error_description': f'Failed to exchange code: {str(e)}'
         }
         # For GET requests, redirect to frontend
         if request.method == 'GET':
-            frontend_url = os.getenv('FRONTEND_URL', 'http://localhost:3001')
-            return redirect(f"{frontend_url}/github-callback?" + "&".join(f"{k}={requests.utils.quote(str(v))}" for k, v in error_params.items()))
+            return frontend_callback(error_params)
         # For POST requests, return JSON response
         return jsonify(error_params), 500
 
 
-def github_headers(token: str):
-    return {
-        'Authorization': f'Bearer {token}',
-        'Accept': 'application/vnd.github+json'
-    }
-
-
 @github_bp.route('/me', methods=['GET'])
 @token_required
 def github_me(current_user):
@@ -230,10 +187,11 @@ def github_me(current_user):
         return jsonify({'message': 'GitHub not linked'}), 404  # Return 404 if no GitHub token exists
     token = token_doc['access_token']
     try:
-        res = requests.get('https://api.github.com/user', headers=github_headers(token), timeout=15)
+        res = github_client.cached_get('/user', token, priority='background')
         if res.status_code == 401:  # Token invalid/expired
             # Clean up invalid token
             GitHubTokenStore.delete_for_user(str(current_user['_id']))
+            github_profile.invalidate(token)
             User.update_github_connection(current_user['_id'], False)
             return jsonify({'message': 'GitHub token invalid/expired'}), 401
         res.raise_for_status()
@@ -249,14 +207,21 @@ def link_github(current_user):
     token_type = body.get('token_type', 'bearer')
     if not access_token:
         return jsonify({'message': 'Missing access_token'}), 400
-    # Fetch login for convenience
-    login = None
-    try:
-        me = requests.get('https://api.github.com/user', headers=github_headers(access_token), timeout=15)
-        if me.ok:
-            login = me.json().get('login')
-    except requests.RequestException:
-        pass
+    # Login for deploys: known if this token was just used to sign in, else ask GitHub
+    stored = GitHubTokenStore.get_for_user(str(current_user['_id']))
+    profile = github_profile.cached_profile(access_token)
+    if stored and stored['access_token'] == access_token and stored.get('login'):
+        login = stored['login']
+    elif profile:
+        login = profile['login']
+    else:
+        login = None
+        try:
+            me = github_client.cached_get('/user', access_token)
+            if me.ok:
+                login = me.json().get('login')
+        except requests.RequestException:
+            pass
     GitHubTokenStore.upsert_for_user(str(current_user['_id']), access_token, token_type, login=login)
     User.update_github_connection(current_user['_id'], True)
     return jsonify({'message': 'GitHub linked'}), 200
@@ -280,9 +245,8 @@ def create_repo(current_user):
         return jsonify({'message': 'Missing token'}), 400
 
     try:
-        res = requests.post(
-            'https://api.github.com/user/repos',
-            headers=github_headers(token),
+        res = github_client.post(
+            '/user/repos', token,
             json={
                 'name': name,
                 'description': description,
@@ -290,8 +254,7 @@ def create_repo(current_user):
                 'homepage': homepage,
                 'has_issues': False,
                 'has_wiki': False
-            },
-            timeout=15
+            }
         )
         res.raise_for_status()
         repo_json = res.json()
@@ -317,11 +280,9 @@ def enable_pages(current_user):
         return jsonify({'message': 'Missing token/owner/repo'}), 400
 
     try:
-        res = requests.put(
-            f'https://api.github.com/repos/{owner}/{repo}/pages',
-            headers=github_headers(token),
-            json={ 'source': { 'branch': branch, 'path': path } },
-            timeout=15
+        res = github_client.put(
+            f'/repos/{owner}/{repo}/pages', token,
+            json={ 'source': { 'branch': branch, 'path': path } }
         )
         # GitHub returns 201/202 depending on state
         if res.status_code not in (201, 202):
@@ -331,10 +292,41 @@ def enable_pages(current_user):
         return jsonify({'message': f'Enable pages failed: {str(e)}'}), 500
 
 
+def read_deploy_body():
+    """
+    Parse a push/deploy request
+
+    Either JSON, or multipart/form-data with the JSON in a 'manifest' field
+    and one file part per binary asset, named by its path in the site. Parts
+    stay in werkzeug's spooled temp files and are streamed to GitHub (or
+    GridFS) rather than read into memory.
+
+    Returns:
+        (body, streamed files)
+    """
+    if not request.files:
+        return request.get_json(silent=True) or {}, []
+    try:
+        body = json.loads(request.form.get('manifest') or '{}')
+    except ValueError:
+        body = {}
+    uploads = [stream_file(name, upload.stream) for name, upload in request.files.items(multi=True)]
+    return body, uploads
+
+
 @github_bp.route('/push', methods=['POST'])
 @token_required
 def push_static_site(current_user):
-    body = request.get_json(silent=True) or {}
+    """
+    Commit files to a branch now (synchronously)
+
+    Body: owner, repo, branch (default main), message, and either files
+    ([{ path, content, encoding }]) or portfolioId to push a stored portfolio.
+    build runs the build stage (minify, hash assets); it defaults to true for
+    portfolioId and false for client files. precompress adds .gz/.br variants
+    when building (default SITE_PRECOMPRESS).
+    """
+    body, uploads = read_deploy_body()
     token_doc = GitHubTokenStore.get_for_user(str(current_user['_id']))
     if not token_doc:
         return jsonify({'message': 'GitHub not linked'}), 400
@@ -346,32 +338,37 @@ def push_static_site(current_user):
     files = body.get('files', [])  # [{ path, content, encoding }]
     commit_message = body.get('message', 'Deploy portfolio')
 
+    if body.get('portfolioId'):
+        portfolio, error = find_deployable_portfolio(body['portfolioId'], current_user)
+        if error:
+            return error
+        repo = repo or portfolio.get('githubRepo') or repo_name(portfolio['name'])
+        files = portfolio_files(portfolio, base_href=f'/{repo}/')
+    if isinstance(files, list):
+        files, _ = build_for_request(files, body, from_portfolio=bool(body.get('portfolioId')))
+        files = files + uploads
+
     if not all([owner, repo]) or not isinstance(files, list) or len(files) == 0:
         return jsonify({'message': 'Missing owner/repo/files'}), 400
 
+    # Refuse up front rather than run out of budget halfway through the push
+    github_ratelimit.ensure_budget(token, 7 + len(files))
+
     try:
         # 1) get current head sha (or create branch)
-        ref_res = requests.get(
-            f'https://api.github.com/repos/{owner}/{repo}/git/refs/heads/{branch}',
-            headers=github_headers(token), timeout=15
-        )
+        ref_res = github_client.cached_get(f'/repos/{owner}/{repo}/git/refs/heads/{branch}', token, priority='critical')
         if ref_res.status_code == 404:
             # create branch off default_branch
-            repo_res = requests.get(f'https://api.github.com/repos/{owner}/{repo}', headers=github_headers(token), timeout=15)
+            repo_res = github_client.cached_get(f'/repos/{owner}/{repo}', token, priority='critical')
             repo_res.raise_for_status()
             default_branch = repo_res.json().get('default_branch', 'main')
-            base_ref = requests.get(
-                f'https://api.github.com/repos/{owner}/{repo}/git/refs/heads/{default_branch}',
-                headers=github_headers(token), timeout=15
-            )
+            base_ref = github_client.cached_get(f'/repos/{owner}/{repo}/git/refs/heads/{default_branch}', token, priority='critical')
             base_ref.raise_for_status()
             base_sha = base_ref.json()['object']['sha']
             # create new branch
-            create_ref = requests.post(
-                f'https://api.github.com/repos/{owner}/{repo}/git/refs',
-                headers=github_headers(token),
-                json={ 'ref': f'refs/heads/{branch}', 'sha': base_sha },
-                timeout=15
+            create_ref = github_client.post(
+                f'/repos/{owner}/{repo}/git/refs', token, priority='critical',
+                json={ 'ref': f'refs/heads/{branch}', 'sha': base_sha }
             )
             create_ref.raise_for_status()
             head_sha = base_sha
@@ -380,58 +377,44 @@ def push_static_site(current_user):
             head_sha = ref_res.json()['object']['sha']
 
         # 2) fetch head commit to get tree sha
-        commit_res = requests.get(
-            f'https://api.github.com/repos/{owner}/{repo}/git/commits/{head_sha}',
-            headers=github_headers(token), timeout=15
-        )
+        commit_res = github_client.cached_get(f'/repos/{owner}/{repo}/git/commits/{head_sha}', token, priority='critical')
         commit_res.raise_for_status()
         base_tree_sha = commit_res.json()['tree']['sha']
 
-        # 3) create blobs for files
-        blob_shas = {}
-        for f in files:
-            blob = requests.post(
-                f'https://api.github.com/repos/{owner}/{repo}/git/blobs',
-                headers=github_headers(token),
-                json={ 'content': f.get('content', ''), 'encoding': f.get('encoding', 'utf-8') },
-                timeout=15
-            )
-            blob.raise_for_status()
-            blob_shas[f['path']] = blob.json()['sha']
+        # Nothing to commit if every file already matches the head tree
+        changed = changed_files(files, get_tree_shas(token, owner, repo, base_tree_sha))
+        if not changed:
+            return jsonify({ 'message': 'No changes', 'commit': head_sha, 'changed': 0 }), 200
+
+        # 3) inline small text files, upload the rest as blobs (concurrently)
+        tree = build_tree_items(token, owner, repo, changed)
 
         # 4) create tree from base tree
-        tree = [{ 'path': p, 'mode': '100644', 'type': 'blob', 'sha': sha } for p, sha in blob_shas.items()]
-        tree_res = requests.post(
-            f'https://api.github.com/repos/{owner}/{repo}/git/trees',
-            headers=github_headers(token),
-            json={ 'base_tree': base_tree_sha, 'tree': tree },
-            timeout=15
+        tree_res = github_client.post(
+            f'/repos/{owner}/{repo}/git/trees', token, priority='critical',
+            json={ 'base_tree': base_tree_sha, 'tree': tree }
         )
         tree_res.raise_for_status()
         tree_sha = tree_res.json()['sha']
 
         # 5) create commit
-        commit_res = requests.post(
-            f'https://api.github.com/repos/{owner}/{repo}/git/commits',
-            headers=github_headers(token),
-            json={ 'message': commit_message, 'tree': tree_sha, 'parents': [head_sha] },
-            timeout=15
+        commit_res = github_client.post(
+            f'/repos/{owner}/{repo}/git/commits', token, priority='critical',
+            json={ 'message': commit_message, 'tree': tree_sha, 'parents': [head_sha] }
         )
         commit_res.raise_for_status()
         new_commit_sha = commit_res.json()['sha']
 
         # 6) update ref to new commit
-        update_ref = requests.patch(
-            f'https://api.github.com/repos/{owner}/{repo}/git/refs/heads/{branch}',
-            headers=github_headers(token),
-            json={ 'sha': new_commit_sha, 'force': False },
-            timeout=15
+        update_ref = github_client.patch(
+            f'/repos/{owner}/{repo}/git/refs/heads/{branch}', token, priority='critical',
+            json={ 'sha': new_commit_sha, 'force': False }
         )
         update_ref.raise_for_status()
 
         # Persist commit (URL not known yet)
         SiteDeployment.upsert(str(current_user['_id']), repo, branch, None, new_commit_sha)
-        return jsonify({ 'message': 'Pushed', 'commit': new_commit_sha }), 200
+        return jsonify({ 'message': 'Pushed', 'commit': new_commit_sha, 'changed': len(changed) }), 200
     except requests.RequestException as e:
         return jsonify({'message': f'Push failed: {str(e)}'}), 500
 
@@ -439,245 +422,201 @@ def push_static_site(current_user):
 @github_bp.route('/deploy', methods=['POST'])
 @token_required
 def one_click_deploy(current_user):
-    """Create repo if missing, push files, enable pages, and return URL."""
-    body = request.get_json(silent=True) or {}
+    """
+    Queue a deploy (create repo, push files, enable pages) and return the URL it will be served at.
+
+    Body: repo, branch, path, message, and either files or portfolioId to
+    deploy a stored portfolio. build runs the build stage (minify, hash
+    assets); it defaults to true for portfolioId and false for client files.
+    precompress adds .gz/.br variants when building (default SITE_PRECOMPRESS).
+    """
+    body, uploads = read_deploy_body()
     token_doc = GitHubTokenStore.get_for_user(str(current_user['_id']))
     if not token_doc:
         return jsonify({'message': 'GitHub not linked'}), 400
     token = token_doc['access_token']
     owner = token_doc.get('login')
 
-    repo = body.get('repo', 'skillslate-portfolio')
-    branch = body.get('branch', 'main')
+    repo = body.get('repo')
+    branch = body.get('branch')  # default: the repo's default branch, if known
     path = body.get('path', '/')
     files = body.get('files', [])
     message = body.get('message', 'Deploy portfolio')
-
-    if not isinstance(files, list) or len(files) == 0:
+    portfolio_id = body.get('portfolioId')
+    portfolio_status = None
+
+    # Deploy by id: build the files from the stored portfolio instead of the request body
+    if portfolio_id:
+        portfolio, error = find_deployable_portfolio(portfolio_id, current_user)
+        if error:
+            return error
+        repo = repo or portfolio.get('githubRepo') or repo_name(portfolio['name'])
+        files = portfolio_files(portfolio, base_href=f'/{repo}/')
+        portfolio_status = portfolio.get('status')
+    repo = repo or 'skillslate-portfolio'
+
+    if not isinstance(files, list) or len(files) + len(uploads) == 0:
         return jsonify({'message': 'Missing files'}), 400
 
+    files, build_report = build_for_request(files, body, from_portfolio=bool(portfolio_id))
+    files = files + uploads
+
+    # Refuse up front rather than run out of budget halfway through the push
+    github_ratelimit.ensure_budget(token, 10 + len(files))
+
+    if portfolio_id:
+        # Marked deployed (or failed) by the pipeline when the job finishes
+        Portfolio.update_status(portfolio_id, 'building', github_repo=repo)
+
+    doc, request_id = deploy_pipeline.enqueue(
+        str(current_user['_id']), repo, owner, files, branch, path, message,
+        portfolio_id=portfolio_id, portfolio_status=portfolio_status
+    )
+    logger.info('Queued deploy request %s to %s/%s', request_id, owner, repo)
+    return jsonify(deploy_accepted(doc, request_id, build_report)), 202
+
+
+def deploy_accepted(doc, request_id, build_report=None):
+    """202 body for a queued deploy; url is known up front so existing clients keep working"""
+    status = SiteDeployment.job_to_dict(doc, request_id)
+    return {
+        'message': 'Deploy queued',
+        'url': status['url'],
+        'jobId': status['id'],
+        'requestId': request_id,
+        'state': status['state'],
+        'build': build_report,
+        'statusUrl': f'/api/github/deploy/{request_id}',
+        'eventsUrl': f'/api/github/deploy/{request_id}/events'
+    }
+
+
+def find_deployable_portfolio(portfolio_id, current_user):
+    """The user's portfolio if it has HTML to deploy; else (None, error response)"""
     try:
-        print(f"\n🚀 Starting deployment to {owner}/{repo}")
-        
-        # Ensure repo exists
-        info = requests.get(f'https://api.github.com/repos/{owner}/{repo}', headers=github_headers(token), timeout=15)
-        repo_exists = info.status_code == 200
-        
-        if info.status_code == 404:
-            print(f"📦 Repository doesn't exist, creating: {repo}")
-            create = requests.post(
-                'https://api.github.com/user/repos',
-                headers=github_headers(token),
-                json={ 'name': repo, 'private': False, 'has_issues': False, 'has_wiki': False, 'auto_init': True },
-                timeout=15
-            )
-            if create.status_code == 422:
-                # Repository name already taken - might exist but initial check failed
-                # Try to get repo info again
-                print(f"⚠️ 422 Error - repository might already exist, checking again...")
-                info_retry = requests.get(f'https://api.github.com/repos/{owner}/{repo}', headers=github_headers(token), timeout=15)
-                if info_retry.status_code == 200:
-                    print(f"✅ Repository already exists, proceeding with update")
-                    repo_exists = True
-                else:
-                    # Repository truly doesn't exist and name is invalid
-                    error_data = create.json()
-                    print(f"❌ 422 Error creating repository: {error_data}")
-                    error_msg = error_data.get('message', 'Repository name is invalid')
-                    if 'errors' in error_data:
-                        errors = error_data['errors']
-                        if isinstance(errors, list) and len(errors) > 0:
-                            error_msg = errors[0].get('message', error_msg)
-                    return jsonify({'message': f'Repository creation failed: {error_msg}'}), 422
-            elif create.status_code not in (200, 201):
-                create.raise_for_status()
-            else:
-                print(f"✅ Repository created successfully")
-                # Wait a bit for GitHub to initialize the repo
-                import time
-                time.sleep(2)
-                repo_exists = False
-        elif info.status_code == 200:
-            print(f"✅ Repository already exists, will update it")
-            repo_exists = True
-        else:
-            print(f"❌ Error checking repository: {info.status_code}")
-            info.raise_for_status()
-
-        # 1) Create blobs for all files first
-        print(f"📝 Creating blobs for {len(files)} file(s)")
-        blob_shas = {}
-        for f in files:
-            blob = requests.post(
-                f'https://api.github.com/repos/{owner}/{repo}/git/blobs',
-                headers=github_headers(token),
-                json={ 'content': f.get('content', ''), 'encoding': f.get('encoding', 'utf-8') },
-                timeout=15
-            )
-            blob.raise_for_status()
-            blob_shas[f['path']] = blob.json()['sha']
-        print(f"✅ Created {len(blob_shas)} blob(s)")
-
-        # 2) Check if branch exists
-        print(f"🔍 Checking if branch '{branch}' exists")
-        ref_res = requests.get(
-            f'https://api.github.com/repos/{owner}/{repo}/git/refs/heads/{branch}',
-            headers=github_headers(token), timeout=15
-        )
-        
-        branch_exists = ref_res.status_code == 200
-        parent_sha = None
-        base_tree_sha = None
-        
-        if branch_exists:
-            print(f"✅ Branch '{branch}' exists, will update it")
-            # Branch exists - get current HEAD
-            parent_sha = ref_res.json()['object']['sha']
-            # Get the tree from current commit
-            commit_res = requests.get(
-                f'https://api.github.com/repos/{owner}/{repo}/git/commits/{parent_sha}',
-                headers=github_headers(token), timeout=15
-            )
-            commit_res.raise_for_status()
-            base_tree_sha = commit_res.json()['tree']['sha']
-        else:
-            print(f"📝 Branch '{branch}' doesn't exist, will create it")
-        
-        # 3) Create tree
-        print(f"🌳 Creating git tree")
-        tree_items = [{ 'path': p, 'mode': '100644', 'type': 'blob', 'sha': sha } for p, sha in blob_shas.items()]
-        tree_json = { 'tree': tree_items }
-        if base_tree_sha:
-            tree_json['base_tree'] = base_tree_sha
-            
-        tree_res = requests.post(
-            f'https://api.github.com/repos/{owner}/{repo}/git/trees',
-            headers=github_headers(token),
-            json=tree_json,
-            timeout=15
-        )
-        tree_res.raise_for_status()
-        tree_sha = tree_res.json()['sha']
+        portfolio = Portfolio.find_by_id_and_user(portfolio_id, str(current_user['_id']))
+    except InvalidId:
+        portfolio = None
+    if not portfolio:
+        return None, (jsonify({'message': 'Portfolio not found'}), 404)
+    if not (portfolio.get('html') or portfolio.get('content')):
+        return None, (jsonify({'message': 'Portfolio has no generated HTML to deploy'}), 400)
+    return portfolio, None
 
-        # 4) Create commit
-        commit_json = { 'message': message, 'tree': tree_sha }
-        if parent_sha:
-            commit_json['parents'] = [parent_sha]
-            
-        commit_res = requests.post(
-            f'https://api.github.com/repos/{owner}/{repo}/git/commits',
-            headers=github_headers(token),
-            json=commit_json,
-            timeout=15
-        )
-        commit_res.raise_for_status()
-        new_commit_sha = commit_res.json()['sha']
 
-        # 5) Create or update branch reference
-        if branch_exists:
-            # Update existing branch
-            update_ref = requests.patch(
-                f'https://api.github.com/repos/{owner}/{repo}/git/refs/heads/{branch}',
-                headers=github_headers(token),
-                json={ 'sha': new_commit_sha, 'force': True },
-                timeout=15
-            )
-            update_ref.raise_for_status()
-        else:
-            # Create new branch
-            create_ref = requests.post(
-                f'https://api.github.com/repos/{owner}/{repo}/git/refs',
-                headers=github_headers(token),
-                json={ 'ref': f'refs/heads/{branch}', 'sha': new_commit_sha },
-                timeout=15
-            )
-            create_ref.raise_for_status()
+def find_user_job(deploy_id, current_user):
+    try:
+        return SiteDeployment.get_job(deploy_id, str(current_user['_id']))
+    except InvalidId:
+        return None
 
-        # Enable Pages - with retry for new repositories
-        print(f"📄 Enabling GitHub Pages for {owner}/{repo} on branch {branch}")
-        import time
-        
-        pages_enabled = False
-        max_retries = 2
-        
-        for attempt in range(max_retries):
-            pages = requests.post(
-                f'https://api.github.com/repos/{owner}/{repo}/pages',
-                headers=github_headers(token),
-                json={ 'source': { 'branch': branch, 'path': path }, 'build_type': 'legacy' },
-                timeout=15
-            )
-            
-            if pages.status_code in (201, 204):
-                print(f"✅ Pages enabled successfully: {pages.status_code}")
-                pages_enabled = True
+
+@github_bp.route('/deploy/<deploy_id>', methods=['GET'])
+@token_required
+def deploy_status(current_user, deploy_id):
+    """State of a deploy job or request (job id or requestId); says which request's content was published"""
+    doc = find_user_job(deploy_id, current_user)
+    if not doc:
+        return jsonify({'message': 'Deploy not found'}), 404
+    return jsonify(SiteDeployment.job_to_dict(doc, deploy_id)), 200
+
+
+@github_bp.route('/deploy/<deploy_id>/events', methods=['GET'])
+@token_required
+def deploy_events(current_user, deploy_id):
+    """Server-sent events with the deploy's state until it is live or failed"""
+    if not find_user_job(deploy_id, current_user):
+        return jsonify({'message': 'Deploy not found'}), 404
+
+    # An open event stream holds a request thread, so streams end after
+    # deploy.events_timeout_seconds even if the deploy hasn't; EventSource
+    # reconnects on its own (and GET /deploy/<id> works for polling)
+    timeout = get_settings().deploy.events_timeout_seconds
+
+    def stream():
+        last = None
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            job = SiteDeployment.job_to_dict(find_user_job(deploy_id, current_user), deploy_id)
+            if job is None:
                 break
-            elif pages.status_code == 409:
-                print(f"✅ Pages already enabled (409)")
-                pages_enabled = True
+            # A waiting request becomes a job of its own; report both state and job changes
+            if (job['id'], job['state']) != last:
+                last = (job['id'], job['state'])
+                yield f"data: {json.dumps(job)}\n\n"
+            if job['state'] in JOB_TERMINAL_STATES:
                 break
-            elif pages.status_code == 404 and attempt < max_retries - 1:
-                print(f"⚠️ Pages API returned 404 (attempt {attempt + 1}/{max_retries}), waiting 2 seconds...")
-                time.sleep(2)
-            elif pages.status_code == 422:
-                # Validation failed - try checking if pages already exists
-                print(f"⚠️ 422 Error - checking if Pages already enabled...")
-                pages_check = requests.get(
-                    f'https://api.github.com/repos/{owner}/{repo}/pages',
-                    headers=github_headers(token),
-                    timeout=15
-                )
-                if pages_check.status_code == 200:
-                    print(f"✅ Pages already enabled")
-                    pages_enabled = True
-                    break
-            else:
-                print(f"⚠️ Pages enable returned {pages.status_code}: {pages.text}")
-        
-        if not pages_enabled:
-            print(f"⚠️ Could not automatically enable Pages, but deployment succeeded")
-            print(f"ℹ️ Pages will be available once GitHub processes the repository")
-
-        url = f'https://{owner}.github.io/{repo}/' if path == '/' else f'https://{owner}.github.io/{repo}{path}'
-        print(f"🌐 Deployment URL: {url}")
-        # Persist URL (last commit already stored by push)
-        SiteDeployment.upsert(str(current_user['_id']), repo, branch, url, None)
-        return jsonify({ 'message': 'Deployed', 'url': url }), 200
-    
-    except requests.RequestException as e:
-        return jsonify({'message': f'Deploy failed: {str(e)}'}), 500
+            time.sleep(DEPLOY_EVENTS_POLL_SECONDS)
+
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 
 @github_bp.route('/status', methods=['GET'])
 @token_required
 def pages_status(current_user):
+    """
+    Pages build status of a repo, as last reported by webhooks or the reconciler
+
+    Repos whose builds we haven't tracked (deployed before status tracking, or
+    outside the deploy pipeline) get GitHub's answer instead.
+    """
     repo = request.args.get('repo')
     if not repo:
         return jsonify({'message': 'Missing repo'}), 400
+    saved = SiteDeployment.get(str(current_user['_id']), repo)
+    if saved and saved.get('pages'):
+        return jsonify(SiteDeployment.pages_to_dict(saved)), 200
+
     token_doc = GitHubTokenStore.get_for_user(str(current_user['_id']))
     if not token_doc:
         return jsonify({'message': 'GitHub not linked'}), 400
     token = token_doc['access_token']
     owner = token_doc.get('login')
     try:
-        res = requests.get(
-            f'https://api.github.com/repos/{owner}/{repo}/pages',
-            headers=github_headers(token), timeout=15
-        )
+        res = github_client.cached_get(f'/repos/{owner}/{repo}/pages', token, priority='background')
         if res.status_code == 404:
             return jsonify({'enabled': False}), 200
         res.raise_for_status()
         data = res.json()
-        saved = SiteDeployment.get(str(current_user['_id']), repo)
         return jsonify({
             'enabled': True,
             'status': data.get('status'),
             'cname': data.get('cname'),
             'html_url': data.get('html_url'),
             'last_commit': (saved or {}).get('lastCommit'),
-            'url': (saved or {}).get('url')
+            'url': (saved or {}).get('url'),
+            'source': 'github'
         }), 200
     except requests.RequestException as e:
         return jsonify({'message': f'Fetch pages status failed: {str(e)}'}), 500
 
 
+@github_bp.route('/webhook', methods=['POST'])
+def github_webhook():
+    """Receiver for page_build/deployment_status deliveries from repos we deploy to"""
+    if not get_settings().pages.webhook_secret:
+        return jsonify({'message': 'Webhooks not configured'}), 404
+    if not verify_signature(request.get_data(), request.headers.get('X-Hub-Signature-256')):
+        return jsonify({'message': 'Invalid signature'}), 401
+
+    event = request.headers.get('X-GitHub-Event', '')
+    if event == 'ping':
+        return jsonify({'message': 'pong'}), 200
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'message': 'Invalid payload'}), 400
+    updated = handle_event(event, payload)
+    return jsonify({'event': event, 'updated': updated}), 200
+
+
+@github_bp.route('/metrics', methods=['GET'])
+@token_required
+def client_metrics(current_user):
+    """Per-endpoint GitHub API call counts and latency for this worker"""
+    return jsonify({
+        'pid': os.getpid(),
+        'endpoints': github_client.get_metrics(),
+        'cache': github_cache.get_stats(),
+        'rateLimit': github_ratelimit.get_stats()
+    }), 200
@@ -1,26 +1,85 @@
 from flask import Blueprint, request, jsonify
-from bson import ObjectId
-from datetime import datetime
-from models.portfolio import Portfolio
-from models.user import User
+from models.portfolio import Portfolio, UPDATABLE_FIELDS, SUMMARY_PROJECTION
+from pymongo.errors import BulkWriteError
+from models.portfolio_revision import PortfolioRevision
+from models.github_token import GitHubTokenStore
+from models.site_deployment import SiteDeployment
+from utils import deploy_pipeline, github_ratelimit
+from utils.github_ratelimit import RateLimitExceeded
+from utils.site_build import build_for_request
+from utils.site_bundle import portfolio_files, repo_name
 from utils.validators import validate_auth_token
-import jwt
-import os
 
 portfolio_bp = Blueprint('portfolio', __name__, url_prefix='/api/portfolio')
 
+# Page size bounds for GET /api/portfolio/
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Maximum portfolios per user (GitHub Pages limit)
+PORTFOLIO_LIMIT = 2
+
+# Maximum operations per POST /api/portfolio/bulk request
+MAX_BULK_OPERATIONS = 500
+
 @portfolio_bp.route('/', methods=['GET'])
 @validate_auth_token
 def get_portfolios(current_user):
-    """Get all portfolios for the current user"""
+    """Get portfolios for the current user
+    
+    Query params: limit (1-100), cursor (from nextCursor), status, template.
+    Without limit or cursor, returns every portfolio in one list (the
+    response has no hasMore/nextCursor), as before pagination existed.
+    """
     try:
-        portfolios = Portfolio.find_by_user_id(current_user['user_id'])
+        if 'limit' not in request.args and 'cursor' not in request.args:
+            portfolios = Portfolio.find_by_user_id(
+                current_user['user_id'],
+                status=request.args.get('status'),
+                template=request.args.get('template'),
+                projection=SUMMARY_PROJECTION
+            )
+            portfolio_list = [Portfolio.to_dict(portfolio) for portfolio in portfolios]
+            return jsonify({
+                'success': True,
+                'portfolios': portfolio_list,
+                'count': len(portfolio_list)
+            })
+        
+        try:
+            limit = min(max(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'message': 'limit must be an integer'
+            }), 400
+        
+        # Fetch one extra document to know whether another page exists
+        try:
+            portfolios = Portfolio.find_by_user_id(
+                current_user['user_id'],
+                limit=limit + 1,
+                cursor=request.args.get('cursor'),
+                status=request.args.get('status'),
+                template=request.args.get('template'),
+                projection=SUMMARY_PROJECTION
+            )
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'message': 'Invalid cursor'
+            }), 400
+        
+        has_more = len(portfolios) > limit
+        portfolios = portfolios[:limit]
         portfolio_list = [Portfolio.to_dict(portfolio) for portfolio in portfolios]
         
         return jsonify({
             'success': True,
             'portfolios': portfolio_list,
-            'count': len(portfolio_list)
+            'count': len(portfolio_list),
+            'hasMore': has_more,
+            'nextCursor': Portfolio.encode_cursor(portfolios[-1]) if has_more else None
         })
     except Exception as e:
         return jsonify({
@@ -51,7 +110,7 @@ def create_portfolio(current_user):
         
         # Check portfolio limit (2 for GitHub Pages)
         portfolio_count = Portfolio.count_by_user(current_user['user_id'])
-        if portfolio_count >= 2:
+        if portfolio_count >= PORTFOLIO_LIMIT:
             return jsonify({
                 'success': False,
                 'message': 'Portfolio limit reached. Maximum 2 portfolios allowed with GitHub Pages.',
@@ -88,6 +147,147 @@ def create_portfolio(current_user):
             'error': str(e)
         }), 500
 
+@portfolio_bp.route('/bulk', methods=['POST'])
+@validate_auth_token
+def bulk_portfolio_operations(current_user):
+    """Run a batch of create/update/delete/status operations in one bulk write
+    
+    Request body:
+    {
+        "ordered": true,  // stop at the first failing operation (default)
+        "operations": [
+            {"op": "create", "name": "...", "template": "..."},
+            {"op": "update", "id": "...", "fields": {"name": "..."}},
+            {"op": "status", "id": "...", "status": "deployed"},
+            {"op": "delete", "id": "..."}
+        ]
+    }
+    
+    Each result's status is ok, error, not_found (the portfolio was gone when
+    the write ran) or skipped (not run because an earlier operation failed).
+    """
+    try:
+        data = request.get_json() or {}
+        operations = data.get('operations')
+        ordered = data.get('ordered', True)
+        user_id = current_user['user_id']
+        
+        if not isinstance(ordered, bool):
+            return jsonify({
+                'success': False,
+                'message': 'ordered must be true or false'
+            }), 400
+        
+        if not isinstance(operations, list) or len(operations) == 0:
+            return jsonify({
+                'success': False,
+                'message': 'operations must be a non-empty list'
+            }), 400
+        
+        if len(operations) > MAX_BULK_OPERATIONS:
+            return jsonify({
+                'success': False,
+                'message': f'At most {MAX_BULK_OPERATIONS} operations per request'
+            }), 400
+        
+        # One query to find which referenced portfolios the user owns
+        referenced_ids = set()
+        for item in operations:
+            if isinstance(item, dict) and item.get('op') != 'create':
+                try:
+                    referenced_ids.add(Portfolio.parse_id(item.get('id')))
+                except ValueError:
+                    pass
+        owned_ids = Portfolio.find_owned_ids(referenced_ids, user_id) if referenced_ids else set()
+        remaining_slots = PORTFOLIO_LIMIT - Portfolio.count_by_user(user_id)
+        
+        results = [{'index': i, 'status': 'skipped'} for i in range(len(operations))]
+        write_requests = []
+        positions = []  # write_requests index -> (operations index, portfolio ID)
+        
+        for i, item in enumerate(operations):
+            try:
+                if not isinstance(item, dict):
+                    raise ValueError('Operation must be an object')
+                if item.get('op') == 'create':
+                    if remaining_slots <= 0:
+                        raise ValueError('Portfolio limit reached')
+                elif item.get('op') in ('update', 'delete', 'status'):
+                    # Owned, and not deleted by an earlier operation in this batch
+                    if Portfolio.parse_id(item.get('id')) not in owned_ids:
+                        raise ValueError('Portfolio not found')
+                write, portfolio_id = Portfolio.to_bulk_request(user_id, item)
+                if item['op'] == 'create':
+                    remaining_slots -= 1
+                elif item['op'] == 'delete':
+                    # Frees a slot for creates later in the batch
+                    owned_ids.discard(Portfolio.parse_id(portfolio_id))
+                    remaining_slots += 1
+                write_requests.append(write)
+                positions.append((i, portfolio_id))
+            except ValueError as e:
+                results[i] = {'index': i, 'status': 'error', 'error': str(e)}
+                if ordered:
+                    break
+        
+        write_errors = {}
+        summary = {}
+        if write_requests:
+            try:
+                summary = Portfolio.bulk_write(write_requests, ordered=ordered).bulk_api_result
+            except BulkWriteError as e:
+                summary = e.details
+                write_errors = {err['index']: err.get('errmsg', 'Write failed') for err in e.details.get('writeErrors', [])}
+        
+        # In ordered mode nothing after the first write error was applied
+        first_error = min(write_errors) if (ordered and write_errors) else None
+        applied = [
+            (req_index, i, portfolio_id) for req_index, (i, portfolio_id) in enumerate(positions)
+            if req_index not in write_errors and (first_error is None or req_index < first_error)
+        ]
+        
+        # Updates that matched nothing (the portfolio was deleted after we
+        # looked it up); only asked for when the matched count comes up short
+        missing_ids = set()
+        update_ids = [portfolio_id for _, i, portfolio_id in applied if operations[i]['op'] in ('update', 'status')]
+        if summary.get('nMatched', 0) < len(update_ids):
+            still_owned = Portfolio.find_owned_ids({Portfolio.parse_id(pid) for pid in update_ids}, user_id)
+            missing_ids = {pid for pid in update_ids if Portfolio.parse_id(pid) not in still_owned}
+        
+        for req_index, (i, _) in enumerate(positions):
+            if req_index in write_errors:
+                results[i] = {'index': i, 'status': 'error', 'error': write_errors[req_index]}
+        
+        deleted_ids = []
+        for _, i, portfolio_id in applied:
+            if portfolio_id in missing_ids and operations[i]['op'] in ('update', 'status'):
+                results[i] = {'index': i, 'status': 'not_found', 'id': portfolio_id, 'error': 'Portfolio not found'}
+                continue
+            results[i] = {'index': i, 'status': 'ok', 'id': portfolio_id}
+            if operations[i]['op'] == 'delete':
+                deleted_ids.append(portfolio_id)
+        
+        if deleted_ids:
+            PortfolioRevision.delete_for_portfolios(deleted_ids)
+        
+        succeeded = len([r for r in results if r['status'] == 'ok'])
+        
+        return jsonify({
+            'success': succeeded == len(operations),
+            'ordered': ordered,
+            'succeeded': succeeded,
+            'failed': len([r for r in results if r['status'] in ('error', 'not_found')]),
+            'skipped': len([r for r in results if r['status'] == 'skipped']),
+            'results': results
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': 'Failed to run bulk operations',
+            'error': str(e)
+        }), 500
+
 @portfolio_bp.route('/<portfolio_id>', methods=['GET'])
 @validate_auth_token
 def get_portfolio(current_user, portfolio_id):
@@ -116,9 +316,18 @@ def get_portfolio(current_user, portfolio_id):
 @portfolio_bp.route('/<portfolio_id>', methods=['PUT'])
 @validate_auth_token
 def update_portfolio(current_user, portfolio_id):
-    """Update a portfolio"""
+    """Update a portfolio (only the whitelisted fields that changed are written)"""
     try:
-        portfolio = Portfolio.find_by_id_and_user(portfolio_id, current_user['user_id'])
+        data = request.get_json() or {}
+        
+        fields = {k: data[k] for k in UPDATABLE_FIELDS if k in data}
+        try:
+            portfolio = Portfolio.update_fields(portfolio_id, current_user['user_id'], fields)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
         
         if not portfolio:
             return jsonify({
@@ -126,29 +335,6 @@ def update_portfolio(current_user, portfolio_id):
                 'message': 'Portfolio not found'
             }), 404
         
-        data = request.get_json()
-        
-        # Update portfolio fields
-        if 'name' in data:
-            portfolio['name'] = data['name']
-        if 'template' in data:
-            portfolio['template'] = data['template']
-        if 'status' in data:
-            portfolio['status'] = data['status']
-        if 'url' in data:
-            portfolio['url'] = data['url']
-        if 'githubRepo' in data:
-            portfolio['githubRepo'] = data['githubRepo']
-        
-        portfolio['updatedAt'] = datetime.utcnow()
-        
-        # Update in database
-        collection = Portfolio.get_collection()
-        collection.update_one(
-            {'_id': ObjectId(portfolio_id)},
-            {'$set': portfolio}
-        )
-        
         return jsonify({
             'success': True,
             'message': 'Portfolio updated successfully',
@@ -175,6 +361,8 @@ def delete_portfolio(current_user, portfolio_id):
                 'message': 'Portfolio not found or not owned by user'
             }), 404
         
+        PortfolioRevision.delete_for_portfolio(portfolio_id)
+        
         return jsonify({
             'success': True,
             'message': 'Portfolio deleted successfully'
@@ -187,10 +375,110 @@ def delete_portfolio(current_user, portfolio_id):
             'error': str(e)
         }), 500
 
+@portfolio_bp.route('/<portfolio_id>/revisions', methods=['GET'])
+@validate_auth_token
+def list_revisions(current_user, portfolio_id):
+    """List revision history for a portfolio"""
+    try:
+        revisions = PortfolioRevision.list_for_portfolio(portfolio_id, current_user['user_id'])
+        
+        return jsonify({
+            'success': True,
+            'revisions': [PortfolioRevision.to_dict(r) for r in revisions]
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': 'Failed to fetch revisions',
+            'error': str(e)
+        }), 500
+
+@portfolio_bp.route('/<portfolio_id>/revisions/<int:rev>', methods=['GET'])
+@validate_auth_token
+def get_revision(current_user, portfolio_id, rev):
+    """Get a portfolio's data and html as of a revision"""
+    try:
+        content = PortfolioRevision.reconstruct(portfolio_id, current_user['user_id'], rev)
+        
+        if content is None:
+            return jsonify({
+                'success': False,
+                'message': 'Revision not found'
+            }), 404
+        
+        data, html = content
+        return jsonify({
+            'success': True,
+            'revision': {
+                'rev': rev,
+                'data': data,
+                'html': html
+            }
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': 'Failed to fetch revision',
+            'error': str(e)
+        }), 500
+
+@portfolio_bp.route('/<portfolio_id>/revisions/<int:rev>/restore', methods=['POST'])
+@validate_auth_token
+def restore_revision(current_user, portfolio_id, rev):
+    """Restore a portfolio to an earlier revision (recorded as a new revision)"""
+    try:
+        portfolio = Portfolio.find_by_id_and_user(portfolio_id, current_user['user_id'])
+        
+        if not portfolio:
+            return jsonify({
+                'success': False,
+                'message': 'Portfolio not found'
+            }), 404
+        
+        content = PortfolioRevision.reconstruct(portfolio_id, current_user['user_id'], rev)
+        if content is None:
+            return jsonify({
+                'success': False,
+                'message': 'Revision not found'
+            }), 404
+        
+        data, html = content
+        Portfolio.update_portfolio(portfolio_id, {'data': data, 'html': html})
+        new_rev = PortfolioRevision.record(
+            portfolio_id, current_user['user_id'],
+            portfolio.get('data'), portfolio.get('html'),
+            data, html,
+            note=f'Restored revision {rev}'
+        )
+        
+        return jsonify({
+            'success': True,
+            'message': 'Portfolio restored successfully',
+            'rev': new_rev,
+            'portfolio': {
+                'id': portfolio_id,
+                'data': data,
+                'html': html
+            }
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': 'Failed to restore revision',
+            'error': str(e)
+        }), 500
+
 @portfolio_bp.route('/<portfolio_id>/deploy', methods=['POST'])
 @validate_auth_token
 def deploy_portfolio(current_user, portfolio_id):
-    """Deploy a portfolio to GitHub Pages"""
+    """Deploy a portfolio to GitHub Pages
+    
+    Optional body: build (default true) and precompress (default
+    SITE_PRECOMPRESS), as for POST /api/github/deploy
+    """
     try:
         portfolio = Portfolio.find_by_id_and_user(portfolio_id, current_user['user_id'])
         
@@ -201,35 +489,52 @@ def deploy_portfolio(current_user, portfolio_id):
             }), 404
         
         # Check if user has GitHub connected
-        user = User.find_by_id(current_user['user_id'])
-        if not user or not user.get('githubConnected'):
+        token_doc = GitHubTokenStore.get_for_user(current_user['user_id'])
+        if not token_doc:
             return jsonify({
                 'success': False,
                 'message': 'GitHub account not connected. Please connect your GitHub account first.',
                 'code': 'GITHUB_NOT_CONNECTED'
             }), 400
         
-        # Update portfolio status to building
-        Portfolio.update_status(portfolio_id, 'building')
+        if not portfolio.get('html'):
+            return jsonify({
+                'success': False,
+                'message': 'Portfolio has no generated HTML to deploy'
+            }), 400
         
-        # TODO: Implement actual GitHub Pages deployment
-        # For now, simulate deployment
-        import time
-        time.sleep(2)  # Simulate deployment time
+        repo = portfolio.get('githubRepo') or repo_name(portfolio['name'])
+        files, build_report = build_for_request(portfolio_files(portfolio, base_href=f'/{repo}/'),
+                                                request.get_json(silent=True) or {}, from_portfolio=True)
+        github_ratelimit.ensure_budget(token_doc['access_token'], 10 + len(files))
         
-        # Generate a mock URL
-        portfolio_name = portfolio['name'].lower().replace(' ', '-')
-        mock_url = f"https://{current_user['email'].split('@')[0]}.github.io/{portfolio_name}"
+        # Marked deployed (or failed) by the pipeline when the job finishes
+        Portfolio.update_status(portfolio_id, 'building', github_repo=repo)
         
-        # Update portfolio with deployed status
-        Portfolio.update_status(portfolio_id, 'deployed', url=mock_url)
+        doc, request_id = deploy_pipeline.enqueue(
+            current_user['user_id'], repo, token_doc.get('login'), files,
+            message=f"Deploy {portfolio['name']}", portfolio_id=portfolio_id,
+            portfolio_status=portfolio.get('status')
+        )
+        deploy = SiteDeployment.job_to_dict(doc, request_id)
         
         return jsonify({
             'success': True,
-            'message': 'Portfolio deployed successfully',
-            'url': mock_url
-        })
-        
+            'message': 'Deployment started',
+            'url': deploy['url'],
+            'jobId': deploy['id'],
+            'requestId': request_id,
+            'state': deploy['state'],
+            'build': build_report,
+            'statusUrl': f'/api/github/deploy/{request_id}'
+        }), 202
+        
+    except RateLimitExceeded as e:
+        return jsonify({
+            'success': False,
+            'message': str(e),
+            'retryAfter': e.retry_after
+        }), 429, {'Retry-After': str(e.retry_after)}
     except Exception as e:
         return jsonify({
             'success': False,
@@ -242,7 +547,7 @@ def deploy_portfolio(current_user, portfolio_id):
 def get_portfolio_stats(current_user):
     """Get portfolio statistics for the user"""
     try:
-        portfolios = Portfolio.find_by_user_id(current_user['user_id'])
+        portfolios = Portfolio.find_by_user_id(current_user['user_id'], projection={'status': 1})
         
         total_count = len(portfolios)
         deployed_count = len([p for p in portfolios if p['status'] == 'deployed'])
@@ -256,8 +561,8 @@ def get_portfolio_stats(current_user):
                 'deployed': deployed_count,
                 'draft': draft_count,
                 'building': building_count,
-                'maxAllowed': 2,
-                'remaining': max(0, 2 - total_count)
+                'maxAllowed': PORTFOLIO_LIMIT,
+                'remaining': max(0, PORTFOLIO_LIMIT - total_count)
             }
         })
         
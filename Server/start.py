@@ -6,38 +6,48 @@ Shows only essential messages
 
 import os
 import sys
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
 
 # Suppress Flask debug messages
 import logging
 logging.getLogger('werkzeug').setLevel(logging.ERROR)
 
-from app import create_app, db_instance
+from app import create_app, db_instance  # also loads .env
+from config.settings import SettingsError
+from models.indexes import ensure_indexes
+from utils.deploy_pipeline import resume_jobs, start_sweeper
+from utils.pages_status import start_reconciler
+from utils import warmup
 
 def main():
     """Main function to start the server cleanly"""
     print("🚀 Starting SkillSlate API...")
     
+    try:
+        app = create_app()
+    except SettingsError as e:
+        print(f"❌ Invalid configuration: {e}")
+        return 1
+    
     # Connect to database
     if not db_instance.connect():
         print("❌ Database connection failed")
         return 1
     
     # Create indexes
-    users_collection = db_instance.get_collection('users')
-    if users_collection is not None:
-        try:
-            users_collection.create_index('email', unique=True)
-        except Exception:
-            pass  # Index might already exist
+    try:
+        ensure_indexes()
+    except Exception:
+        pass  # Index might already exist
+    
+    # Pick up deploys interrupted by the last shutdown
+    resume_jobs()
+    start_sweeper()
+    start_reconciler()
     
-    # Create and run the app
-    app = create_app()
+    # Open connections and load libraries before the first request
+    warmup.run()
     
-    port = int(os.environ.get('PORT', 5000))
+    port = app.config['SETTINGS'].port
     
     print(f"✅ Server ready at http://localhost:{port}")
     print("📡 API endpoints available")
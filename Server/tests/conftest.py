@@ -0,0 +1,75 @@
+"""
+Shared fixtures: an app wired to an in-memory MongoDB (mongomock), and the
+local GitHub stand-in (devtools.fake_github) for code that calls GitHub
+
+Run from Server/ with the dev requirements installed:
+    pip install -r requirements-dev.txt
+    python -m pytest
+"""
+from dataclasses import replace
+from datetime import datetime, timedelta
+
+import jwt
+import mongomock
+import pytest
+from bson import ObjectId
+
+from config.database import db_instance
+from config import settings as settings_module
+from config.settings import install, load_settings
+
+TEST_SECRET_KEY = 'test-secret-key-for-the-pytest-suite'
+
+
+@pytest.fixture(autouse=True)
+def settings():
+    """Development settings for code that runs outside a request (restored afterwards)"""
+    previous = settings_module._installed
+    settings = load_settings({ 'FLASK_ENV': 'development', 'SECRET_KEY': TEST_SECRET_KEY })
+    install(settings)
+    yield settings
+    install(previous)
+
+
+@pytest.fixture
+def db():
+    db_instance.client = mongomock.MongoClient()
+    db_instance.db = db_instance.client['skillslate_test']
+    yield db_instance.db
+    db_instance.client = None
+    db_instance.db = None
+
+
+@pytest.fixture
+def app(db, settings):
+    from app import create_app
+    app = create_app(settings)
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def fake_github(settings):
+    """A running FakeGitHubServer that the GitHub client talks to instead of GitHub"""
+    from devtools.fake_github import FakeGitHubServer
+    server = FakeGitHubServer().start()
+    install(replace(settings, github=replace(settings.github, api_url=server.url, web_url=server.url)))
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def user_id():
+    return str(ObjectId())
+
+
+@pytest.fixture
+def auth_headers(user_id):
+    token = jwt.encode({ 'user_id': user_id, 'exp': datetime.utcnow() + timedelta(hours=1) },
+                       TEST_SECRET_KEY, algorithm='HS256')
+    return { 'Authorization': f'Bearer {token}' }
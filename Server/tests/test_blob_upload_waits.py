@@ -0,0 +1,36 @@
+"""Pooled blob uploads follow the deploy step's no_wait() setting"""
+import time
+
+import pytest
+
+from utils import github_deploy, github_ratelimit
+from utils.github_ratelimit import RateLimitExceeded
+
+TOKEN = 'no-wait-test-token'
+FILES = [{ 'path': f'page{i}.html', 'content': f'<p>{i}</p>' } for i in range(4)]
+
+
+@pytest.fixture
+def exhausted_budget(monkeypatch):
+    """TOKEN is out of budget for 30s, and any rate-limit sleep fails the test"""
+    github_ratelimit.update(TOKEN, 200, { 'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(time.time() + 30) })
+
+    def no_sleep(seconds):
+        raise AssertionError(f'slept {seconds:.0f}s waiting for the rate limit')
+    monkeypatch.setattr(github_ratelimit.time, 'sleep', no_sleep)
+    yield
+    github_ratelimit._budgets.pop(github_ratelimit._key(TOKEN), None)
+
+
+def test_pooled_upload_raises_instead_of_sleeping(exhausted_budget):
+    with github_ratelimit.no_wait():
+        with pytest.raises(RateLimitExceeded):
+            github_deploy.create_blobs(TOKEN, 'octo', 'site', FILES, max_workers=4)
+
+
+def test_pool_threads_get_the_callers_setting():
+    seen = []
+    upload = github_deploy._with_waits(False, lambda: seen.append(github_ratelimit.waits_allowed()))
+    upload()
+    assert seen == [False]
+    assert github_ratelimit.waits_allowed()
@@ -0,0 +1,37 @@
+"""Unchanged-file detection from locally computed git blob SHAs"""
+import base64
+import io
+
+from utils import github_deploy
+
+# `printf 'hello\n' | git hash-object --stdin`
+HELLO_SHA = 'ce013625030ba8dba906f756967f9e9ca394464a'
+
+
+def test_blob_sha_matches_git():
+    assert github_deploy.git_blob_sha({ 'path': 'a.txt', 'content': 'hello\n' }) == HELLO_SHA
+    encoded = base64.b64encode(b'hello\n').decode()
+    assert github_deploy.git_blob_sha({ 'path': 'a.txt', 'content': encoded, 'encoding': 'base64' }) == HELLO_SHA
+
+
+def test_streamed_file_is_hashed_like_inline_content():
+    f = github_deploy.stream_file('a.txt', io.BytesIO(b'hello\n'))
+
+    assert github_deploy.git_blob_sha(f) == HELLO_SHA
+    assert f['size'] == 6 and f['stream'].tell() == 0
+
+
+def test_only_changed_and_new_files_are_pushed():
+    files = [
+        { 'path': 'same.txt', 'content': 'hello\n' },
+        { 'path': 'edited.txt', 'content': 'hello again\n' },
+        { 'path': 'new.txt', 'content': 'hello\n' }
+    ]
+    tree = { 'same.txt': HELLO_SHA, 'edited.txt': HELLO_SHA, 'removed.txt': HELLO_SHA }
+
+    assert [f['path'] for f in github_deploy.changed_files(files, tree)] == ['edited.txt', 'new.txt']
+
+
+def test_everything_is_pushed_to_an_empty_tree():
+    files = [{ 'path': 'index.html', 'content': '<h1>Hi</h1>' }]
+    assert github_deploy.changed_files(files, {}) == files
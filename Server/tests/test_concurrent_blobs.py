@@ -0,0 +1,67 @@
+"""Concurrent blob uploads: bounded in-flight requests, ordered results, first failure re-raised"""
+import threading
+import time
+
+import pytest
+
+from utils import github_deploy
+
+TOKEN = 'concurrent-blobs-token'
+FILES = [{ 'path': f'page{i}.html', 'content': f'<p>{i}</p>' } for i in range(8)]
+
+
+def test_blobs_match_git_and_keep_file_order(fake_github):
+    owner = fake_github.github.config['login']
+    github_deploy.ensure_repo(TOKEN, owner, 'site')
+
+    shas = github_deploy.create_blobs(TOKEN, owner, 'site', FILES, max_workers=4)
+
+    assert list(shas) == [f['path'] for f in FILES]
+    assert shas == { f['path']: github_deploy.git_blob_sha(f) for f in FILES }
+
+
+def test_in_flight_uploads_are_bounded(monkeypatch):
+    lock = threading.Lock()
+    in_flight = [0]
+    peak = [0]
+
+    def slow_upload(token, owner, repo, f):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.02)
+        with lock:
+            in_flight[0] -= 1
+        return f['path']
+    monkeypatch.setattr(github_deploy, 'create_blob', slow_upload)
+
+    github_deploy.create_blobs(TOKEN, 'octo', 'site', FILES, max_workers=3)
+
+    assert 1 < peak[0] <= 3
+
+
+def test_first_failure_is_raised(monkeypatch):
+    def failing_upload(token, owner, repo, f):
+        if f['path'] == 'page2.html':
+            raise RuntimeError('blob rejected')
+        time.sleep(0.01)
+        return f['path']
+    monkeypatch.setattr(github_deploy, 'create_blob', failing_upload)
+
+    with pytest.raises(RuntimeError, match='blob rejected'):
+        github_deploy.create_blobs(TOKEN, 'octo', 'site', FILES, max_workers=2)
+
+
+def test_pool_size_defaults_to_settings(settings, monkeypatch):
+    sizes = []
+    real_executor = github_deploy.ThreadPoolExecutor
+
+    def recording_executor(max_workers):
+        sizes.append(max_workers)
+        return real_executor(max_workers=max_workers)
+    monkeypatch.setattr(github_deploy, 'ThreadPoolExecutor', recording_executor)
+    monkeypatch.setattr(github_deploy, 'create_blob', lambda token, owner, repo, f: f['path'])
+
+    github_deploy.create_blobs(TOKEN, 'octo', 'site', FILES)
+
+    assert sizes == [settings.deploy.blob_upload_workers]
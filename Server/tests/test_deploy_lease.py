@@ -0,0 +1,99 @@
+"""Deploy job leases: progress writes are fenced on the lease owner and state"""
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from models.site_deployment import SiteDeployment
+from utils import deploy_pipeline
+
+
+@pytest.fixture
+def job(db, monkeypatch):
+    """An 'uploading' job of a user with a linked GitHub token; submit() only records"""
+    submitted = []
+    monkeypatch.setattr(deploy_pipeline, 'submit', lambda job_id, delay=0: submitted.append(job_id))
+    user_id = ObjectId()
+    db.github_tokens.insert_one({ 'userId': user_id, 'accessToken': 'gho_test', 'login': 'octo' })
+    job_id = ObjectId()
+    now = datetime.utcnow()
+    db.site_deployments.insert_one({
+        'userId': user_id, 'repo': 'site', 'createdAt': now,
+        'job': { 'id': job_id, 'requestId': job_id, 'requests': [job_id], 'portfolios': [], 'state': 'uploading',
+                 'owner': 'octo', 'branch': 'main', 'path': '/', 'message': 'Deploy', 'files': [], 'url': 'u',
+                 'history': [], 'queuedAt': now, 'leaseOwner': None, 'leaseUntil': None }
+    })
+    return { 'id': str(job_id), 'submitted': submitted, 'db': db }
+
+
+def stored_job(job):
+    return job['db'].site_deployments.find_one({ 'job.id': ObjectId(job['id']) })['job']
+
+
+def test_update_needs_the_lease_and_the_expected_state(job):
+    SiteDeployment.claim_job(job['id'], 'worker-a', 60)
+
+    assert not SiteDeployment.update_job(job['id'], 'worker-b', 'uploading', 'committing')
+    assert not SiteDeployment.update_job(job['id'], 'worker-a', 'queued', 'committing')
+    assert stored_job(job)['state'] == 'uploading'
+
+    assert SiteDeployment.update_job(job['id'], 'worker-a', 'uploading', 'committing')
+    assert stored_job(job)['state'] == 'committing'
+
+
+def test_worker_that_lost_its_lease_stops(job, monkeypatch):
+    def taken_over_mid_step(job_id, doc, job_, token):
+        # The lease expired and another worker's sweeper claimed the job
+        job['db'].site_deployments.update_one({ 'job.id': ObjectId(job_id) }, { '$set': {
+            'job.leaseOwner': 'someone-else', 'job.leaseUntil': datetime.utcnow() + timedelta(minutes=2) } })
+        deploy_pipeline._advance(job_, 'committing', treeSha='t')
+    monkeypatch.setitem(deploy_pipeline._STEPS, 'uploading', taken_over_mid_step)
+
+    deploy_pipeline.run_step(job['id'])
+
+    stored = stored_job(job)
+    assert stored['state'] == 'uploading'
+    assert stored['leaseOwner'] == 'someone-else'
+    assert 'treeSha' not in stored and job['submitted'] == []
+
+
+def test_failure_after_losing_the_lease_does_not_finish_the_job(job, monkeypatch):
+    def taken_over_then_fails(job_id, doc, job_, token):
+        job['db'].site_deployments.update_one({ 'job.id': ObjectId(job_id) }, { '$set': { 'job.leaseOwner': 'someone-else' } })
+        raise RuntimeError('GitHub said no')
+    monkeypatch.setitem(deploy_pipeline._STEPS, 'uploading', taken_over_then_fails)
+
+    deploy_pipeline.run_step(job['id'])
+
+    assert stored_job(job)['state'] == 'uploading'
+
+
+def test_advance_keeps_the_lease_for_the_next_step(job, monkeypatch):
+    monkeypatch.setitem(deploy_pipeline._STEPS, 'uploading',
+                        lambda job_id, doc, job_, token: deploy_pipeline._advance(job_, 'committing'))
+
+    deploy_pipeline.run_step(job['id'])
+
+    stored = stored_job(job)
+    assert stored['state'] == 'committing'
+    assert stored['leaseOwner'] == deploy_pipeline._worker_id()
+    assert stored['leaseUntil'] > datetime.utcnow()
+    assert job['submitted'] == [job['id']]
+
+
+def test_lease_is_renewed_during_a_long_step(job, monkeypatch):
+    monkeypatch.setattr(deploy_pipeline, 'LEASE_SECONDS', 0.3)
+    leases = []
+
+    def slow_step(job_id, doc, job_, token):
+        for _ in range(4):
+            time.sleep(0.15)
+            leases.append(stored_job(job)['leaseUntil'])
+        deploy_pipeline._advance(job_, 'committing')
+    monkeypatch.setitem(deploy_pipeline._STEPS, 'uploading', slow_step)
+
+    deploy_pipeline.run_step(job['id'])
+
+    assert leases[-1] > leases[0]
+    assert stored_job(job)['state'] == 'committing'
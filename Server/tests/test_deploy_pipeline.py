@@ -0,0 +1,244 @@
+"""Deploy job pipeline end to end against the GitHub stand-in"""
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from models.deploy_asset import DeployAsset
+from models.github_token import GitHubTokenStore
+from models.site_deployment import SiteDeployment
+from utils import deploy_pipeline, github_deploy, github_ratelimit
+
+TOKEN = 'pipeline-token'
+SITE = [{ 'path': 'index.html', 'content': '<h1>Hi</h1>' }, { 'path': 'about.html', 'content': '<p>About</p>' }]
+STEPS = ['queued', 'creating_repo', 'uploading', 'committing', 'enabling_pages', 'live']
+
+_replace_job = SiteDeployment.replace_job
+
+
+def replace_job_for_mongomock(job):
+    """SiteDeployment.replace_job with its final $unset stage spelled as the equivalent $project (mongomock lacks $unset)"""
+    *stages, unset = _replace_job(job)
+    return [*stages, { '$project': { field: 0 for field in unset['$unset'] } }]
+
+
+class Pipeline:
+    """A user with a linked token; submitted steps queue up until run() drains them in this thread"""
+
+    def __init__(self, server, db):
+        self.server = server
+        self.db = db
+        self.owner = server.github.config['login']
+        self.user_id = str(ObjectId())
+        self.queue = []
+        GitHubTokenStore.upsert_for_user(self.user_id, TOKEN, login=self.owner)
+
+    def deploy(self, files, repo='site', **kwargs):
+        doc, request_id = deploy_pipeline.enqueue(self.user_id, repo, self.owner, [dict(f) for f in files], **kwargs)
+        return request_id
+
+    def step(self):
+        deploy_pipeline.run_step(self.queue.pop(0))
+
+    def run(self, max_steps=50):
+        for _ in range(max_steps):
+            if not self.queue:
+                return
+            self.step()
+        raise AssertionError('deploy did not settle')
+
+    def job(self, request_id):
+        return SiteDeployment.job_to_dict(SiteDeployment.get_job(request_id, self.user_id), request_id)
+
+    def record(self, repo='site'):
+        return SiteDeployment.get(self.user_id, repo)
+
+    def published(self, repo='site', branch='main'):
+        """path -> blob SHA at the head of branch on the stand-in"""
+        ref = github_deploy.github_client.get(f'/repos/{self.owner}/{repo}/git/refs/heads/{branch}', TOKEN).json()
+        commit = github_deploy.github_client.get(f"/repos/{self.owner}/{repo}/git/commits/{ref['object']['sha']}", TOKEN).json()
+        return github_deploy.get_tree_shas(TOKEN, self.owner, repo, commit['tree']['sha'])
+
+    def calls(self, endpoint):
+        return self.server.github.get_stats()['endpoints'].get(endpoint, {}).get('count', 0)
+
+    def insert_portfolio(self, status='draft'):
+        portfolio_id = ObjectId()
+        now = datetime.utcnow()
+        self.db.portfolios.insert_one({ '_id': portfolio_id, 'userId': ObjectId(self.user_id), 'name': 'Site',
+                                        'template': 'modern', 'status': status, 'createdAt': now, 'updatedAt': now })
+        return str(portfolio_id)
+
+    def portfolio_status(self, portfolio_id):
+        return self.db.portfolios.find_one({ '_id': ObjectId(portfolio_id) })['status']
+
+
+@pytest.fixture
+def pipeline(db, fake_github, monkeypatch):
+    SiteDeployment.create_indexes()
+    monkeypatch.setattr(SiteDeployment, 'replace_job', staticmethod(replace_job_for_mongomock))
+    # GridFS does not run on mongomock; no test here spools files
+    monkeypatch.setattr(DeployAsset, 'delete_for_requests', staticmethod(lambda request_ids: None))
+    p = Pipeline(fake_github, db)
+    monkeypatch.setattr(deploy_pipeline, 'submit', lambda job_id, delay=0: p.queue.append(job_id))
+    yield p
+    github_ratelimit._budgets.pop(github_ratelimit._key(TOKEN), None)
+
+
+def blob_shas(files):
+    return { f['path']: github_deploy.git_blob_sha(f) for f in files }
+
+
+def test_deploy_runs_every_step_and_publishes_the_files(pipeline):
+    portfolio_id = pipeline.insert_portfolio()
+
+    request_id = pipeline.deploy(SITE, portfolio_id=portfolio_id, portfolio_status='draft')
+    pipeline.run()
+
+    job = pipeline.job(request_id)
+    assert job['state'] == 'live' and job['error'] is None
+    assert [h['state'] for h in job['history']] == STEPS
+    # On top of the README the repo was created with
+    assert blob_shas(SITE).items() <= pipeline.published().items()
+    assert pipeline.portfolio_status(portfolio_id) == 'deployed'
+    # Finished jobs don't keep their file contents
+    assert 'files' not in pipeline.record()['job']
+
+
+def test_step_error_fails_the_job(pipeline):
+    portfolio_id = pipeline.insert_portfolio()
+    pipeline.server.github.config['faults'] = [{ 'method': 'POST', 'path': '/git/trees$', 'status': 500, 'times': 1 }]
+
+    request_id = pipeline.deploy(SITE, portfolio_id=portfolio_id, portfolio_status='draft')
+    pipeline.run()
+
+    job = pipeline.job(request_id)
+    assert job['state'] == 'failed'
+    assert '500' in job['error']
+    assert pipeline.portfolio_status(portfolio_id) == 'failed'
+
+
+def test_rate_limited_step_is_rescheduled_not_failed(pipeline, monkeypatch):
+    monkeypatch.setattr(github_ratelimit.time, 'sleep', lambda seconds: pytest.fail(f'slept {seconds}s in a deploy step'))
+    pipeline.server.github.config['faults'] = [{ 'method': 'POST', 'path': '/git/trees$', 'status': 403, 'times': 1,
+                                                 'retryAfter': 30 }]
+
+    request_id = pipeline.deploy(SITE)
+    pipeline.step()  # creating_repo
+    pipeline.step()  # uploading
+
+    job = pipeline.job(request_id)
+    assert job['state'] == 'uploading'
+    assert 'rate limit' in job['error']
+    assert pipeline.queue == [job['id']]
+    # The worker keeps the lease until the retry runs
+    assert pipeline.record()['job']['leaseUntil'] > datetime.utcnow()
+
+
+def test_resume_picks_up_jobs_without_a_lease(pipeline):
+    request_id = pipeline.deploy(SITE)
+    pipeline.queue.clear()  # the worker died before running the first step
+
+    assert deploy_pipeline.resume_jobs() == 1
+    pipeline.run()
+
+    assert pipeline.job(request_id)['state'] == 'live'
+
+
+EDITED = [SITE[0], { 'path': 'about.html', 'content': '<p>About us</p>' }]
+GET_REF = 'GET /repos/<owner>/<name>/git/refs/heads/<path:branch>'
+POST_COMMIT = 'POST /repos/<owner>/<name>/git/commits'
+
+
+def test_live_deploy_caches_the_repo_head(pipeline):
+    request_id = pipeline.deploy(SITE)
+    pipeline.run()
+
+    meta = pipeline.record()['meta']
+    assert meta['repoExists'] and meta['branch'] == 'main'
+    assert meta['headSha'] == pipeline.job(request_id)['commit']
+    assert { b['path']: b['sha'] for b in meta['blobShas'] } == blob_shas(SITE)
+
+
+def test_redeploy_skips_the_repo_reads(pipeline):
+    pipeline.deploy(SITE)
+    pipeline.run()
+    pipeline.server.github.reset_stats()
+
+    request_id = pipeline.deploy(EDITED)
+    pipeline.run()
+
+    job = pipeline.job(request_id)
+    assert job['state'] == 'live' and job['changed'] == 1
+    assert pipeline.calls(GET_REF) == 0
+    assert blob_shas(EDITED).items() <= pipeline.published().items()
+
+
+def test_identical_redeploy_pushes_nothing(pipeline):
+    first = pipeline.deploy(SITE)
+    pipeline.run()
+    pipeline.server.github.reset_stats()
+
+    request_id = pipeline.deploy(SITE)
+    pipeline.run()
+
+    job = pipeline.job(request_id)
+    assert job['state'] == 'live' and job['changed'] == 0
+    assert job['commit'] == pipeline.job(first)['commit']
+    assert pipeline.calls(POST_COMMIT) == 0
+
+
+def test_branch_moved_outside_the_app_is_not_overwritten(pipeline):
+    pipeline.deploy(SITE)
+    pipeline.run()
+    # Someone pushes a commit adding a file; our cached head is now stale
+    client, owner = github_deploy.github_client, pipeline.owner
+    head = pipeline.record()['meta']['headSha']
+    extra = { 'path': 'extra.txt', 'content': 'pushed elsewhere\n' }
+    tree = client.post(f'/repos/{owner}/site/git/trees', TOKEN, json={
+        'base_tree': pipeline.record()['meta']['treeSha'],
+        'tree': [{ 'path': extra['path'], 'mode': '100644', 'type': 'blob', 'content': extra['content'] }]
+    }).json()['sha']
+    commit = client.post(f'/repos/{owner}/site/git/commits', TOKEN, json={ 'message': 'elsewhere', 'tree': tree, 'parents': [head] }).json()['sha']
+    client.patch(f'/repos/{owner}/site/git/refs/heads/main', TOKEN, json={ 'sha': commit }).raise_for_status()
+
+    request_id = pipeline.deploy(EDITED)
+    pipeline.run()
+
+    # The non-forced ref update was rejected, so the job re-read the branch and built on the new head
+    assert pipeline.job(request_id)['state'] == 'live'
+    assert pipeline.record()['job']['refreshes'] == 1
+    assert { **blob_shas(EDITED), **blob_shas([extra]) }.items() <= pipeline.published().items()
+
+
+def test_requests_before_the_files_are_read_merge_into_one_job(pipeline):
+    first = pipeline.deploy(SITE)
+    second = pipeline.deploy(EDITED)
+    pipeline.run()
+
+    job = pipeline.job(first)
+    assert job['state'] == 'live' and job['coalesced'] == 2
+    assert job['superseded'] and job['publishedRequestId'] == second
+    assert not pipeline.job(second)['superseded']
+    assert pipeline.calls(POST_COMMIT) == 1
+    assert blob_shas(EDITED).items() <= pipeline.published().items()
+
+
+def test_waiting_request_is_replaced_and_runs_after_the_job(pipeline):
+    portfolios = [pipeline.insert_portfolio('building') for _ in range(3)]
+    first = pipeline.deploy(SITE, portfolio_id=portfolios[0], portfolio_status='draft')
+    pipeline.step()  # past creating_repo: the job has read its files
+    replaced = pipeline.deploy(EDITED, portfolio_id=portfolios[1], portfolio_status='draft')
+    newest = [{ 'path': 'index.html', 'content': '<h1>Newest</h1>' }]
+    last = pipeline.deploy(newest, portfolio_id=portfolios[2], portfolio_status='deployed')
+
+    waiting = pipeline.job(replaced)
+    assert waiting['state'] == 'pending' and waiting['superseded'] and waiting['coalesced'] == 2
+
+    pipeline.run()
+
+    assert pipeline.job(first)['state'] == 'live'
+    assert pipeline.job(last)['state'] == 'live' and pipeline.job(replaced)['superseded']
+    assert blob_shas(newest).items() <= pipeline.published().items()
+    # The replaced request's portfolio goes back to its status from before it was deployed
+    assert [pipeline.portfolio_status(p) for p in portfolios] == ['deployed', 'draft', 'deployed']
@@ -0,0 +1,147 @@
+"""Server entry points: gunicorn hooks and the per-worker / dev-reloader startup"""
+import importlib
+import runpy
+import sys
+from pathlib import Path
+
+import pytest
+
+from tests.conftest import TEST_SECRET_KEY
+
+GUNICORN_CONF = str(Path(__file__).resolve().parent.parent / 'gunicorn.conf.py')
+
+
+@pytest.fixture
+def dev_env(monkeypatch):
+    """Environment the entry points build their app from"""
+    monkeypatch.setenv('FLASK_ENV', 'development')
+    monkeypatch.setenv('SECRET_KEY', TEST_SECRET_KEY)
+    monkeypatch.delenv('TOKEN_ENCRYPTION_KEY', raising=False)
+
+
+@pytest.fixture
+def wsgi(dev_env, monkeypatch):
+    """wsgi, imported fresh, with its startup work recorded instead of run"""
+    monkeypatch.delitem(sys.modules, 'wsgi', raising=False)
+    module = importlib.import_module('wsgi')
+    calls = []
+    module.calls = calls
+    monkeypatch.setattr(module.db_instance, 'connect', lambda: calls.append('connect') or True)
+    monkeypatch.setattr(module.db_instance, 'disconnect', lambda: calls.append('disconnect'))
+    for name in ('ensure_indexes', 'resume_jobs', 'start_sweeper', 'start_reconciler'):
+        monkeypatch.setattr(module, name, lambda name=name: calls.append(name))
+    monkeypatch.setattr(module.warmup, 'run', lambda: calls.append('warmup'))
+    return module
+
+
+def test_wsgi_builds_the_app_at_import(wsgi):
+    assert wsgi.app.config['SETTINGS'].env == 'development'
+
+
+def test_master_creates_indexes_and_disconnects_before_forking(wsgi):
+    assert wsgi.prepare_database()
+
+    assert wsgi.calls == ['connect', 'ensure_indexes', 'disconnect']
+
+
+def test_worker_connects_resumes_and_warms_up_in_order(wsgi):
+    assert wsgi.init_worker()
+
+    assert wsgi.calls == ['connect', 'resume_jobs', 'start_sweeper', 'start_reconciler', 'warmup']
+
+
+def test_worker_without_a_database_starts_nothing(wsgi, monkeypatch):
+    monkeypatch.setattr(wsgi.db_instance, 'connect', lambda: False)
+
+    assert not wsgi.init_worker()
+    assert wsgi.calls == []
+
+
+class FakeArbiter:
+    WORKER_BOOT_ERROR = 3
+
+    def __init__(self):
+        self.errors = []
+        self.log = self
+
+    def error(self, message, *args):
+        self.errors.append(message % args)
+
+
+class FakeWorker:
+    pid = 4242
+
+
+def load_gunicorn_conf(monkeypatch, **env):
+    for name in ('GUNICORN_WORKER_CLASS', 'GUNICORN_WORKERS', 'WEB_CONCURRENCY', 'GUNICORN_THREADS'):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    return runpy.run_path(GUNICORN_CONF)
+
+
+def test_gunicorn_defaults_to_threaded_preloaded_workers(monkeypatch):
+    conf = load_gunicorn_conf(monkeypatch)
+
+    assert conf['worker_class'] == 'gthread'
+    assert conf['preload_app'] is True
+    assert 1 <= conf['workers'] <= 12 and conf['threads'] == 8
+
+
+def test_gunicorn_settings_come_from_the_environment(monkeypatch):
+    conf = load_gunicorn_conf(monkeypatch, GUNICORN_WORKERS='3', GUNICORN_THREADS='16')
+
+    assert conf['workers'] == 3 and conf['threads'] == 16
+
+
+def test_post_fork_runs_the_worker_startup(wsgi, monkeypatch):
+    conf = load_gunicorn_conf(monkeypatch)
+    server = FakeArbiter()
+
+    conf['post_fork'](server, FakeWorker())
+
+    assert wsgi.calls[-1] == 'warmup' and server.errors == []
+
+
+def test_worker_that_cannot_connect_exits_with_a_boot_error(wsgi, monkeypatch):
+    conf = load_gunicorn_conf(monkeypatch)
+    monkeypatch.setattr(wsgi, 'init_worker', lambda: False)
+    server = FakeArbiter()
+
+    with pytest.raises(SystemExit) as e:
+        conf['post_fork'](server, FakeWorker())
+
+    assert e.value.code == FakeArbiter.WORKER_BOOT_ERROR
+    assert server.errors == ['Worker 4242 could not connect to the database']
+
+
+@pytest.fixture
+def dev(dev_env, monkeypatch):
+    """dev.main() with the server and its startup work recorded instead of run"""
+    import dev
+    from flask import Flask
+    calls = []
+    dev.calls = calls
+    monkeypatch.setattr(dev.db_instance, 'connect', lambda: True)
+    monkeypatch.setattr(dev, 'ensure_indexes', lambda: None)
+    for name in ('resume_jobs', 'start_sweeper', 'start_reconciler'):
+        monkeypatch.setattr(dev, name, lambda name=name: calls.append(name))
+    monkeypatch.setattr(dev.warmup, 'start', lambda: calls.append('warmup'))
+    monkeypatch.setattr(Flask, 'run', lambda self, **kwargs: calls.append('run'))
+    return dev
+
+
+def test_reloader_watcher_starts_no_background_work(dev, monkeypatch):
+    monkeypatch.delenv('WERKZEUG_RUN_MAIN', raising=False)
+
+    dev.main()
+
+    assert dev.calls == ['run']
+
+
+def test_reloaded_server_starts_background_work(dev, monkeypatch):
+    monkeypatch.setenv('WERKZEUG_RUN_MAIN', 'true')
+
+    dev.main()
+
+    assert dev.calls == ['resume_jobs', 'start_sweeper', 'start_reconciler', 'warmup', 'run']
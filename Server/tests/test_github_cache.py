@@ -0,0 +1,77 @@
+"""Conditional-request cache: revalidated GETs, 304s served locally, bounded LRU"""
+from dataclasses import replace
+
+import pytest
+import requests
+
+from config.settings import install
+from utils import github_cache, github_client
+
+TOKEN = 'etag-cache-token'
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    github_cache._entries.clear()
+    yield
+    github_cache._entries.clear()
+
+
+def test_unchanged_response_is_revalidated_and_served_from_cache(fake_github):
+    first = github_client.cached_get('/user', TOKEN)
+    second = github_client.cached_get('/user', TOKEN)
+
+    assert not getattr(first, 'from_cache', False)
+    assert second.from_cache and second.status_code == 200
+    assert second.json() == first.json()
+    assert fake_github.github.get_stats()['notModified'] == 1
+
+
+def test_changed_response_is_never_stale(fake_github):
+    github_client.cached_get('/user', TOKEN)
+    fake_github.github.config['login'] = 'renamed'
+
+    res = github_client.cached_get('/user', TOKEN)
+
+    assert not getattr(res, 'from_cache', False)
+    assert res.json()['login'] == 'renamed'
+    assert fake_github.github.get_stats()['notModified'] == 0
+
+
+def test_entries_are_per_token(fake_github):
+    github_client.cached_get('/user', TOKEN)
+
+    res = github_client.cached_get('/user', 'another-token')
+
+    assert not getattr(res, 'from_cache', False)
+    assert github_cache.cache_key(TOKEN, 'u') != github_cache.cache_key('another-token', 'u')
+
+
+def response(status, headers, body=b'{}'):
+    res = requests.Response()
+    res.status_code = status
+    res.headers.update(headers)
+    res._content = body
+    return res
+
+
+def test_only_200s_with_a_validator_are_stored():
+    github_cache.store('no-validator', response(200, {}))
+    github_cache.store('not-found', response(404, { 'ETag': '"a"' }))
+    github_cache.store('ok', response(200, { 'ETag': '"a"', 'X-RateLimit-Remaining': '10' }))
+
+    assert github_cache.lookup('no-validator') is None and github_cache.lookup('not-found') is None
+    assert github_cache.lookup('ok')['headers'] == { 'ETag': '"a"' }
+    assert github_cache.conditional_headers(github_cache.lookup('ok')) == { 'If-None-Match': '"a"' }
+
+
+def test_least_recently_used_entry_is_evicted(settings):
+    install(replace(settings, github=replace(settings.github, cache_max_entries=2)))
+    for key in ('a', 'b'):
+        github_cache.store(key, response(200, { 'ETag': f'"{key}"' }))
+    github_cache.lookup('a')
+
+    github_cache.store('c', response(200, { 'ETag': '"c"' }))
+
+    assert github_cache.lookup('b') is None
+    assert github_cache.lookup('a') and github_cache.lookup('c')
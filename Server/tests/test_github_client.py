@@ -0,0 +1,80 @@
+"""Shared GitHub client: retry policy, secondary rate limits and per-endpoint metrics"""
+import pytest
+
+from utils import github_client, github_ratelimit
+from utils.github_ratelimit import RateLimitExceeded
+
+
+def fault(server, method, path, status, retry_after=None):
+    server.github.config['faults'] = [{ 'method': method, 'path': path, 'status': status, 'times': 1,
+                                        'retryAfter': retry_after }]
+
+
+def calls(server, endpoint):
+    return server.github.get_stats()['endpoints'].get(endpoint, {}).get('statuses', {})
+
+
+def test_get_is_retried_after_a_server_error(fake_github):
+    fault(fake_github, 'GET', '^/user$', 502)
+
+    res = github_client.get('/user', 'client-retry-get')
+
+    assert res.status_code == 200
+    assert fake_github.github.get_stats()['faults'] == 1
+
+
+def test_post_is_not_retried_after_a_server_error(fake_github):
+    fault(fake_github, 'POST', '^/user/repos$', 500)
+
+    res = github_client.post('/user/repos', 'client-retry-post', json={ 'name': 'site' })
+
+    # GitHub may have acted on it; resending could create the repo twice
+    assert res.status_code == 500
+    assert calls(fake_github, 'POST /user/repos') == { '500': 1 }
+
+
+def test_secondary_rate_limit_is_retried_for_any_method(fake_github):
+    fault(fake_github, 'POST', '^/user/repos$', 429, retry_after=0)
+
+    res = github_client.post('/user/repos', 'client-retry-secondary', json={ 'name': 'site' })
+
+    assert res.status_code == 201
+    assert calls(fake_github, 'POST /user/repos') == { '429': 1, '201': 1 }
+
+
+def test_secondary_rate_limit_raises_inside_no_wait(fake_github):
+    token = 'client-no-wait'
+    fault(fake_github, 'GET', '^/user$', 403, retry_after=30)
+
+    with github_ratelimit.no_wait():
+        with pytest.raises(RateLimitExceeded) as e:
+            github_client.get('/user', token)
+
+    assert e.value.retry_after == 30
+    assert fake_github.github.get_stats()['faults'] == 1
+    github_ratelimit._budgets.pop(github_ratelimit._key(token), None)
+
+
+@pytest.mark.parametrize('url, key', [
+    ('https://api.github.com/repos/octo/site/git/refs/heads/feature/x', 'GET api.github.com/repos/:owner/:repo/git/refs/heads/:branch'),
+    ('https://api.github.com/repos/octo/site/git/trees/' + 'a' * 40 + '?recursive=1', 'GET api.github.com/repos/:owner/:repo/git/trees/:sha'),
+    ('https://api.github.com/user', 'GET api.github.com/user')
+])
+def test_metrics_group_calls_by_endpoint(url, key):
+    assert github_client._endpoint_key('get', url) == key
+
+
+def test_calls_are_recorded_per_endpoint(fake_github):
+    github_client.reset_metrics()
+
+    github_client.get('/user', 'client-metrics')
+    github_client.get('/user', 'client-metrics')
+
+    metrics = github_client.get_metrics()
+    (key,) = metrics
+    assert key.endswith('/user')
+    assert metrics[key]['count'] == 2 and metrics[key]['errors'] == 0
+
+
+def test_one_session_per_process():
+    assert github_client.get_session() is github_client.get_session()
@@ -0,0 +1,80 @@
+"""GitHub profile fetched with concurrent calls and reused between sign-in and linking"""
+import threading
+
+import pytest
+
+from utils import github_client, github_profile
+from utils.github_profile import GitHubProfileError
+
+TOKEN = 'profile-token'
+
+
+@pytest.fixture(autouse=True)
+def no_cached_profiles():
+    github_profile._profiles.clear()
+    yield
+    github_profile._profiles.clear()
+
+
+def calls(server, endpoint):
+    return server.github.get_stats()['endpoints'].get(endpoint, {}).get('count', 0)
+
+
+def test_profile_has_login_and_primary_email(fake_github):
+    profile = github_profile.fetch_profile(TOKEN)
+
+    assert profile['login'] == 'octocat'
+    assert profile['email'] == 'octocat@example.test'
+    assert profile['user']['avatar_url']
+
+
+def test_user_and_emails_are_fetched_concurrently(monkeypatch):
+    # Each call waits for the other; run one after the other, they would time out
+    both_in_flight = threading.Barrier(2, timeout=5)
+    responses = {
+        '/user': { 'login': 'octo' },
+        '/user/emails': [{ 'email': 'o@example.test', 'primary': True }]
+    }
+
+    class Response:
+        ok = True
+
+        def __init__(self, url):
+            self.url = url
+
+        def json(self):
+            return responses[self.url]
+
+    def get(url, token, **kwargs):
+        both_in_flight.wait()
+        return Response(url)
+    monkeypatch.setattr(github_client, 'get', get)
+
+    assert github_profile.fetch_profile(TOKEN)['email'] == 'o@example.test'
+
+
+def test_second_fetch_is_served_from_the_cache(fake_github):
+    github_profile.fetch_profile(TOKEN)
+    github_profile.fetch_profile(TOKEN)
+
+    assert calls(fake_github, 'GET /user') == 1
+
+    github_profile.invalidate(TOKEN)
+    github_profile.fetch_profile(TOKEN)
+    assert calls(fake_github, 'GET /user') == 2
+
+
+def test_cached_profile_expires(fake_github, monkeypatch):
+    github_profile.fetch_profile(TOKEN)
+    now = github_profile.time.monotonic()
+    monkeypatch.setattr(github_profile.time, 'monotonic', lambda: now + github_profile.PROFILE_TTL_SECONDS + 1)
+
+    assert github_profile.cached_profile(TOKEN) is None
+
+
+def test_failed_call_raises_and_is_not_cached(fake_github):
+    fake_github.github.config['faults'] = [{ 'method': 'GET', 'path': '^/user/emails$', 'status': 401, 'times': 1 }]
+
+    with pytest.raises(GitHubProfileError, match='emails'):
+        github_profile.fetch_profile(TOKEN)
+    assert github_profile.cached_profile(TOKEN) is None
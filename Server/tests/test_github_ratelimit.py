@@ -0,0 +1,58 @@
+"""Per-token rate-limit budgets stay bounded: least recently updated and expired ones are dropped"""
+from collections import OrderedDict
+
+import pytest
+
+from utils import github_ratelimit
+from utils.github_ratelimit import RateLimitExceeded
+
+NOW = 1_800_000_000.0
+HEADERS = { 'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(NOW + 600) }
+
+
+@pytest.fixture(autouse=True)
+def budgets(monkeypatch):
+    """An empty budget table and a clock that only moves when told to"""
+    monkeypatch.setattr(github_ratelimit, '_budgets', OrderedDict())
+    clock = [NOW]
+    monkeypatch.setattr(github_ratelimit.time, 'time', lambda: clock[0])
+    return clock
+
+
+def tracked():
+    return github_ratelimit.get_stats()['trackedTokens']
+
+
+def test_least_recently_updated_token_is_dropped(monkeypatch):
+    monkeypatch.setattr(github_ratelimit, 'MAX_TRACKED_TOKENS', 2)
+    github_ratelimit.update('first', 200, HEADERS)
+    github_ratelimit.update('second', 200, HEADERS)
+    github_ratelimit.update('first', 200, HEADERS)
+
+    github_ratelimit.update('third', 200, HEADERS)
+
+    assert tracked() == 2
+    # 'second' was forgotten, so it's no longer held back; 'first' still is
+    github_ratelimit.acquire('second', 'background')
+    with pytest.raises(RateLimitExceeded):
+        github_ratelimit.acquire('first', 'background')
+
+
+def test_budget_not_updated_for_the_ttl_expires(budgets):
+    github_ratelimit.update('idle', 403, { 'Retry-After': str(2 * github_ratelimit.BUDGET_TTL_SECONDS) })
+    with pytest.raises(RateLimitExceeded):
+        github_ratelimit.ensure_budget('idle', 1)
+
+    budgets[0] += github_ratelimit.BUDGET_TTL_SECONDS
+
+    github_ratelimit.ensure_budget('idle', 1)
+    assert tracked() == 0
+
+
+def test_expired_budgets_are_dropped_when_others_update(budgets):
+    github_ratelimit.update('idle', 200, HEADERS)
+    budgets[0] += github_ratelimit.BUDGET_TTL_SECONDS
+
+    github_ratelimit.update('active', 200, HEADERS)
+
+    assert list(github_ratelimit._budgets) == [github_ratelimit._key('active')]
@@ -0,0 +1,90 @@
+"""GitHub token store: encryption at rest and the per-process token cache"""
+from dataclasses import replace
+
+import pytest
+from bson import ObjectId
+from cryptography.fernet import Fernet
+
+from config.settings import install
+from models.github_token import GitHubTokenStore
+from utils import token_crypto
+
+TOKEN = 'gho_stored-token'
+
+
+@pytest.fixture
+def encryption():
+    """Encrypt tokens with a fresh master key (plaintext again afterwards)"""
+    key = Fernet.generate_key().decode('ascii')
+    token_crypto.configure(key)
+    yield key
+    token_crypto.configure('')
+
+
+def stored(db, user_id):
+    return db.github_tokens.find_one({ 'userId': ObjectId(user_id) })
+
+
+def test_token_is_stored_encrypted(db, user_id, encryption):
+    GitHubTokenStore.upsert_for_user(user_id, TOKEN, login='octocat')
+
+    doc = stored(db, user_id)
+    assert 'accessToken' not in doc
+    assert TOKEN.encode() not in bytes(doc['accessTokenEnc'])
+    assert db.data_keys.count_documents({}) == 1
+    # Read back from the database, not the cache
+    GitHubTokenStore.invalidate(user_id)
+    token = GitHubTokenStore.get_for_user(user_id)
+    assert token['access_token'] == TOKEN and token['login'] == 'octocat'
+
+
+def test_plaintext_token_is_encrypted_when_read(db, user_id, encryption):
+    db.github_tokens.insert_one({ 'userId': ObjectId(user_id), 'accessToken': TOKEN, 'tokenType': 'bearer' })
+
+    assert GitHubTokenStore.get_for_user(user_id)['access_token'] == TOKEN
+
+    doc = stored(db, user_id)
+    assert 'accessToken' not in doc
+    assert token_crypto.decrypt(doc['accessTokenEnc'], doc['keyId']) == TOKEN
+
+
+def test_token_under_another_master_key_reads_as_missing(db, user_id, encryption):
+    GitHubTokenStore.upsert_for_user(user_id, TOKEN)
+    GitHubTokenStore.invalidate(user_id)
+
+    token_crypto.configure(Fernet.generate_key().decode('ascii'))
+
+    assert GitHubTokenStore.get_for_user(user_id) is None
+
+
+def test_plaintext_without_a_master_key(db, user_id):
+    GitHubTokenStore.upsert_for_user(user_id, TOKEN)
+
+    doc = stored(db, user_id)
+    assert doc['accessToken'] == TOKEN and 'accessTokenEnc' not in doc
+
+
+def test_lookups_are_served_from_the_cache(db, user_id):
+    GitHubTokenStore.upsert_for_user(user_id, TOKEN)
+    db.github_tokens.update_one({ 'userId': ObjectId(user_id) }, { '$set': { 'accessToken': 'changed elsewhere' } })
+
+    # Another worker's write shows up once the cached entry expires
+    assert GitHubTokenStore.get_for_user(user_id)['access_token'] == TOKEN
+    GitHubTokenStore.invalidate(user_id)
+    assert GitHubTokenStore.get_for_user(user_id)['access_token'] == 'changed elsewhere'
+
+
+def test_cache_entries_expire(db, user_id, settings):
+    install(replace(settings, github=replace(settings.github, token_cache_seconds=0)))
+    GitHubTokenStore.upsert_for_user(user_id, TOKEN)
+    db.github_tokens.update_one({ 'userId': ObjectId(user_id) }, { '$set': { 'accessToken': 'changed elsewhere' } })
+
+    assert GitHubTokenStore.get_for_user(user_id)['access_token'] == 'changed elsewhere'
+
+
+def test_delete_drops_the_cached_token(db, user_id):
+    GitHubTokenStore.upsert_for_user(user_id, TOKEN)
+
+    GitHubTokenStore.delete_for_user(user_id)
+
+    assert GitHubTokenStore.get_for_user(user_id) is None
@@ -0,0 +1,71 @@
+"""Inline tree strategy: which files go inline, and the result against the GitHub stand-in"""
+import base64
+
+import pytest
+
+from utils import github_client, github_deploy
+
+TOKEN = 'test-token'
+BLOBS = 'POST /repos/<owner>/<name>/git/blobs'
+
+
+@pytest.fixture
+def repo(fake_github):
+    github_deploy.ensure_repo(TOKEN, fake_github.github.config['login'], 'site')
+    fake_github.github.reset_stats()
+    return fake_github
+
+
+def endpoint_count(server, endpoint):
+    return server.github.get_stats()['endpoints'].get(endpoint, {}).get('count', 0)
+
+
+@pytest.mark.parametrize('f, inline', [
+    ({ 'path': 'index.html', 'content': 'x' * 1024 }, True),
+    ({ 'path': 'index.html', 'content': 'x' * 1025 }, False),
+    # The limit is on the UTF-8 size, not the character count
+    ({ 'path': 'index.html', 'content': 'é' * 513 }, False),
+    ({ 'path': 'logo.png', 'content': 'iVBORw0K', 'encoding': 'base64' }, False)
+])
+def test_can_inline_small_utf8_text_only(f, inline):
+    assert github_deploy.can_inline(f, 1024) is inline
+
+
+def test_inline_threshold_comes_from_settings(settings):
+    assert settings.deploy.inline_tree_max_bytes == 256 * 1024
+    assert github_deploy.can_inline({ 'path': 'a.html', 'content': 'x' * 256 * 1024 })
+    assert not github_deploy.can_inline({ 'path': 'a.html', 'content': 'x' * (256 * 1024 + 1) })
+
+
+def test_small_text_files_go_inline(repo):
+    owner = repo.github.config['login']
+    files = [
+        { 'path': 'index.html', 'content': '<h1>Hi</h1>' },
+        { 'path': 'css/site.css', 'content': 'p { color: red }' },
+        { 'path': 'logo.png', 'content': base64.b64encode(b'\x89PNG\r\n').decode(), 'encoding': 'base64' },
+        { 'path': 'big.html', 'content': 'x' * 2048 }
+    ]
+
+    items = github_deploy.build_tree_items(TOKEN, owner, 'site', files, inline_max_bytes=1024)
+
+    by_path = { i['path']: i for i in items }
+    assert by_path['index.html']['content'] == '<h1>Hi</h1>'
+    assert by_path['css/site.css']['content'] == 'p { color: red }'
+    # Binary and over-threshold files are uploaded as blobs and referenced by SHA
+    assert 'sha' in by_path['logo.png'] and 'content' not in by_path['logo.png']
+    assert 'sha' in by_path['big.html'] and 'content' not in by_path['big.html']
+    assert endpoint_count(repo, BLOBS) == 2
+
+
+def test_inline_tree_round_trips_through_github(repo):
+    owner = repo.github.config['login']
+    files = [{ 'path': 'index.html', 'content': '<h1>Hi</h1>' }, { 'path': 'about.html', 'content': '<p>About</p>' }]
+
+    items = github_deploy.build_tree_items(TOKEN, owner, 'site', files)
+    res = github_client.post(f'/repos/{owner}/site/git/trees', TOKEN, json={ 'tree': items })
+    res.raise_for_status()
+
+    # The tree holds the same blobs a blob-per-file push would have created
+    shas = github_deploy.get_tree_shas(TOKEN, owner, 'site', res.json()['sha'])
+    assert shas == { f['path']: github_deploy.git_blob_sha(f) for f in files }
+    assert endpoint_count(repo, BLOBS) == 0
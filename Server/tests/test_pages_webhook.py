@@ -0,0 +1,124 @@
+"""Pages build status from signed webhook deliveries, with the reconciler as fallback"""
+import hashlib
+import hmac
+import json
+from dataclasses import replace
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from models.github_token import GitHubTokenStore
+from models.site_deployment import SiteDeployment
+from utils import github_deploy, pages_status
+
+SECRET = 'webhook-secret'
+COMMIT = 'a' * 40
+
+
+def sign(body: bytes, secret: str = SECRET) -> str:
+    return 'sha256=' + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+@pytest.fixture
+def webhook_client(db, settings):
+    from app import create_app
+    app = create_app(replace(settings, pages=replace(settings.pages, webhook_secret=SECRET,
+                                                     webhook_url='https://api.example.test/api/github/webhook')))
+    return app.test_client()
+
+
+@pytest.fixture
+def record(db):
+    """A deployed repo whose Pages build for COMMIT has started"""
+    user_id = str(ObjectId())
+    SiteDeployment.upsert(user_id, 'site', 'main', 'https://octo.github.io/site/', COMMIT)
+    SiteDeployment.pages_build_started(user_id, 'site', 'Octo', COMMIT)
+    return user_id
+
+
+def deliver(client, event, payload, signature=None):
+    body = json.dumps(payload).encode()
+    return client.post('/api/github/webhook', data=body, content_type='application/json', headers={
+        'X-GitHub-Event': event, 'X-Hub-Signature-256': signature or sign(body)
+    })
+
+
+def page_build(status, updated_at='2026-01-01T12:00:00Z', commit=COMMIT):
+    return { 'repository': { 'name': 'site', 'owner': { 'login': 'octo' } },
+             'build': { 'status': status, 'commit': commit, 'updated_at': updated_at, 'error': { 'message': None } } }
+
+
+def pages(user_id):
+    return SiteDeployment.get(user_id, 'site')['pages']
+
+
+def test_signature_check():
+    body = b'{"zen":"Keep it logically awesome."}'
+
+    assert pages_status.verify_signature(body, sign(body), SECRET)
+    assert not pages_status.verify_signature(body, sign(body, 'other'), SECRET)
+    assert not pages_status.verify_signature(body + b' ', sign(body), SECRET)
+    assert not pages_status.verify_signature(body, None, SECRET)
+    assert not pages_status.verify_signature(body, sign(body), '')
+
+
+def test_receiver_is_off_without_a_secret(client):
+    assert deliver(client, 'ping', {}).status_code == 404
+
+
+def test_unsigned_delivery_is_rejected(webhook_client, record):
+    res = deliver(webhook_client, 'page_build', page_build('built'), signature='sha256=' + '0' * 64)
+
+    assert res.status_code == 401
+    assert pages(record)['status'] == 'building'
+
+
+def test_ping(webhook_client):
+    res = deliver(webhook_client, 'ping', { 'zen': 'Design for failure.' })
+    assert res.status_code == 200 and res.get_json() == { 'message': 'pong' }
+
+
+def test_page_build_event_updates_the_record(webhook_client, record):
+    res = deliver(webhook_client, 'page_build', page_build('built'))
+
+    assert res.get_json() == { 'event': 'page_build', 'updated': 1 }
+    assert pages(record)['status'] == 'built' and pages(record)['source'] == 'webhook'
+
+
+def test_older_and_foreign_events_are_ignored(webhook_client, record):
+    deliver(webhook_client, 'page_build', page_build('built', '2026-01-01T12:00:00Z'))
+
+    late = deliver(webhook_client, 'page_build', page_build('building', '2026-01-01T11:59:00Z'))
+    previous_build = deliver(webhook_client, 'page_build', page_build('errored', '2026-01-01T12:05:00Z', commit='b' * 40))
+
+    assert late.get_json()['updated'] == 0 and previous_build.get_json()['updated'] == 0
+    assert pages(record)['status'] == 'built'
+
+
+def test_deployment_status_maps_onto_build_states(webhook_client, record):
+    payload = { 'repository': { 'name': 'site', 'owner': { 'login': 'octo' } },
+                'deployment': { 'environment': 'github-pages', 'sha': COMMIT },
+                'deployment_status': { 'state': 'failure', 'description': 'Build failed', 'updated_at': '2026-01-01T12:00:00Z' } }
+
+    deliver(webhook_client, 'deployment_status', payload)
+
+    assert pages(record)['status'] == 'errored' and pages(record)['error'] == 'Build failed'
+
+
+def test_reconciler_checks_builds_no_webhook_reported(db, fake_github):
+    owner = fake_github.github.config['login']
+    user_id = str(ObjectId())
+    GitHubTokenStore.upsert_for_user(user_id, 'reconcile-token', login=owner)
+    github_deploy.ensure_repo('reconcile-token', owner, 'site')
+    assert github_deploy.enable_pages('reconcile-token', owner, 'site', 'main', '/') == 'enabled'
+    head = fake_github.github.repos[f'{owner}/site']['refs']['main']
+    SiteDeployment.upsert(user_id, 'site', 'main', None, head)
+    SiteDeployment.pages_build_started(user_id, 'site', owner, head)
+    # Started before the reconcile interval, with no delivery since
+    db.site_deployments.update_one({}, { '$set': { 'pages.startedAt': datetime.utcnow() - timedelta(minutes=5) } })
+
+    assert pages_status.reconcile_once() == 1
+    assert pages(user_id)['status'] == 'built' and pages(user_id)['source'] == 'reconciler'
+    # Finished builds aren't checked again
+    assert pages_status.reconcile_once() == 0
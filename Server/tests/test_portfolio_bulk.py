@@ -0,0 +1,127 @@
+"""POST /api/portfolio/bulk: slot accounting and not-found reporting"""
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from pymongo import DeleteOne, InsertOne, UpdateOne
+
+from models.portfolio import Portfolio
+from routes.portfolio import PORTFOLIO_LIMIT
+
+
+class BulkResult:
+    def __init__(self, matched):
+        self.bulk_api_result = { 'nMatched': matched }
+
+
+def run_one_by_one(requests, ordered=True):
+    """Portfolio.bulk_write for mongomock, whose bulk_write rejects current pymongo's UpdateOne"""
+    col = Portfolio.get_collection()
+    matched = 0
+    for write in requests:
+        if isinstance(write, InsertOne):
+            col.insert_one(write._doc)
+        elif isinstance(write, UpdateOne):
+            matched += col.update_one(write._filter, write._doc).matched_count
+        elif isinstance(write, DeleteOne):
+            col.delete_one(write._filter)
+    return BulkResult(matched)
+
+
+@pytest.fixture(autouse=True)
+def bulk_write(monkeypatch):
+    monkeypatch.setattr(Portfolio, 'bulk_write', staticmethod(run_one_by_one))
+
+
+def insert_portfolios(db, user_id, count):
+    now = datetime.utcnow()
+    docs = [{ '_id': ObjectId(), 'userId': ObjectId(user_id), 'name': f'p{i}', 'template': 'modern',
+              'status': 'draft', 'createdAt': now, 'updatedAt': now } for i in range(count)]
+    db.portfolios.insert_many(docs)
+    return [str(d['_id']) for d in docs]
+
+
+def bulk(client, headers, operations, ordered=True):
+    res = client.post('/api/portfolio/bulk', json={ 'operations': operations, 'ordered': ordered }, headers=headers)
+    assert res.status_code == 200
+    return res.get_json()
+
+
+def test_delete_frees_a_slot_for_a_later_create(client, db, user_id, auth_headers):
+    ids = insert_portfolios(db, user_id, PORTFOLIO_LIMIT)
+
+    body = bulk(client, auth_headers, [
+        { 'op': 'delete', 'id': ids[0] },
+        { 'op': 'create', 'name': 'new', 'template': 'modern' }
+    ])
+
+    assert [r['status'] for r in body['results']] == ['ok', 'ok']
+    assert db.portfolios.count_documents({ 'userId': ObjectId(user_id) }) == PORTFOLIO_LIMIT
+
+
+def test_create_before_delete_still_hits_the_limit(client, db, user_id, auth_headers):
+    ids = insert_portfolios(db, user_id, PORTFOLIO_LIMIT)
+
+    body = bulk(client, auth_headers, [
+        { 'op': 'create', 'name': 'new', 'template': 'modern' },
+        { 'op': 'delete', 'id': ids[0] }
+    ], ordered=False)
+
+    assert body['results'][0] == { 'index': 0, 'status': 'error', 'error': 'Portfolio limit reached' }
+    assert body['results'][1]['status'] == 'ok'
+
+
+def test_update_after_delete_in_the_same_batch_is_not_found(client, db, user_id, auth_headers):
+    ids = insert_portfolios(db, user_id, 1)
+
+    body = bulk(client, auth_headers, [
+        { 'op': 'delete', 'id': ids[0] },
+        { 'op': 'update', 'id': ids[0], 'fields': { 'name': 'renamed' } }
+    ], ordered=False)
+
+    assert body['results'][0]['status'] == 'ok'
+    assert body['results'][1] == { 'index': 1, 'status': 'error', 'error': 'Portfolio not found' }
+    assert body['succeeded'] == 1 and body['failed'] == 1
+
+
+def test_update_matching_nothing_is_reported_not_found(client, db, user_id, auth_headers, monkeypatch):
+    ids = insert_portfolios(db, user_id, 2)
+
+    # Someone deletes the first portfolio between the ownership check and the write
+    def delete_then_write(requests, ordered=True):
+        db.portfolios.delete_one({ '_id': ObjectId(ids[0]) })
+        return run_one_by_one(requests, ordered)
+    monkeypatch.setattr(Portfolio, 'bulk_write', staticmethod(delete_then_write))
+
+    body = bulk(client, auth_headers, [
+        { 'op': 'status', 'id': ids[0], 'status': 'deployed' },
+        { 'op': 'update', 'id': ids[1], 'fields': { 'name': 'renamed' } }
+    ])
+
+    assert body['results'][0] == { 'index': 0, 'status': 'not_found', 'id': ids[0], 'error': 'Portfolio not found' }
+    assert body['results'][1] == { 'index': 1, 'status': 'ok', 'id': ids[1] }
+    assert body['success'] is False and body['failed'] == 1
+    assert db.portfolios.find_one({ '_id': ObjectId(ids[1]) })['name'] == 'renamed'
+
+
+def test_invalid_create_does_not_use_up_a_slot(client, db, user_id, auth_headers):
+    insert_portfolios(db, user_id, PORTFOLIO_LIMIT - 1)
+
+    body = bulk(client, auth_headers, [
+        { 'op': 'create', 'name': '', 'template': 'modern' },
+        { 'op': 'create', 'name': 'new', 'template': 'modern' }
+    ], ordered=False)
+
+    assert body['results'][0]['status'] == 'error'
+    assert body['results'][1]['status'] == 'ok'
+    assert db.portfolios.count_documents({ 'userId': ObjectId(user_id) }) == PORTFOLIO_LIMIT
+
+
+@pytest.mark.parametrize('ordered', ['false', 0, None])
+def test_ordered_must_be_a_boolean(client, auth_headers, ordered):
+    res = client.post('/api/portfolio/bulk', json={
+        'operations': [{ 'op': 'create', 'name': 'new', 'template': 'modern' }], 'ordered': ordered
+    }, headers=auth_headers)
+
+    assert res.status_code == 400
+    assert res.get_json()['message'] == 'ordered must be true or false'
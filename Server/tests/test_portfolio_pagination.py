@@ -0,0 +1,134 @@
+"""Keyset pagination of GET /api/portfolio/ (opaque (createdAt, _id) cursors)"""
+import base64
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from models.portfolio import Portfolio
+
+
+def insert_portfolios(db, user_id, created_at_list, **fields):
+    docs = [{ '_id': ObjectId(), 'userId': ObjectId(user_id), 'name': f'p{i}', 'template': 'modern',
+              'status': 'draft', 'createdAt': created_at, 'updatedAt': created_at, **fields }
+            for i, created_at in enumerate(created_at_list)]
+    db.portfolios.insert_many(docs)
+    return docs
+
+
+def list_all(client, headers, limit, **params):
+    """Follow nextCursor until the last page; returns the ids in order"""
+    ids, cursor = [], None
+    while True:
+        query = { 'limit': limit, **params, **({ 'cursor': cursor } if cursor else {}) }
+        res = client.get('/api/portfolio/', query_string=query, headers=headers)
+        assert res.status_code == 200
+        body = res.get_json()
+        assert body['count'] <= limit
+        ids.extend(p['id'] for p in body['portfolios'])
+        if not body['hasMore']:
+            assert body['nextCursor'] is None
+            return ids
+        cursor = body['nextCursor']
+
+
+def test_cursor_round_trip():
+    doc = { '_id': ObjectId(), 'createdAt': datetime(2024, 5, 1, 12, 30, 15, 123000) }
+    cursor = Portfolio.encode_cursor(doc)
+    assert Portfolio.decode_cursor(cursor) == (doc['createdAt'], doc['_id'])
+
+
+@pytest.mark.parametrize('cursor', [
+    'not base64!',
+    base64.urlsafe_b64encode(b'no-separator').decode(),
+    base64.urlsafe_b64encode(b'2024-05-01T00:00:00|not-an-object-id').decode(),
+    base64.urlsafe_b64encode(b'yesterday|' + str(ObjectId()).encode()).decode(),
+    base64.urlsafe_b64encode(b'\xff\xfe').decode()
+])
+def test_decode_cursor_rejects_malformed(cursor):
+    with pytest.raises(ValueError):
+        Portfolio.decode_cursor(cursor)
+
+
+def test_pages_are_newest_first_and_complete(client, db, user_id, auth_headers):
+    start = datetime(2024, 1, 1)
+    docs = insert_portfolios(db, user_id, [start + timedelta(minutes=i) for i in range(7)])
+
+    ids = list_all(client, auth_headers, limit=3)
+
+    assert ids == [str(d['_id']) for d in reversed(docs)]
+
+
+def test_equal_created_at_is_broken_by_id(client, db, user_id, auth_headers):
+    same = datetime(2024, 1, 1, 9, 0, 0)
+    docs = insert_portfolios(db, user_id, [same] * 5 + [same - timedelta(seconds=1)])
+
+    ids = list_all(client, auth_headers, limit=2)
+
+    # No duplicates or gaps across page boundaries that fall inside the tie
+    tied = sorted((d['_id'] for d in docs[:5]), reverse=True)
+    assert ids == [str(i) for i in tied] + [str(docs[5]['_id'])]
+
+
+def test_filters_apply_across_pages(client, db, user_id, auth_headers):
+    start = datetime(2024, 1, 1)
+    deployed = insert_portfolios(db, user_id, [start + timedelta(minutes=i) for i in range(4)], status='deployed')
+    insert_portfolios(db, user_id, [start + timedelta(minutes=i, seconds=30) for i in range(4)])
+
+    ids = list_all(client, auth_headers, limit=3, status='deployed')
+
+    assert ids == [str(d['_id']) for d in reversed(deployed)]
+
+
+def test_other_users_portfolios_are_not_listed(client, db, user_id, auth_headers):
+    insert_portfolios(db, str(ObjectId()), [datetime(2024, 1, 1)])
+
+    assert list_all(client, auth_headers, limit=5) == []
+
+
+@pytest.mark.parametrize('cursor', ['garbage', base64.urlsafe_b64encode(b'2024-01-01T00:00:00|xyz').decode()])
+def test_invalid_cursor_is_a_400(client, db, auth_headers, cursor):
+    res = client.get('/api/portfolio/', query_string={ 'cursor': cursor }, headers=auth_headers)
+
+    assert res.status_code == 400
+    assert res.get_json()['message'] == 'Invalid cursor'
+
+
+def test_tampered_cursor_is_a_400(client, db, user_id, auth_headers):
+    start = datetime(2024, 1, 1)
+    insert_portfolios(db, user_id, [start + timedelta(minutes=i) for i in range(3)])
+    cursor = client.get('/api/portfolio/', query_string={ 'limit': 1 }, headers=auth_headers).get_json()['nextCursor']
+
+    tampered = cursor[:-4] + ('AAAA' if not cursor.endswith('AAAA') else 'BBBB')
+    res = client.get('/api/portfolio/', query_string={ 'cursor': tampered }, headers=auth_headers)
+
+    assert res.status_code == 400
+
+
+def test_limit_must_be_an_integer(client, db, auth_headers):
+    res = client.get('/api/portfolio/', query_string={ 'limit': 'ten' }, headers=auth_headers)
+
+    assert res.status_code == 400
+
+
+def test_no_limit_or_cursor_lists_everything_unpaged(client, db, user_id, auth_headers):
+    start = datetime(2024, 1, 1)
+    docs = insert_portfolios(db, user_id, [start + timedelta(minutes=i) for i in range(25)])
+
+    res = client.get('/api/portfolio/', headers=auth_headers)
+
+    assert res.status_code == 200
+    body = res.get_json()
+    assert set(body) == { 'success', 'portfolios', 'count' }
+    assert body['count'] == 25
+    assert [p['id'] for p in body['portfolios']] == [str(d['_id']) for d in reversed(docs)]
+
+
+def test_unpaged_list_still_filters(client, db, user_id, auth_headers):
+    start = datetime(2024, 1, 1)
+    deployed = insert_portfolios(db, user_id, [start], status='deployed')
+    insert_portfolios(db, user_id, [start + timedelta(minutes=1)])
+
+    body = client.get('/api/portfolio/', query_string={ 'status': 'deployed' }, headers=auth_headers).get_json()
+
+    assert [p['id'] for p in body['portfolios']] == [str(deployed[0]['_id'])]
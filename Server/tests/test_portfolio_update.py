@@ -0,0 +1,80 @@
+"""PUT /api/portfolio/<id>: only changed whitelisted fields are written"""
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from models.portfolio import Portfolio
+
+EARLIER = datetime(2026, 1, 1)
+
+
+@pytest.fixture
+def portfolio_id(db, user_id):
+    portfolio_id = ObjectId()
+    db.portfolios.insert_one({ '_id': portfolio_id, 'userId': ObjectId(user_id), 'name': 'Site', 'template': 'modern',
+                               'status': 'draft', 'html': '<h1>Hi</h1>', 'createdAt': EARLIER, 'updatedAt': EARLIER })
+    return str(portfolio_id)
+
+
+def put(client, headers, portfolio_id, body):
+    return client.put(f'/api/portfolio/{portfolio_id}', json=body, headers=headers)
+
+
+def stored(db, portfolio_id):
+    return db.portfolios.find_one({ '_id': ObjectId(portfolio_id) })
+
+
+def test_changed_fields_are_set(client, db, auth_headers, portfolio_id):
+    res = put(client, auth_headers, portfolio_id, { 'name': 'Renamed', 'template': 'modern', 'html': '<p>ignored</p>' })
+
+    assert res.status_code == 200
+    assert res.get_json()['portfolio']['name'] == 'Renamed'
+    doc = stored(db, portfolio_id)
+    assert doc['name'] == 'Renamed' and doc['html'] == '<h1>Hi</h1>'
+    assert doc['updatedAt'] > EARLIER
+
+
+def test_only_the_changed_fields_are_written(db, user_id, portfolio_id, monkeypatch):
+    collection = Portfolio.get_collection()
+    updates = []
+    find_one_and_update = collection.find_one_and_update
+    monkeypatch.setattr(type(collection), 'find_one_and_update',
+                        lambda self, filter, update, **kwargs: updates.append(update) or find_one_and_update(filter, update, **kwargs))
+
+    Portfolio.update_fields(portfolio_id, user_id, { 'name': 'Site', 'status': 'deployed' })
+
+    (update,) = updates
+    assert set(update['$set']) == { 'status', 'updatedAt' }
+
+
+def test_unchanged_fields_write_nothing(client, db, auth_headers, portfolio_id):
+    res = put(client, auth_headers, portfolio_id, { 'name': 'Site', 'status': 'draft' })
+
+    assert res.status_code == 200
+    assert res.get_json()['portfolio']['name'] == 'Site'
+    assert stored(db, portfolio_id)['updatedAt'] == EARLIER
+
+
+def test_invalid_status_is_rejected(client, db, auth_headers, portfolio_id):
+    res = put(client, auth_headers, portfolio_id, { 'status': 'published' })
+
+    assert res.status_code == 400
+    assert 'status must be one of' in res.get_json()['message']
+    assert stored(db, portfolio_id)['status'] == 'draft'
+
+
+def test_bulk_update_shares_the_status_check(user_id, portfolio_id):
+    with pytest.raises(ValueError, match='status must be one of'):
+        Portfolio.to_bulk_request(user_id, { 'op': 'update', 'id': portfolio_id, 'fields': { 'status': 'published' } })
+
+
+def test_other_users_portfolio_is_not_found(client, db, auth_headers):
+    theirs = ObjectId()
+    db.portfolios.insert_one({ '_id': theirs, 'userId': ObjectId(), 'name': 'Theirs', 'template': 'modern',
+                               'status': 'draft', 'createdAt': EARLIER, 'updatedAt': EARLIER })
+
+    res = put(client, auth_headers, theirs, { 'name': 'Taken' })
+
+    assert res.status_code == 404
+    assert stored(db, theirs)['name'] == 'Theirs'
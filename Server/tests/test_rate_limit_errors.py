@@ -0,0 +1,28 @@
+"""RateLimitExceeded becomes 429 with Retry-After from any blueprint"""
+from utils import github_profile
+from utils.github_ratelimit import RateLimitExceeded
+
+
+def raise_rate_limited(token):
+    raise RateLimitExceeded('GitHub rate limit reached', retry_after=41.2)
+
+
+def test_github_login_answers_429(client, db, monkeypatch):
+    monkeypatch.setattr(github_profile, 'fetch_profile', raise_rate_limited)
+
+    res = client.post('/api/auth/github/login', json={ 'access_token': 'gho_test' })
+
+    assert res.status_code == 429
+    assert res.headers['Retry-After'] == '42'
+    assert res.get_json() == { 'message': 'GitHub rate limit reached', 'retryAfter': 42 }
+
+
+def test_handler_is_registered_on_the_app(app):
+    @app.route('/api/test/rate-limited')
+    def rate_limited_route():
+        raise RateLimitExceeded('budget exhausted', retry_after=5)
+
+    res = app.test_client().get('/api/test/rate-limited')
+
+    assert res.status_code == 429
+    assert res.headers['Retry-After'] == '5'
@@ -0,0 +1,131 @@
+"""Revision deltas: applying diff(a, b) to a gives back b"""
+import random
+
+import pytest
+
+from utils.revision_diff import json_diff, json_patch_apply, text_diff, text_patch_apply
+
+JSON_PAIRS = [
+    ({}, {}),
+    ({ 'a': 1 }, { 'a': 2 }),
+    ({ 'a': 1, 'b': 2 }, { 'b': 2 }),
+    ({}, { 'new': { 'nested': [1, 2] } }),
+    ({ 'list': [1, 2, 3] }, { 'list': [1, 3] }),
+    ({ 'list': [1] }, { 'list': [1, 2, 3, 4] }),
+    ({ 'list': [{ 'x': 1 }, { 'x': 2 }] }, { 'list': [{ 'x': 1, 'y': 0 }] }),
+    ({ 'a/b': 1, 'c~d': 2 }, { 'a/b': 3, 'c~d': 2, '~/': 4 }),
+    ({ 'type': 'dict' }, ['now', 'a', 'list']),
+    ('scalar', { 'now': 'an object' }),
+    (None, { 'a': None }),
+    ({ 'about': { 'skills': ['react', 'python'], 'bio': 'hi' } },
+     { 'about': { 'skills': ['python', 'go', 'sql'], 'links': [] } })
+]
+
+TEXT_PAIRS = [
+    ('', ''),
+    ('', '<p>new</p>\n'),
+    ('<p>old</p>\n', ''),
+    ('a\nb\nc\n', 'a\nB\nc\n'),
+    ('a\nb\nc\n', 'c\nb\na\n'),
+    ('no trailing newline', 'no trailing newline\nnow two lines'),
+    ('<html>\n<body>\n<h1>Hi</h1>\n</body>\n</html>\n', '<html>\n<body>\n<h1>Hello</h1>\n<p>more</p>\n</body>\n</html>\n'),
+    ('crlf\r\nlines\r\n', 'crlf\r\nchanged\r\n')
+]
+
+
+@pytest.mark.parametrize('old, new', JSON_PAIRS)
+def test_json_patch_round_trip(old, new):
+    assert json_patch_apply(old, json_diff(old, new)) == new
+
+
+def test_json_patch_does_not_modify_its_input():
+    old = { 'list': [1, 2], 'obj': { 'k': 'v' } }
+    json_patch_apply(old, json_diff(old, { 'list': [2], 'obj': {} }))
+
+    assert old == { 'list': [1, 2], 'obj': { 'k': 'v' } }
+
+
+def test_equal_documents_need_no_ops():
+    assert json_diff({ 'a': [1, { 'b': 2 }] }, { 'a': [1, { 'b': 2 }] }) == []
+
+
+@pytest.mark.parametrize('old, new', TEXT_PAIRS)
+def test_text_patch_round_trip(old, new):
+    assert text_patch_apply(old, text_diff(old, new)) == new
+
+
+def random_json(rng, depth=0):
+    kind = rng.choice(['int', 'str', 'list', 'dict'] if depth < 3 else ['int', 'str'])
+    if kind == 'int':
+        return rng.randint(0, 3)
+    if kind == 'str':
+        return rng.choice(['a', 'b', 'x/y', '~'])
+    if kind == 'list':
+        return [random_json(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+    return { rng.choice(['k1', 'k2', 'k3', 'k/4']): random_json(rng, depth + 1) for _ in range(rng.randint(0, 4)) }
+
+
+def test_round_trip_on_random_documents():
+    rng = random.Random(1234)
+    for _ in range(500):
+        old, new = random_json(rng), random_json(rng)
+        assert json_patch_apply(old, json_diff(old, new)) == new
+
+        old_text = ''.join(rng.choice(['<p>a</p>\n', '<p>b</p>\n', 'c\n', 'd']) for _ in range(rng.randint(0, 8)))
+        new_text = ''.join(rng.choice(['<p>a</p>\n', '<p>b</p>\n', 'c\n', 'd']) for _ in range(rng.randint(0, 8)))
+        assert text_patch_apply(old_text, text_diff(old_text, new_text)) == new_text
+
+
+def test_every_revision_reconstructs_across_snapshots_and_pruning(db):
+    from bson import ObjectId
+    from models.portfolio_revision import MAX_REVISIONS, PortfolioRevision
+
+    portfolio_id, user_id = str(ObjectId()), str(ObjectId())
+    versions = [({ 'title': 'v0', 'items': [] }, '<h1>v0</h1>\n')]
+    for i in range(1, MAX_REVISIONS + 15):
+        data = { 'title': f'v{i}', 'items': list(range(i % 5)) }
+        html = f'<h1>v{i}</h1>\n' + '<p>same</p>\n' * (i % 3)
+        PortfolioRevision.record(portfolio_id, user_id, *versions[-1], data, html)
+        versions.append((data, html))
+
+    kept = sorted(r['rev'] for r in PortfolioRevision.list_for_portfolio(portfolio_id, user_id))
+    assert len(kept) == MAX_REVISIONS
+    for rev in kept:
+        # Revision 1 is the content before the first change
+        assert PortfolioRevision.reconstruct(portfolio_id, user_id, rev) == versions[rev - 1]
+
+
+def test_revision_taken_by_a_concurrent_change_is_recorded_as_the_next_one(db, monkeypatch):
+    from bson import ObjectId
+    from models.portfolio_revision import PortfolioRevision
+
+    PortfolioRevision.create_indexes()
+    portfolio_id, user_id = str(ObjectId()), str(ObjectId())
+    base, theirs, ours = ({ 'v': 0 }, '<p>0</p>\n'), ({ 'v': 1 }, '<p>1</p>\n'), ({ 'v': 2 }, '<p>2</p>\n')
+    PortfolioRevision.record(portfolio_id, user_id, *base, *theirs)
+    # Our change read the revision count before theirs was inserted
+    latest_rev = PortfolioRevision.latest_rev
+    stale = [1]
+    monkeypatch.setattr(PortfolioRevision, 'latest_rev', staticmethod(lambda p: stale.pop() if stale else latest_rev(p)))
+
+    assert PortfolioRevision.record(portfolio_id, user_id, *base, *ours) == 3
+
+    assert PortfolioRevision.reconstruct(portfolio_id, user_id, 2) == theirs
+    assert PortfolioRevision.reconstruct(portfolio_id, user_id, 3) == ours
+
+
+def test_concurrent_first_changes_share_the_base_snapshot(db, monkeypatch):
+    from bson import ObjectId
+    from models.portfolio_revision import PortfolioRevision
+
+    PortfolioRevision.create_indexes()
+    portfolio_id, user_id = str(ObjectId()), str(ObjectId())
+    base, theirs, ours = ({ 'v': 0 }, '<p>0</p>\n'), ({ 'v': 1 }, '<p>1</p>\n'), ({ 'v': 2 }, '<p>2</p>\n')
+    PortfolioRevision.record(portfolio_id, user_id, *base, *theirs)
+    latest_rev = PortfolioRevision.latest_rev
+    stale = [0]
+    monkeypatch.setattr(PortfolioRevision, 'latest_rev', staticmethod(lambda p: stale.pop() if stale else latest_rev(p)))
+
+    assert PortfolioRevision.record(portfolio_id, user_id, *base, *ours) == 3
+
+    assert [PortfolioRevision.reconstruct(portfolio_id, user_id, rev) for rev in (1, 2, 3)] == [base, theirs, ours]
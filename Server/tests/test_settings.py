@@ -0,0 +1,62 @@
+"""Validation in load_settings, and get_settings() outside a request"""
+import pytest
+from cryptography.fernet import Fernet
+
+from config.settings import SettingsError, get_settings, load_settings
+
+PRODUCTION = { 'FLASK_ENV': 'production', 'SECRET_KEY': 'a-real-secret' }
+DEVELOPMENT = { 'FLASK_ENV': 'development' }
+
+
+def test_token_encryption_key_required_outside_development():
+    with pytest.raises(SettingsError, match='TOKEN_ENCRYPTION_KEY must be set'):
+        load_settings(PRODUCTION)
+
+
+def test_token_encryption_key_optional_in_development():
+    assert load_settings({ 'FLASK_ENV': 'development' }).token_encryption_key == ''
+
+
+@pytest.mark.parametrize('key', ['not-a-key', 'c2hvcnQ=', 'é' * 44])
+def test_malformed_token_encryption_key_is_rejected(key):
+    with pytest.raises(SettingsError, match='must be a Fernet key'):
+        load_settings({ **PRODUCTION, 'TOKEN_ENCRYPTION_KEY': key })
+
+
+def test_valid_token_encryption_key_is_kept_out_of_repr():
+    key = Fernet.generate_key().decode()
+    settings = load_settings({ **PRODUCTION, 'TOKEN_ENCRYPTION_KEY': key })
+    assert settings.token_encryption_key == key
+    assert key not in repr(settings)
+
+
+@pytest.mark.parametrize('name, value, message', [
+    ('DEPLOY_WORKERS', 'four', 'must be an integer'),
+    ('DEPLOY_WORKERS', '0', 'must be at least 1'),
+    ('GITHUB_RATE_LIMIT_MAX_WAIT', 'soon', 'must be a number'),
+    ('SITE_PRECOMPRESS', 'yes', 'must be 0 or 1'),
+    ('GITHUB_API_URL', 'api.github.com', 'must be an http'),
+    ('WARMUP_STEPS', 'mongo,redis', 'unknown steps redis')
+])
+def test_malformed_tunables_are_rejected(name, value, message):
+    with pytest.raises(SettingsError, match=message):
+        load_settings({ **DEVELOPMENT, name: value })
+
+
+def test_reconcile_interval_defaults_slower_with_webhooks():
+    assert load_settings(DEVELOPMENT).pages.reconcile_seconds == 30
+    settings = load_settings({ **DEVELOPMENT, 'GITHUB_WEBHOOK_SECRET': 's3cret',
+                               'GITHUB_WEBHOOK_URL': 'https://example.com/api/github/webhook' })
+    assert settings.pages.webhooks_enabled
+    assert settings.pages.reconcile_seconds == 300
+    assert 's3cret' not in repr(settings)
+
+
+def test_empty_warmup_steps_turns_warmup_off():
+    assert load_settings({ **DEVELOPMENT, 'WARMUP_STEPS': '' }).warmup.steps == ()
+
+
+def test_get_settings_outside_a_request_returns_the_installed_settings(settings, app):
+    assert get_settings() is settings
+    with app.app_context():
+        assert get_settings() is app.config['SETTINGS']
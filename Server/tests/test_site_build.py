@@ -0,0 +1,27 @@
+"""HTML minification keeps whitespace that matters"""
+from utils.site_build import build_site, minify_html
+
+
+def test_collapses_whitespace_between_elements():
+    assert minify_html('<div>\n  <p>a   b</p>\n</div>') == '<div> <p>a b</p> </div>'
+
+
+def test_attribute_values_are_left_alone():
+    html = '<a title="two  spaces" data-x=\'line\n  break\'   href="/">x</a>'
+    assert minify_html(html) == '<a title="two  spaces" data-x=\'line\n  break\' href="/">x</a>'
+
+
+def test_pre_and_textarea_are_left_alone():
+    html = '<pre>  a\n   b </pre>  <textarea> x  y </textarea>'
+    assert minify_html(html) == '<pre>  a\n   b </pre> <textarea> x  y </textarea>'
+
+
+def test_css_white_space_pre_keeps_the_page_as_is():
+    html = '<p style="white-space: pre-wrap">a    b</p>\n  <i>x</i>'
+    assert minify_html(html) == html
+
+
+def test_stylesheet_white_space_pre_survives_style_extraction():
+    page = '<style>.c { white-space: pre-line; }</style><p class="c">a\n    b</p>'
+    files, _ = build_site([{ 'path': 'index.html', 'content': page }])
+    assert '<p class="c">a\n    b</p>' in files[0]['content']
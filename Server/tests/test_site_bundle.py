@@ -0,0 +1,91 @@
+"""Server-built deploy files for a stored portfolio"""
+import base64
+from dataclasses import replace
+
+import pytest
+
+from config.settings import install
+from utils.site_build import build_for_request, build_site
+from utils.site_bundle import INLINE_ASSET_MAX_BYTES, extract_assets, portfolio_files, repo_name
+
+PNG = b'\x89PNG\r\n\x1a\n' + bytes(range(256)) * 16
+SMALL_PNG = b'\x89PNG\r\n\x1a\n'
+PAGE = """<!DOCTYPE html><html><head><title>Ada &amp; Co</title><style>body { color: #123456 }</style></head>
+<body><img src="data:image/png;base64,{big}"><img src="data:image/png;base64,{small}"></body></html>"""
+
+
+def page():
+    return PAGE.replace('{big}', base64.b64encode(PNG).decode()).replace('{small}', base64.b64encode(SMALL_PNG).decode())
+
+
+@pytest.mark.parametrize('name, repo', [
+    ('My Portfolio', 'my-portfolio'),
+    ('Ada Lovelace — CV', 'ada-lovelace-cv'),
+    ('...', 'skillslate-portfolio')
+])
+def test_repo_name(name, repo):
+    assert repo_name(name) == repo
+
+
+def test_large_data_uris_become_content_hashed_assets():
+    html, assets = extract_assets(page())
+
+    assert len(PNG) >= INLINE_ASSET_MAX_BYTES > len(SMALL_PNG)
+    (asset,) = assets
+    assert asset['path'].startswith('assets/') and asset['path'].endswith('.png')
+    assert base64.b64decode(asset['content']) == PNG and asset['encoding'] == 'base64'
+    assert f'src="{asset["path"]}"' in html
+    # Small images stay inline
+    assert base64.b64encode(SMALL_PNG).decode() in html
+
+
+def test_portfolio_bundle_layout():
+    files = portfolio_files({ 'name': 'Ada', 'html': page() }, base_href='/ada/')
+
+    paths = [f['path'] for f in files]
+    assert paths[:2] == ['index.html', '404.html'] and paths[-1] == '.nojekyll'
+    assert len(paths) == 4
+    not_found = files[1]['content']
+    assert '<base href="/ada/">' in not_found
+    assert 'Page not found - Ada &amp; Co' in not_found
+    assert 'color: #123456' in not_found
+
+
+def test_portfolio_without_html_cannot_be_bundled():
+    with pytest.raises(ValueError, match='no generated HTML'):
+        portfolio_files({ 'name': 'Empty' })
+
+
+def test_built_bundle_shares_one_stylesheet():
+    files, _ = build_site(portfolio_files({ 'name': 'Ada', 'html': page() }, base_href='/ada/'))
+
+    stylesheets = [f['path'] for f in files if f['path'].endswith('.css')]
+    assert len(stylesheets) == 1
+    by_path = { f['path']: f for f in files }
+    assert stylesheets[0] in by_path['index.html']['content'] and stylesheets[0] in by_path['404.html']['content']
+
+
+BIG_PAGE = [{ 'path': 'index.html', 'content': '<p>' + 'x' * 2000 + '</p>' }]
+
+
+@pytest.mark.parametrize('body, from_portfolio, built', [
+    ({}, True, True),
+    ({}, False, False),
+    ({ 'build': False }, True, False),
+    ({ 'build': True }, False, True)
+])
+def test_deploys_build_stored_portfolios_by_default(body, from_portfolio, built):
+    files, report = build_for_request(BIG_PAGE, body, from_portfolio)
+
+    assert (report is not None) == built
+    assert (files is BIG_PAGE) != built
+
+
+def test_precompress_defaults_to_settings(settings):
+    install(replace(settings, deploy=replace(settings.deploy, precompress=True)))
+
+    default, _ = build_for_request(BIG_PAGE, {}, from_portfolio=True)
+    opted_out, _ = build_for_request(BIG_PAGE, { 'precompress': False }, from_portfolio=True)
+
+    assert 'index.html.gz' in [f['path'] for f in default]
+    assert [f['path'] for f in opted_out] == ['index.html']
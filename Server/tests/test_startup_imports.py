@@ -0,0 +1,47 @@
+"""Cold start: heavy libraries stay off the import path and .env is loaded once"""
+import json
+import os
+import subprocess
+import sys
+
+from devtools.import_profile import LAZY_MODULES, summarize
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_fresh(code):
+    """Output of code run in a new interpreter from Server/, as JSON"""
+    proc = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=SERVER_DIR)
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    return json.loads(proc.stdout.splitlines()[-1])
+
+
+def test_app_import_leaves_the_lazy_modules_unloaded():
+    loaded = run_fresh(
+        'import json, sys, app\n'
+        f'print(json.dumps(sorted({{ m.split(".")[0] for m in sys.modules }} & set({LAZY_MODULES!r}))))'
+    )
+
+    assert loaded == []
+
+
+def test_env_file_is_loaded_once_for_every_entry_point():
+    calls = run_fresh(
+        'import json, dotenv\n'
+        'calls = []\n'
+        'load = dotenv.load_dotenv\n'
+        'dotenv.load_dotenv = lambda *args, **kwargs: calls.append(str(kwargs["dotenv_path"])) or load(*args, **kwargs)\n'
+        'import app, dev, start\n'
+        'print(json.dumps(calls))'
+    )
+
+    assert calls == [os.path.join(SERVER_DIR, '.env')]
+
+
+def test_profile_flags_lazy_modules_imported_at_startup():
+    runs = [{ 'app': (100, 900), 'openai': (500, 800), 'openai._client': (300, 300), 'flask': (200, 200) }]
+
+    summary = summarize(runs, top=2)
+
+    assert summary['lazyImported'] == ['openai']
+    assert summary['packages'] == [{ 'name': 'openai', 'ms': 0.8 }, { 'name': 'flask', 'ms': 0.2 }]
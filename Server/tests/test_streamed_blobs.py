@@ -0,0 +1,54 @@
+"""Binary deploy files streamed to GitHub as base64 JSON bodies"""
+import base64
+import io
+import json
+
+import pytest
+
+from utils import github_deploy
+from utils.github_deploy import Base64JsonBody
+
+TOKEN = 'streamed-blob-token'
+
+
+def expected_body(data: bytes) -> bytes:
+    return json.dumps({ 'encoding': 'base64', 'content': base64.b64encode(data).decode() }, separators=(',', ':')).encode()
+
+
+@pytest.mark.parametrize('size', [0, 1, 2, 3, Base64JsonBody.RAW_CHUNK - 1, Base64JsonBody.RAW_CHUNK + 1, 3 * Base64JsonBody.RAW_CHUNK + 2])
+def test_body_is_the_json_blob_request(size):
+    data = bytes(i % 251 for i in range(size))
+    body = Base64JsonBody(io.BytesIO(data), size)
+
+    out = body.read()
+
+    assert out == expected_body(data)
+    assert len(body) == len(out) == body.tell()
+
+
+def test_small_reads_and_rewind():
+    data = bytes(range(256)) * 4000
+    body = Base64JsonBody(io.BytesIO(data), len(data))
+
+    chunks = [body.read(1000) for _ in range(3)]
+    assert all(len(c) == 1000 for c in chunks)
+    rest = b''.join(iter(lambda: body.read(4096), b''))
+    assert b''.join(chunks) + rest == expected_body(data)
+
+    # A retry resends the whole body
+    body.seek(0)
+    assert b''.join(body) == expected_body(data)
+    with pytest.raises(io.UnsupportedOperation):
+        body.seek(10)
+
+
+def test_streamed_file_uploads_as_the_same_blob(fake_github):
+    owner = fake_github.github.config['login']
+    github_deploy.ensure_repo(TOKEN, owner, 'site')
+    data = bytes(range(256)) * 1000
+    f = github_deploy.stream_file('photo.bin', io.BytesIO(data))
+
+    sha = github_deploy.create_blob(TOKEN, owner, 'site', f)
+
+    assert sha == f['sha'] == github_deploy.git_blob_sha({ 'path': 'photo.bin', 'content': base64.b64encode(data).decode(),
+                                                           'encoding': 'base64' })
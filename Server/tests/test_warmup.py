@@ -0,0 +1,87 @@
+"""Worker warm-up and the /api/ready probe"""
+import os
+import threading
+from dataclasses import replace
+
+import pytest
+
+from config.settings import install
+from utils import warmup
+
+
+@pytest.fixture(autouse=True)
+def cold_worker(monkeypatch):
+    """A process that hasn't warmed up yet"""
+    monkeypatch.setattr(warmup, '_state', { 'ready': False, 'pid': None, 'steps': {}, 'durationMs': None })
+
+
+def step(monkeypatch, name, func):
+    monkeypatch.setitem(warmup._STEP_FUNCS, name, func)
+
+
+def test_ready_only_after_warm_up(client, monkeypatch):
+    step(monkeypatch, 'mongo', lambda: '2 connections')
+
+    res = client.get('/api/ready')
+    assert res.status_code == 503 and res.get_json()['ready'] is False
+
+    warmup.run(steps=['mongo'])
+
+    res = client.get('/api/ready')
+    assert res.status_code == 200
+    assert res.get_json()['steps']['mongo']['detail'] == '2 connections'
+
+
+def test_failed_step_is_reported_not_fatal(monkeypatch):
+    def unreachable():
+        raise ConnectionError('no route to host')
+    step(monkeypatch, 'github', unreachable)
+    step(monkeypatch, 'parsers', lambda: 'pdfplumber')
+
+    status = warmup.run(steps=['github', 'parsers'])
+
+    assert status['ready']
+    assert status['steps']['github']['ok'] is False and status['steps']['github']['detail'] == 'no route to host'
+    assert status['steps']['parsers']['ok'] is True
+
+
+def test_steps_run_concurrently(monkeypatch):
+    both_started = threading.Barrier(2, timeout=5)
+
+    def wait_for_the_other():
+        both_started.wait()  # breaks (and the step fails) if the steps run one after the other
+        return 'ok'
+    step(monkeypatch, 'mongo', wait_for_the_other)
+    step(monkeypatch, 'openai', wait_for_the_other)
+
+    status = warmup.run(steps=['mongo', 'openai'])
+
+    assert all(s['ok'] for s in status['steps'].values())
+
+
+def test_unknown_steps_are_ignored(monkeypatch):
+    step(monkeypatch, 'parsers', lambda: 'none installed')
+
+    status = warmup.run(steps=['parsers', 'cache'])
+
+    assert status['ready'] and list(status['steps']) == ['parsers']
+
+
+def test_steps_default_to_settings(settings, monkeypatch):
+    install(replace(settings, warmup=replace(settings.warmup, steps=('parsers',))))
+    step(monkeypatch, 'parsers', lambda: 'none installed')
+
+    assert list(warmup.run()['steps']) == ['parsers']
+
+
+def test_no_steps_is_ready_at_once():
+    status = warmup.run(steps=[])
+
+    assert status['ready'] and status['steps'] == {}
+
+
+def test_warm_up_in_the_master_does_not_make_a_forked_worker_ready(monkeypatch):
+    warmup.run(steps=[])
+    monkeypatch.setitem(warmup._state, 'pid', os.getpid() + 1)
+
+    assert warmup.status()['ready'] is False
@@ -1,13 +1,13 @@
 """
 AI Service for Portfolio Generation using OpenAI GPT-4o
 """
-from openai import OpenAI
 import os
 import json
 import re
 from typing import Dict, List, Optional
 
-# Initialize OpenAI client (lazy initialization)
+# Initialize OpenAI client (lazy initialization). The openai package itself is
+# imported here too: it is slow to import and only the AI routes need it.
 _client = None
 
 def get_client():
@@ -17,6 +17,7 @@ def get_client():
         api_key = os.getenv('OPENAI_API_KEY')
         if not api_key:
             raise ValueError("OPENAI_API_KEY environment variable is not set")
+        from openai import OpenAI
         _client = OpenAI(api_key=api_key)
     return _client
 
@@ -0,0 +1,475 @@
+"""
+Background GitHub Pages deployment pipeline
+
+    queued -> creating_repo -> uploading -> committing -> enabling_pages -> live
+                                   (any step can end in failed)
+
+Jobs are persisted on the (user, repo) record in site_deployments, so clients
+can poll or stream their state and unfinished jobs survive a worker restart.
+Enqueueing makes no GitHub calls, so the request that starts a deploy returns
+at once. Steps run on a small thread pool. Waits (a new repo settling, Pages
+not ready yet, rate-limit resets, Retry-After) are scheduled with timers: steps
+run under github_ratelimit.no_wait(), so a step that would have to wait for
+budget gives its thread back and runs again later. The only sleep left on a
+deploy thread is the HTTP client's backoff between retries of a 5xx response
+(a few seconds at most).
+
+A worker runs a step under a lease on the job, renewed while the step runs.
+Every progress write is fenced on the lease owner and the job's state, so a
+worker whose lease ran out and was taken over (see start_sweeper) stops
+instead of overwriting the new owner's progress.
+
+Redeploys skip the repo/ref/commit/tree reads: the record's `meta` keeps the
+repo's existence, default branch, and the head commit, tree and blob SHAs we
+last pushed. The cached head is used as the parent optimistically and checked
+by a non-forced ref update; if someone else moved the branch, GitHub rejects
+the update, the cache is dropped and the job starts over with fresh reads.
+"""
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+from bson import ObjectId
+
+from config.settings import get_settings
+from models.deploy_asset import DeployAsset
+from models.github_token import GitHubTokenStore
+from models.portfolio import Portfolio
+from models.site_deployment import JOB_ACTIVE_STATES, SiteDeployment
+from utils import github_client, github_ratelimit, pages_status
+from utils.github_deploy import (
+    DeployError, build_tree_items, changed_files, enable_pages, ensure_repo, ensure_webhook, get_tree_shas, git_blob_sha,
+    pages_url
+)
+from utils.github_ratelimit import RateLimitExceeded
+
+# How long a worker owns a job step before another worker may take it over
+LEASE_SECONDS = 120
+
+# Delay between creating a repo and pushing to it (GitHub initialises it asynchronously)
+REPO_SETTLE_SECONDS = 2
+
+PAGES_RETRY_SECONDS = 2
+PAGES_MAX_ATTEMPTS = 3
+
+# Times a job may drop a stale repo cache and start over before failing
+MAX_REFRESHES = 2
+
+# How often each worker looks for jobs whose lease ran out (owner died)
+SWEEP_SECONDS = LEASE_SECONDS // 2
+
+# base64 files larger than this are kept in GridFS rather than in the job record
+SPOOL_MIN_CHARS = 64 * 1024
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_instance_id = uuid.uuid4().hex[:8]
+
+_sweeper = None
+_sweeper_pid = None
+_sweeper_lock = threading.Lock()
+
+
+def _worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{_instance_id}"
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _executor_lock:
+            if _executor is None or _executor_pid != pid:
+                _executor = ThreadPoolExecutor(max_workers=get_settings().deploy.workers, thread_name_prefix='deploy')
+                _executor_pid = pid
+    return _executor
+
+
+def enqueue(user_id: str, repo: str, owner: str, files: list, branch: str | None = None, path: str = '/',
+            message: str = 'Deploy portfolio', portfolio_id: str | None = None, portfolio_status: str | None = None):
+    """
+    Queue a deploy and start it in the background
+
+    Deploys of one repo never run concurrently. A request made while a job
+    is running is folded into it if the job hasn't read its files yet, or
+    else waits behind it, replacing any request already waiting; so repeated
+    clicks publish only the newest content.
+
+    Without a branch, deploys to the repo's default branch if it is known
+    from an earlier deploy, else 'main'. portfolio_status is the portfolio's
+    status before this deploy; it is restored if a newer request replaces
+    this one before it is published.
+
+    Returns:
+        (record, request_id) - describe the request with
+        SiteDeployment.job_to_dict(record, request_id)
+    """
+    if not branch:
+        meta = (SiteDeployment.get(user_id, repo) or {}).get('meta') or {}
+        branch = meta.get('defaultBranch') or 'main'
+
+    request_id = ObjectId()
+    request = {
+        'requestId': request_id,
+        'owner': owner,
+        'branch': branch,
+        'path': path,
+        'message': message,
+        'files': [_spool(f, user_id, request_id) for f in files],
+        'portfolioId': ObjectId(portfolio_id) if portfolio_id else None,
+        'portfolioStatus': portfolio_status,
+        'url': pages_url(owner, repo, path)
+    }
+
+    while True:
+        doc = SiteDeployment.start_job(user_id, repo, request)
+        if doc:
+            submit(str(doc['job']['id']))
+            return doc, str(request_id)
+        doc = SiteDeployment.merge_into_job(user_id, repo, request) or SiteDeployment.set_pending(user_id, repo, request)
+        if doc:
+            return doc, str(request_id)
+        # The active job finished in between; start a new one
+
+
+def _spool(f: dict, user_id: str, request_id: ObjectId) -> dict:
+    """Move streamed or large base64 files into GridFS; the job keeps only a reference"""
+    if f.get('stream') is not None:
+        f['stream'].seek(0)
+        return DeployAsset.put_stream(f['stream'], f['size'], f['path'], user_id, request_id)
+    if f.get('encoding') == 'base64' and len(f.get('content', '')) > SPOOL_MIN_CHARS:
+        return DeployAsset.put_base64(f['content'], f['path'], user_id, request_id)
+    return f
+
+
+def submit(job_id: str, delay: float = 0):
+    """Run the job's next step now, or after delay seconds"""
+    if delay > 0:
+        timer = threading.Timer(delay, submit, args=(job_id,))
+        timer.daemon = True
+        timer.start()
+        return
+    _get_executor().submit(run_step, job_id)
+
+
+def resume_jobs():
+    """Restart active jobs left without a worker, and start orphaned waiting requests"""
+    jobs = SiteDeployment.find_resumable_jobs()
+    for doc in jobs:
+        submit(str(doc['job']['id']))
+    for doc in SiteDeployment.find_orphaned_pending():
+        if _start_pending(str(doc['userId']), doc['repo']):
+            jobs.append(doc)
+    return len(jobs)
+
+
+def _sweep():
+    while True:
+        time.sleep(SWEEP_SECONDS)
+        try:
+            resumed = resume_jobs()
+            if resumed:
+                print(f"🔁 Took over {resumed} deployment(s) whose worker stopped")
+        except Exception as e:
+            print(f"⚠️ Deploy lease sweep failed: {e}")
+
+
+def start_sweeper():
+    """
+    Run resume_jobs() every SWEEP_SECONDS in this worker process (no-op if running)
+
+    Picks up jobs whose worker thread or process died mid-step, without
+    waiting for a restart; claim_job() lets only one worker take each job.
+    """
+    global _sweeper, _sweeper_pid
+    with _sweeper_lock:
+        if _sweeper is not None and _sweeper_pid == os.getpid():
+            return
+        _sweeper = threading.Thread(target=_sweep, name='deploy-sweeper', daemon=True)
+        _sweeper_pid = os.getpid()
+        _sweeper.start()
+
+
+def _start_pending(user_id: str, repo: str) -> bool:
+    doc = SiteDeployment.promote_pending(user_id, repo)
+    if not doc:
+        return False
+    submit(str(doc['job']['id']))
+    return True
+
+
+class LeaseLost(Exception):
+    """This worker's lease on a job ran out and another worker took it over"""
+
+
+def run_step(job_id: str):
+    doc = SiteDeployment.claim_job(job_id, _worker_id(), LEASE_SECONDS)
+    if not doc:
+        return  # finished, or another worker holds it
+    try:
+        _run_step(job_id, doc, doc['job'])
+    except LeaseLost:
+        # The new owner carries on from the last state we recorded
+        print(f"⚠️ Deploy {job_id}: lease lost to another worker, stopping here")
+
+
+def _run_step(job_id: str, doc, job):
+    try:
+        token_doc = GitHubTokenStore.get_for_user(str(doc['userId']))
+        if not token_doc:
+            raise DeployError('GitHub not linked')
+        token = token_doc['access_token']
+
+        if job['state'] == 'queued':
+            _update(job, 'creating_repo', lease_seconds=LEASE_SECONDS, startedAt=datetime.utcnow())
+
+        with _lease_kept(job), github_ratelimit.no_wait():
+            _STEPS[job['state']](job_id, doc, job, token)
+    except LeaseLost:
+        raise
+    except RateLimitExceeded as e:
+        # Keep the job and retry this step once the budget is back
+        print(f"⏳ Deploy {job_id} waiting {e.retry_after}s for GitHub rate limit")
+        _schedule(job, e.retry_after, error=str(e))
+    except Exception as e:
+        print(f"❌ Deploy {job_id} failed in {job['state']}: {e}")
+        _finish(doc, job, 'failed', error=str(e))
+
+
+@contextmanager
+def _lease_kept(job):
+    """Renew this worker's lease while a step runs, so a long upload or commit isn't taken over"""
+    stop = threading.Event()
+    job_id, state = str(job['id']), job['state']
+
+    def renew():
+        while not stop.wait(LEASE_SECONDS / 3):
+            if not SiteDeployment.renew_lease(job_id, _worker_id(), state, LEASE_SECONDS):
+                return
+
+    threading.Thread(target=renew, name=f'deploy-lease-{job_id}', daemon=True).start()
+    try:
+        yield
+    finally:
+        stop.set()
+
+
+def _update(job, state: str | None = None, lease_seconds: int = 0, unset: tuple = (), **fields):
+    """
+    Record job progress, fenced on this worker's lease and the job's current state
+
+    Raises:
+        LeaseLost: if another worker has taken the job over
+    """
+    if not SiteDeployment.update_job(str(job['id']), _worker_id(), job['state'], state, lease_seconds, unset, **fields):
+        raise LeaseLost(str(job['id']))
+    if state:
+        job['state'] = state
+
+
+def _advance(job, state: str, delay: float = 0, **fields):
+    """Move to the next step, keeping this worker's lease until it runs"""
+    _update(job, state, lease_seconds=int(delay) + LEASE_SECONDS, **fields)
+    submit(str(job['id']), delay)
+
+
+def _schedule(job, delay: float, **fields):
+    """Run the same step again later, keeping this worker's lease meanwhile"""
+    _update(job, lease_seconds=int(delay) + LEASE_SECONDS, **fields)
+    submit(str(job['id']), delay)
+
+
+def _cached_head(doc, job):
+    """(head SHA, tree SHA, path -> blob SHA) from the last deploy to this branch, or None"""
+    meta = doc.get('meta') or {}
+    if meta.get('branch') != job['branch'] or not meta.get('headSha') or not meta.get('treeSha'):
+        return None
+    return meta['headSha'], meta['treeSha'], { b['path']: b['sha'] for b in meta.get('blobShas', []) }
+
+
+def _refresh(job_id, doc, job, reason: str, repo_gone: bool = False):
+    """
+    Drop the cached head and redo the upload with fresh reads
+
+    With repo_gone, forget the whole cache and start over from the repo check.
+    """
+    refreshes = job.get('refreshes', 0) + 1
+    if refreshes > MAX_REFRESHES:
+        raise DeployError(f'{reason}; giving up after {MAX_REFRESHES} retries')
+    print(f"🔄 Deploy {job_id}: {reason}, refreshing repo state")
+    if repo_gone:
+        SiteDeployment.clear_repo_meta(str(doc['userId']), doc['repo'])
+        _advance(job, 'creating_repo', refreshes=refreshes)
+    else:
+        SiteDeployment.clear_repo_meta(str(doc['userId']), doc['repo'], ('headSha', 'treeSha', 'blobShas'))
+        _advance(job, 'uploading', refreshes=refreshes)
+
+
+def _create_repo(job_id, doc, job, token):
+    if (doc.get('meta') or {}).get('repoExists'):
+        _advance(job, 'uploading')  # checked by the ref update later
+        return
+    created, default_branch = ensure_repo(token, job['owner'], doc['repo'])
+    SiteDeployment.save_repo_meta(str(doc['userId']), doc['repo'], repoExists=True, defaultBranch=default_branch)
+    _advance(job, 'uploading', delay=REPO_SETTLE_SECONDS if created else 0)
+
+
+def _upload(job_id, doc, job, token):
+    owner, repo, branch = job['owner'], doc['repo'], job['branch']
+    files = job['files']
+
+    cached = _cached_head(doc, job)
+    if cached:
+        parent_sha, base_tree_sha, tree_shas = cached
+        branch_exists = True
+        changed = changed_files(files, tree_shas)
+        if not changed:
+            # Nothing to push means no ref update to validate the cache; confirm the head instead
+            _refresh(job_id, doc, job, 'no changes against cached head')
+            return
+    else:
+        ref_res = github_client.cached_get(f'/repos/{owner}/{repo}/git/refs/heads/{branch}', token, priority='critical')
+        branch_exists = ref_res.status_code == 200
+        parent_sha = None
+        base_tree_sha = None
+
+        if branch_exists:
+            parent_sha = ref_res.json()['object']['sha']
+            commit_res = github_client.cached_get(f'/repos/{owner}/{repo}/git/commits/{parent_sha}', token, priority='critical')
+            commit_res.raise_for_status()
+            base_tree_sha = commit_res.json()['tree']['sha']
+            changed = changed_files(files, get_tree_shas(token, owner, repo, base_tree_sha))
+        elif ref_res.status_code == 404:
+            changed = files
+        else:
+            ref_res.raise_for_status()
+
+        if not changed:
+            _advance(job, 'enabling_pages', commit=parent_sha, treeSha=base_tree_sha, changed=0)
+            return
+
+    tree_json = { 'tree': build_tree_items(token, owner, repo, changed) }
+    if base_tree_sha:
+        tree_json['base_tree'] = base_tree_sha
+    tree_res = github_client.post(f'/repos/{owner}/{repo}/git/trees', token, priority='critical', json=tree_json)
+    if cached and tree_res.status_code in (404, 422):
+        # Cached base tree (or the repo) is gone
+        _refresh(job_id, doc, job, f'tree create returned {tree_res.status_code}', repo_gone=True)
+        return
+    tree_res.raise_for_status()
+
+    _advance(job, 'committing', treeSha=tree_res.json()['sha'], parentSha=parent_sha,
+             branchExists=branch_exists, changed=len(changed))
+
+
+def _commit(job_id, doc, job, token):
+    owner, repo, branch = job['owner'], doc['repo'], job['branch']
+
+    commit_json = { 'message': job['message'], 'tree': job['treeSha'] }
+    if job.get('parentSha'):
+        commit_json['parents'] = [job['parentSha']]
+    commit_res = github_client.post(f'/repos/{owner}/{repo}/git/commits', token, priority='critical', json=commit_json)
+    if commit_res.status_code in (404, 422):
+        _refresh(job_id, doc, job, f'commit create returned {commit_res.status_code}', repo_gone=True)
+        return
+    commit_res.raise_for_status()
+    new_commit_sha = commit_res.json()['sha']
+
+    if job.get('branchExists'):
+        # Not forced: GitHub rejects it (422) unless parentSha is still the branch head
+        ref_res = github_client.patch(
+            f'/repos/{owner}/{repo}/git/refs/heads/{branch}', token, priority='critical',
+            json={ 'sha': new_commit_sha, 'force': False }
+        )
+    else:
+        ref_res = github_client.post(
+            f'/repos/{owner}/{repo}/git/refs', token, priority='critical',
+            json={ 'ref': f'refs/heads/{branch}', 'sha': new_commit_sha }
+        )
+    if ref_res.status_code == 422:
+        _refresh(job_id, doc, job, 'branch moved since the last deploy')
+        return
+    ref_res.raise_for_status()
+
+    _advance(job, 'enabling_pages', commit=new_commit_sha)
+
+
+def _enable_pages(job_id, doc, job, token):
+    result = enable_pages(token, job['owner'], doc['repo'], job['branch'], job['path'])
+    attempts = job.get('pagesAttempts', 0) + 1
+
+    if result == 'retry' and attempts < PAGES_MAX_ATTEMPTS:
+        _schedule(job, PAGES_RETRY_SECONDS, pagesAttempts=attempts)
+        return
+
+    pages = get_settings().pages
+    if result == 'enabled' and pages.webhooks_enabled and not (doc.get('meta') or {}).get('webhookId'):
+        hook_id = ensure_webhook(token, job['owner'], doc['repo'], pages.webhook_url,
+                                 pages.webhook_secret, pages_status.WEBHOOK_EVENTS)
+        if hook_id:
+            SiteDeployment.save_repo_meta(str(doc['userId']), doc['repo'], webhookId=hook_id)
+
+    # The push itself succeeded; Pages may still come up once GitHub processes the repo
+    _finish(doc, job, 'live', pagesEnabled=result == 'enabled')
+
+
+def _finish(doc, job, state: str, **fields):
+    _update(job, state, unset=('files',), finishedAt=datetime.utcnow(), **fields)
+
+    if state == 'live':
+        user_id = str(doc['userId'])
+        SiteDeployment.upsert(user_id, doc['repo'], job['branch'], job['url'], job.get('commit'))
+        if job.get('changed') and fields.get('pagesEnabled'):
+            # Webhooks (or the reconciler) report when the build this push started is done
+            SiteDeployment.pages_build_started(user_id, doc['repo'], job['owner'], job.get('commit'))
+        if job.get('commit') and job.get('treeSha'):
+            SiteDeployment.save_repo_meta(
+                user_id, doc['repo'], repoExists=True, branch=job['branch'], headSha=job['commit'], treeSha=job['treeSha'],
+                blobShas=[{ 'path': f['path'], 'sha': git_blob_sha(f) } for f in job.get('files', [])]
+            )
+
+    if job.get('portfolioId'):
+        if state == 'live':
+            Portfolio.update_status(job['portfolioId'], 'deployed', url=job['url'], github_repo=doc['repo'])
+        else:
+            Portfolio.update_status(job['portfolioId'], 'failed')
+
+    # Streamed assets of this job and every request folded into it are no longer needed
+    DeployAsset.delete_for_requests(job.get('requests', []))
+
+    # Run whatever was requested while this job was busy
+    _start_pending(str(doc['userId']), doc['repo'])
+
+    _restore_superseded(doc, job)
+
+
+def _restore_superseded(doc, job):
+    """
+    Reset the portfolios of requests a newer one replaced before they were
+    published (they would otherwise stay 'building'); portfolios queued again
+    in the repo's next job or waiting request are left alone
+    """
+    current = SiteDeployment.get(str(doc['userId']), doc['repo']) or {}
+    queued = { p['id'] for p in (current.get('pending') or {}).get('portfolios', []) }
+    if (current.get('job') or {}).get('state') in JOB_ACTIVE_STATES:
+        queued |= { p['id'] for p in current['job'].get('portfolios', []) }
+    previous = {}
+    for entry in job.get('portfolios', []):
+        if entry['id'] != job.get('portfolioId') and entry['id'] not in queued:
+            previous.setdefault(entry['id'], entry.get('previousStatus'))
+    for portfolio_id, status in previous.items():
+        Portfolio.restore_status(portfolio_id, status if status and status != 'building' else 'draft')
+
+
+_STEPS = {
+    'creating_repo': _create_repo,
+    'uploading': _upload,
+    'committing': _commit,
+    'enabling_pages': _enable_pages
+}
@@ -1,8 +1,29 @@
 """
 PDF and Document parsing utilities
 """
+import importlib
 import re
-from typing import Optional
+from typing import List, Optional
+
+# Optional parser libraries, imported on first use (or by load_backends())
+PARSER_MODULES = ('PyPDF2', 'pdfplumber', 'docx')
+
+
+def load_backends() -> List[str]:
+    """
+    Import the installed parser libraries ahead of the first upload
+
+    Returns:
+        Names of the libraries that are available
+    """
+    loaded = []
+    for name in PARSER_MODULES:
+        try:
+            importlib.import_module(name)
+            loaded.append(name)
+        except ImportError:
+            pass
+    return loaded
 
 
 def extract_text_from_pdf(file_content: bytes) -> str:
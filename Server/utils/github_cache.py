@@ -0,0 +1,116 @@
+"""
+Conditional-request cache for GitHub GETs
+
+Responses are stored with their ETag/Last-Modified, keyed per token and URL.
+Every lookup still revalidates with GitHub (If-None-Match/If-Modified-Since),
+so results are never stale; a 304 is served from the cache and does not count
+against the token's rate limit. An in-process LRU sits in front of an
+optional MongoDB tier shared by all workers (GITHUB_CACHE_MONGO=1).
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from config.settings import get_settings
+
+# Response headers kept with a cached body
+_KEPT_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+_entries: 'OrderedDict[str, Dict]' = OrderedDict()
+_lock = threading.Lock()
+
+_stats = {'hits': 0, 'misses': 0}
+
+
+def cache_key(token: Optional[str], url: str) -> str:
+    """Hash of token + URL (tokens are never stored)"""
+    return hashlib.sha256(f"{token or ''}\n{url}".encode('utf-8')).hexdigest()
+
+
+def lookup(key: str) -> Optional[Dict]:
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            _entries.move_to_end(key)
+            return entry
+
+    if get_settings().github.cache_mongo:
+        from models.github_response_cache import GitHubResponseCache
+        try:
+            doc = GitHubResponseCache.get(key)
+        except Exception:
+            doc = None
+        if doc:
+            entry = { 'status': doc['status'], 'headers': doc['headers'], 'body': bytes(doc['body']) }
+            _store_local(key, entry)
+            return entry
+    return None
+
+
+def store(key: str, response: requests.Response):
+    """Remember a 200 response that carries a validator"""
+    if response.status_code != 200:
+        return
+    if not (response.headers.get('ETag') or response.headers.get('Last-Modified')):
+        return
+
+    entry = {
+        'status': response.status_code,
+        'headers': { h: response.headers[h] for h in _KEPT_HEADERS if h in response.headers },
+        'body': response.content
+    }
+    _store_local(key, entry)
+
+    if get_settings().github.cache_mongo:
+        from models.github_response_cache import GitHubResponseCache
+        try:
+            GitHubResponseCache.put(key, entry)
+        except Exception as e:
+            print(f"⚠️ GitHub cache write failed: {e}")
+
+
+def _store_local(key: str, entry: Dict):
+    max_entries = get_settings().github.cache_max_entries
+    with _lock:
+        _entries[key] = entry
+        _entries.move_to_end(key)
+        while len(_entries) > max_entries:
+            _entries.popitem(last=False)
+
+
+def conditional_headers(entry: Optional[Dict]) -> Dict[str, str]:
+    """If-None-Match / If-Modified-Since headers for a cached entry"""
+    if not entry:
+        return {}
+    headers = {}
+    if entry['headers'].get('ETag'):
+        headers['If-None-Match'] = entry['headers']['ETag']
+    if entry['headers'].get('Last-Modified'):
+        headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+    return headers
+
+
+def to_response(entry: Dict, url: str) -> requests.Response:
+    """Rebuild a Response from a cached entry (marked with from_cache=True)"""
+    res = requests.Response()
+    res.status_code = entry['status']
+    res.headers = CaseInsensitiveDict(entry['headers'])
+    res._content = entry['body']
+    res.encoding = 'utf-8'
+    res.url = url
+    res.from_cache = True
+    return res
+
+
+def record(hit: bool):
+    with _lock:
+        _stats['hits' if hit else 'misses'] += 1
+
+
+def get_stats() -> Dict:
+    with _lock:
+        return { **_stats, 'entries': len(_entries) }
@@ -0,0 +1,210 @@
+"""
+Shared GitHub HTTP client
+
+One pooled keep-alive requests.Session per worker process, with a retry
+policy for 5xx responses and secondary rate limits, and per-endpoint timing
+metrics. All GitHub API calls should go through request()/get()/post()/...
+"""
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config.settings import get_settings
+from utils import github_cache, github_ratelimit
+
+# API and web URLs are github.api_url/web_url, overridable so deploys can run
+# against a local stand-in (devtools/fake_github.py)
+
+DEFAULT_TIMEOUT = 15
+
+# Connection pools, one per host; deploys fan out to a handful of hosts at
+# most. Each holds up to github.pool_maxsize connections.
+POOL_CONNECTIONS = 4
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+_metrics: Dict[str, Dict] = {}
+_metrics_lock = threading.Lock()
+
+
+class GitHubRetry(Retry):
+    """Retry 5xx on idempotent methods, and secondary rate limits on any method"""
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        # 403/429 with Retry-After is a secondary rate limit; GitHub rejected
+        # the request without acting on it, so even POSTs are safe to resend
+        if has_retry_after and not github_ratelimit.waits_allowed():
+            return False  # request() raises RateLimitExceeded; the caller reschedules
+        if status_code in (403, 429) and has_retry_after:
+            return bool(self.total)
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+def _build_session() -> requests.Session:
+    retry = GitHubRetry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=(500, 502, 503, 504),
+        respect_retry_after_header=True,
+        raise_on_status=False  # hand the last response back to the caller
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=get_settings().github.pool_maxsize, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """Get the worker's shared session (rebuilt after fork)"""
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                _session = _build_session()
+                _session_pid = pid
+    return _session
+
+
+def github_headers(token: Optional[str]) -> Dict[str, str]:
+    headers = {'Accept': 'application/vnd.github+json'}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    return headers
+
+
+_REPO_PATH = re.compile(r'^/repos/[^/]+/[^/]+')
+_SHA = re.compile(r'/[0-9a-f]{40}(?=/|$)')
+_BRANCH_REF = re.compile(r'/refs/heads/.+$')
+
+
+def _endpoint_key(method: str, url: str) -> str:
+    """Collapse owner/repo/sha/branch path segments so metrics group by endpoint"""
+    path = url.split('://', 1)[-1]
+    host, _, path = path.partition('/')
+    path = '/' + path.split('?', 1)[0]
+    path = _REPO_PATH.sub('/repos/:owner/:repo', path)
+    path = _SHA.sub('/:sha', path)
+    path = _BRANCH_REF.sub('/refs/heads/:branch', path)
+    return f"{method.upper()} {host}{path}"
+
+
+def _record(key: str, elapsed_ms: float, status: Optional[int]):
+    with _metrics_lock:
+        m = _metrics.setdefault(key, {'count': 0, 'errors': 0, 'totalMs': 0.0, 'maxMs': 0.0})
+        m['count'] += 1
+        m['totalMs'] += elapsed_ms
+        m['maxMs'] = max(m['maxMs'], elapsed_ms)
+        if status is None or status >= 400:
+            m['errors'] += 1
+
+
+def get_metrics() -> Dict[str, Dict]:
+    """Per-endpoint call counts and latency (ms) since process start"""
+    with _metrics_lock:
+        return {
+            key: {**m, 'avgMs': round(m['totalMs'] / m['count'], 1) if m['count'] else 0.0}
+            for key, m in _metrics.items()
+        }
+
+
+def reset_metrics():
+    with _metrics_lock:
+        _metrics.clear()
+
+
+def _seconds(retry_after: str) -> float:
+    try:
+        return float(retry_after)
+    except ValueError:
+        return 60.0
+
+
+def request(method: str, url: str, token: Optional[str] = None, priority: str = 'normal', **kwargs) -> requests.Response:
+    """
+    Send a request through the shared session
+
+    Args:
+        method: HTTP method
+        url: Absolute URL, or a path relative to the GitHub API
+        token: GitHub access token (adds Authorization/Accept headers)
+        priority: 'critical', 'normal' or 'background' (see utils.github_ratelimit)
+        **kwargs: Passed to requests (json, data, params, headers, timeout...)
+
+    Returns:
+        Response (after retries); raises requests.RequestException on network
+        errors and github_ratelimit.RateLimitExceeded when over budget
+    """
+    if url.startswith('/'):
+        url = get_settings().github.api_url + url
+    headers = github_headers(token)
+    headers.update(kwargs.pop('headers', None) or {})
+    kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+
+    github_ratelimit.acquire(token, priority)
+
+    key = _endpoint_key(method, url)
+    start = time.perf_counter()
+    status = None
+    try:
+        res = get_session().request(method, url, headers=headers, **kwargs)
+        status = res.status_code
+        github_ratelimit.update(token, res.status_code, res.headers)
+        retry_after = res.headers.get('Retry-After')
+        if res.status_code in (403, 429) and retry_after and not github_ratelimit.waits_allowed():
+            raise github_ratelimit.RateLimitExceeded('GitHub secondary rate limit', _seconds(retry_after))
+        return res
+    finally:
+        _record(key, (time.perf_counter() - start) * 1000, status)
+
+
+def get(url: str, token: Optional[str] = None, **kwargs) -> requests.Response:
+    return request('GET', url, token, **kwargs)
+
+
+def cached_get(url: str, token: Optional[str] = None, **kwargs) -> requests.Response:
+    """
+    GET with ETag/Last-Modified revalidation (see utils.github_cache)
+
+    A 304 from GitHub is answered from the cache with the stored 200 response.
+    """
+    if url.startswith('/'):
+        url = get_settings().github.api_url + url
+    prepared = requests.PreparedRequest()
+    prepared.prepare_url(url, kwargs.pop('params', None))
+    url = prepared.url
+
+    key = github_cache.cache_key(token, url)
+    entry = github_cache.lookup(key)
+    headers = github_cache.conditional_headers(entry)
+    headers.update(kwargs.pop('headers', None) or {})
+
+    res = request('GET', url, token, headers=headers, **kwargs)
+    if res.status_code == 304 and entry is not None:
+        github_cache.record(hit=True)
+        return github_cache.to_response(entry, url)
+
+    github_cache.record(hit=False)
+    github_cache.store(key, res)
+    return res
+
+
+def post(url: str, token: Optional[str] = None, **kwargs) -> requests.Response:
+    return request('POST', url, token, **kwargs)
+
+
+def put(url: str, token: Optional[str] = None, **kwargs) -> requests.Response:
+    return request('PUT', url, token, **kwargs)
+
+
+def patch(url: str, token: Optional[str] = None, **kwargs) -> requests.Response:
+    return request('PATCH', url, token, **kwargs)
@@ -0,0 +1,314 @@
+"""
+Git data API helpers for pushing static sites to GitHub
+"""
+import base64
+import hashlib
+import io
+from concurrent.futures import ThreadPoolExecutor, FIRST_EXCEPTION, wait
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import get_settings
+from models.deploy_asset import DeployAsset
+from utils import github_client, github_ratelimit
+
+# Concurrent blob uploads per deploy default to deploy.blob_upload_workers,
+# kept small because GitHub's secondary rate limits penalise bursts of
+# concurrent content-creating requests. Text files up to
+# deploy.inline_tree_max_bytes are sent inline in the tree request instead of
+# as separate blob POSTs (0 disables inlining).
+
+
+class Base64JsonBody:
+    """
+    Blob request body streamed from a binary file: {"encoding":"base64","content":"..."}
+
+    Encodes as it is read, so an upload holds one chunk in memory whatever the
+    file size. The length is known up front (sent as Content-Length) and the
+    body can seek back to the start, so retries can resend it.
+    """
+    PREFIX = b'{"encoding":"base64","content":"'
+    SUFFIX = b'"}'
+    RAW_CHUNK = 3 * 64 * 1024
+
+    def __init__(self, source, size: int):
+        self.source = source
+        self.length = len(self.PREFIX) + 4 * ((size + 2) // 3) + len(self.SUFFIX)
+        self.seek(0)
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(self.RAW_CHUNK)
+            if not chunk:
+                return
+            yield chunk
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = 0):
+        if offset != 0 or whence != 0:
+            raise io.UnsupportedOperation('can only rewind to the start')
+        self.source.seek(0)
+        self._pos = 0
+        self._buffer = self.PREFIX
+        self._carry = b''
+        self._done = False
+
+    def read(self, n: int = -1) -> bytes:
+        while not self._done and (n < 0 or len(self._buffer) < n):
+            raw = self._carry + self.source.read(self.RAW_CHUNK)
+            if len(raw) == len(self._carry):
+                # End of file: flush the last partial group (with padding)
+                self._buffer += base64.b64encode(raw) + self.SUFFIX
+                self._done = True
+            else:
+                # Encode whole 3-byte groups only, so no padding lands mid-stream
+                cut = len(raw) - len(raw) % 3
+                self._buffer += base64.b64encode(raw[:cut])
+                self._carry = raw[cut:]
+        out = self._buffer if n < 0 else self._buffer[:n]
+        self._buffer = self._buffer[len(out):]
+        self._pos += len(out)
+        return out
+
+
+def create_blob(token: str, owner: str, repo: str, f: Dict) -> str:
+    """Create one blob and return its SHA (streaming files held in GridFS or a spooled upload)"""
+    url = f'/repos/{owner}/{repo}/git/blobs'
+    headers = { 'Content-Type': 'application/json' }
+    if f.get('assetId') is not None:
+        with DeployAsset.open(f['assetId']) as source:
+            blob = github_client.post(url, token, priority='critical', headers=headers, data=Base64JsonBody(source, f['size']))
+    elif f.get('stream') is not None:
+        blob = github_client.post(url, token, priority='critical', headers=headers, data=Base64JsonBody(f['stream'], f['size']))
+    else:
+        blob = github_client.post(
+            url, token, priority='critical',
+            json={ 'content': f.get('content', ''), 'encoding': f.get('encoding', 'utf-8') }
+        )
+    blob.raise_for_status()
+    return blob.json()['sha']
+
+
+def _with_waits(allowed: bool, fn):
+    """
+    fn, run under the submitting thread's no_wait() setting
+
+    no_wait() is thread-local, so pool threads would otherwise be allowed to
+    sleep on the rate limit even when the deploy step that started them isn't.
+    """
+    if allowed:
+        return fn
+
+    def run(*args, **kwargs):
+        with github_ratelimit.no_wait():
+            return fn(*args, **kwargs)
+    return run
+
+
+def create_blobs(token: str, owner: str, repo: str, files: List[Dict], max_workers: Optional[int] = None) -> Dict[str, str]:
+    """
+    Create blobs for all files concurrently
+
+    Args:
+        token: GitHub access token
+        owner: Repository owner
+        repo: Repository name
+        files: [{ path, content, encoding }]
+        max_workers: Upper bound on in-flight blob requests (default deploy.blob_upload_workers)
+
+    Returns:
+        Mapping of path -> blob SHA, in the order of files.
+        The first failure cancels uploads not yet started and is re-raised.
+    """
+    if max_workers is None:
+        max_workers = get_settings().deploy.blob_upload_workers
+    if len(files) <= 1 or max_workers <= 1:
+        return { f['path']: create_blob(token, owner, repo, f) for f in files }
+
+    upload = _with_waits(github_ratelimit.waits_allowed(), create_blob)
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(files)))
+    try:
+        futures = { executor.submit(upload, token, owner, repo, f): f['path'] for f in files }
+        done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in done:
+            if future.exception() is not None:
+                for p in pending:
+                    p.cancel()
+                raise future.exception()
+
+        shas = { path: future.result() for future, path in futures.items() }
+        return { f['path']: shas[f['path']] for f in files }
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def file_bytes(f: Dict) -> bytes:
+    """Raw bytes of a deploy file ({ content, encoding: 'utf-8' | 'base64' })"""
+    content = f.get('content', '')
+    if f.get('encoding', 'utf-8') == 'base64':
+        return base64.b64decode(content)
+    return content.encode('utf-8')
+
+
+def git_blob_sha(f: Dict) -> str:
+    """SHA-1 git would assign to this file's blob (precomputed for streamed files)"""
+    if f.get('sha'):
+        return f['sha']
+    data = file_bytes(f)
+    return hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()
+
+
+def stream_file(path: str, stream) -> Dict:
+    """
+    Deploy file backed by a seekable binary stream (e.g. a spooled upload)
+
+    Hashes it in one pass; create_blob later streams it from the start.
+    """
+    stream.seek(0, io.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    sha = hashlib.sha1(b'blob %d\0' % size)
+    for chunk in iter(lambda: stream.read(Base64JsonBody.RAW_CHUNK), b''):
+        sha.update(chunk)
+    stream.seek(0)
+    return { 'path': path, 'stream': stream, 'size': size, 'sha': sha.hexdigest(), 'encoding': 'base64' }
+
+
+def get_tree_shas(token: str, owner: str, repo: str, tree_sha: str) -> Dict[str, str]:
+    """Fetch a tree recursively in one call and return path -> blob SHA"""
+    res = github_client.cached_get(f'/repos/{owner}/{repo}/git/trees/{tree_sha}', token, priority='critical', params={ 'recursive': '1' })
+    res.raise_for_status()
+    # A truncated listing only means some unchanged files get re-uploaded
+    return { item['path']: item['sha'] for item in res.json().get('tree', []) if item.get('type') == 'blob' }
+
+
+def changed_files(files: List[Dict], tree_shas: Dict[str, str]) -> List[Dict]:
+    """Files whose content differs from (or is missing in) the current tree"""
+    return [f for f in files if tree_shas.get(f['path']) != git_blob_sha(f)]
+
+
+def can_inline(f: Dict, max_bytes: Optional[int] = None) -> bool:
+    """Whether a file can go inline in the tree request (small UTF-8 text only)"""
+    if max_bytes is None:
+        max_bytes = get_settings().deploy.inline_tree_max_bytes
+    if f.get('encoding', 'utf-8') != 'utf-8':
+        return False
+    return len(f.get('content', '').encode('utf-8')) <= max_bytes
+
+
+def build_tree_items(token: str, owner: str, repo: str, files: List[Dict], inline_max_bytes: Optional[int] = None) -> List[Dict]:
+    """
+    Build tree entries for files, inlining small text files
+
+    Large or binary files are uploaded as blobs (concurrently) and referenced
+    by SHA; everything else is sent as tree 'content', saving a POST per file.
+    """
+    if inline_max_bytes is None:
+        inline_max_bytes = get_settings().deploy.inline_tree_max_bytes
+    inline = [f for f in files if can_inline(f, inline_max_bytes)]
+    uploads = [f for f in files if not can_inline(f, inline_max_bytes)]
+    blob_shas = create_blobs(token, owner, repo, uploads) if uploads else {}
+
+    items = []
+    for f in files:
+        item = { 'path': f['path'], 'mode': '100644', 'type': 'blob' }
+        if f['path'] in blob_shas:
+            item['sha'] = blob_shas[f['path']]
+        else:
+            item['content'] = f.get('content', '')
+        items.append(item)
+    return items
+
+
+class DeployError(Exception):
+    """A deploy step failed in a way retrying won't fix"""
+
+
+def ensure_repo(token: str, owner: str, repo: str) -> Tuple[bool, str]:
+    """
+    Make sure owner/repo exists, creating it (with an initial commit) if not
+
+    Returns:
+        (created, default_branch) - created is True if the repository was just created
+    """
+    info = github_client.cached_get(f'/repos/{owner}/{repo}', token, priority='critical')
+    if info.status_code == 200:
+        return False, info.json().get('default_branch', 'main')
+    if info.status_code != 404:
+        info.raise_for_status()
+
+    create = github_client.post(
+        '/user/repos', token, priority='critical',
+        json={ 'name': repo, 'private': False, 'has_issues': False, 'has_wiki': False, 'auto_init': True }
+    )
+    if create.status_code == 422:
+        # Name taken - the repo may exist after all
+        info_retry = github_client.cached_get(f'/repos/{owner}/{repo}', token, priority='critical')
+        if info_retry.status_code == 200:
+            return False, info_retry.json().get('default_branch', 'main')
+        error_data = create.json()
+        error_msg = error_data.get('message', 'Repository name is invalid')
+        errors = error_data.get('errors')
+        if isinstance(errors, list) and len(errors) > 0:
+            error_msg = errors[0].get('message', error_msg)
+        raise DeployError(f'Repository creation failed: {error_msg}')
+    create.raise_for_status()
+    return True, create.json().get('default_branch', 'main')
+
+
+def enable_pages(token: str, owner: str, repo: str, branch: str, path: str) -> str:
+    """
+    Try once to enable GitHub Pages
+
+    Returns:
+        'enabled' (now or already), 'retry' (repo not ready yet) or 'failed'
+    """
+    pages = github_client.post(
+        f'/repos/{owner}/{repo}/pages', token, priority='critical',
+        json={ 'source': { 'branch': branch, 'path': path }, 'build_type': 'legacy' }
+    )
+    if pages.status_code in (201, 204, 409):
+        return 'enabled'
+    if pages.status_code == 404:
+        return 'retry'
+    if pages.status_code == 422:
+        # Validation failed - Pages may already be enabled
+        pages_check = github_client.cached_get(f'/repos/{owner}/{repo}/pages', token, priority='critical')
+        if pages_check.status_code == 200:
+            return 'enabled'
+    print(f"⚠️ Pages enable returned {pages.status_code}: {pages.text}")
+    return 'failed'
+
+
+def ensure_webhook(token: str, owner: str, repo: str, url: str, secret: str, events: List[str]) -> int | None:
+    """
+    Make sure owner/repo delivers events to our webhook receiver
+
+    Returns:
+        The hook id, or None if it couldn't be set up (status then comes from
+        the reconciler alone)
+    """
+    create = github_client.post(
+        f'/repos/{owner}/{repo}/hooks', token, priority='normal',
+        json={ 'name': 'web', 'active': True, 'events': events,
+               'config': { 'url': url, 'content_type': 'json', 'secret': secret, 'insecure_ssl': '0' } }
+    )
+    if create.status_code == 201:
+        return create.json().get('id')
+    if create.status_code == 422:
+        # Hook already exists on this repo
+        hooks = github_client.get(f'/repos/{owner}/{repo}/hooks', token, priority='normal')
+        if hooks.status_code == 200:
+            for hook in hooks.json():
+                if (hook.get('config') or {}).get('url') == url:
+                    return hook.get('id')
+    print(f"⚠️ Webhook setup returned {create.status_code} for {owner}/{repo}")
+    return None
+
+
+def pages_url(owner: str, repo: str, path: str = '/') -> str:
+    return f'https://{owner}.github.io/{repo}/' if path == '/' else f'https://{owner}.github.io/{repo}{path}'
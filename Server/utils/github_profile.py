@@ -0,0 +1,102 @@
+"""
+GitHub account profile (user + emails) for sign-in and linking
+
+Both calls go out concurrently over the shared client session, so a sign-in
+costs about one GitHub round trip. Profiles are cached per token for a short
+TTL: the OAuth flow signs in and then links with the same token, and the
+second step should not fetch /user again.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from utils import github_client
+
+PROFILE_TTL_SECONDS = 60
+PROFILE_CACHE_MAX_ENTRIES = 256
+
+_profiles: 'OrderedDict[str, tuple]' = OrderedDict()
+_lock = threading.Lock()
+
+_executor = None
+_executor_pid = None
+
+
+class GitHubProfileError(Exception):
+    """GitHub rejected the token or returned an unusable profile"""
+
+
+def _key(token: str) -> str:
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor, _executor_pid
+    pid = os.getpid()
+    with _lock:
+        if _executor is None or _executor_pid != pid:
+            _executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='github-profile')
+            _executor_pid = pid
+        return _executor
+
+
+def cached_profile(token: str) -> Optional[Dict]:
+    """Profile fetched for this token within the TTL, if any"""
+    key = _key(token)
+    with _lock:
+        entry = _profiles.get(key)
+        if entry is None:
+            return None
+        expires, profile = entry
+        if expires < time.monotonic():
+            del _profiles[key]
+            return None
+        _profiles.move_to_end(key)
+        return profile
+
+
+def invalidate(token: str):
+    with _lock:
+        _profiles.pop(_key(token), None)
+
+
+def fetch_profile(token: str) -> Dict:
+    """
+    The token's GitHub user and primary email
+
+    Returns:
+        { 'user': /user response, 'login', 'email': primary email or None }
+
+    Raises:
+        GitHubProfileError: if either call fails
+        requests.RequestException: on network errors
+    """
+    profile = cached_profile(token)
+    if profile is not None:
+        return profile
+
+    executor = _get_executor()
+    user_future = executor.submit(github_client.get, '/user', token)
+    emails_future = executor.submit(github_client.get, '/user/emails', token)
+    user_res, emails_res = user_future.result(), emails_future.result()
+
+    if not user_res.ok:
+        raise GitHubProfileError('Failed to get GitHub user info')
+    if not emails_res.ok:
+        raise GitHubProfileError('Failed to get GitHub user emails')
+
+    user = user_res.json()
+    profile = {
+        'user': user,
+        'login': user.get('login'),
+        'email': next((e['email'] for e in emails_res.json() if e.get('primary')), None)
+    }
+    with _lock:
+        _profiles[_key(token)] = (time.monotonic() + PROFILE_TTL_SECONDS, profile)
+        while len(_profiles) > PROFILE_CACHE_MAX_ENTRIES:
+            _profiles.popitem(last=False)
+    return profile
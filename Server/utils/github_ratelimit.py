@@ -0,0 +1,206 @@
+"""
+Per-token GitHub rate-limit budget tracking
+
+Every response's X-RateLimit-Remaining/Reset and Retry-After headers are
+recorded per token. Before a call, acquire() decides based on the call's
+priority:
+
+    critical    deploy steps; may wait for the budget to come back
+    normal      interactive calls; wait briefly, otherwise rejected
+    background  status polling; rejected once the budget drops into the
+                reserve kept for deploys
+
+Inside no_wait() (the deploy pipeline) nothing sleeps: a call that would
+have to wait raises RateLimitExceeded at once, and the caller reschedules.
+
+Waits and rejections are counted for /api/github/metrics.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from config.settings import get_settings
+
+# Longest a call may block waiting for budget, by priority (seconds); critical
+# calls wait up to github.rate_limit_max_wait. Background calls stop at
+# github.rate_limit_reserve, which is kept back for critical (deploy) traffic.
+MAX_WAIT = {
+    'critical': None,
+    'normal': 5.0,
+    'background': 0.0
+}
+
+PRIORITIES = tuple(MAX_WAIT)
+
+# Budgets tracked per process, least recently updated dropped first. One not
+# updated for a rate-limit window (GitHub's is an hour) has reset, so it is
+# dropped too rather than kept for a token that may never call again.
+MAX_TRACKED_TOKENS = 10000
+BUDGET_TTL_SECONDS = 3600
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a call can't be made within its priority's wait budget"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = max(0, int(retry_after + 0.999))
+
+
+_budgets: 'OrderedDict[str, Dict]' = OrderedDict()
+_lock = threading.Lock()
+_local = threading.local()
+
+_stats = {
+    'waits': 0,
+    'waitSeconds': 0.0,
+    'rejections': { p: 0 for p in PRIORITIES }
+}
+
+
+@contextmanager
+def no_wait():
+    """Raise RateLimitExceeded instead of waiting, for calls made by this thread in the block"""
+    previous = getattr(_local, 'no_wait', False)
+    _local.no_wait = True
+    try:
+        yield
+    finally:
+        _local.no_wait = previous
+
+
+def waits_allowed() -> bool:
+    """False inside no_wait()"""
+    return not getattr(_local, 'no_wait', False)
+
+
+def _key(token: Optional[str]) -> str:
+    return hashlib.sha256((token or '').encode('utf-8')).hexdigest()[:16]
+
+
+def _evict(now: float) -> None:
+    """Drop expired budgets, then the least recently updated beyond MAX_TRACKED_TOKENS (holding _lock)"""
+    while _budgets:
+        key, budget = next(iter(_budgets.items()))
+        if budget['updatedAt'] > now - BUDGET_TTL_SECONDS and len(_budgets) <= MAX_TRACKED_TOKENS:
+            break
+        del _budgets[key]
+
+
+def _get(token: Optional[str], now: float) -> Optional[Dict]:
+    """The token's budget, or None if untracked or expired (holding _lock)"""
+    budget = _budgets.get(_key(token))
+    if budget is not None and budget['updatedAt'] <= now - BUDGET_TTL_SECONDS:
+        return None
+    return budget
+
+
+def update(token: Optional[str], status_code: int, headers) -> None:
+    """Record rate-limit headers from a GitHub response"""
+    now = time.time()
+    with _lock:
+        key = _key(token)
+        budget = _budgets.setdefault(key, {'remaining': None, 'reset': 0.0, 'blockedUntil': 0.0})
+        budget['updatedAt'] = now
+        _budgets.move_to_end(key)
+        _evict(now)
+
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset = headers.get('X-RateLimit-Reset')
+        if remaining is not None and reset is not None:
+            try:
+                budget['remaining'] = int(remaining)
+                budget['reset'] = float(reset)
+            except ValueError:
+                pass
+
+        retry_after = headers.get('Retry-After')
+        if retry_after and status_code in (403, 429):
+            try:
+                budget['blockedUntil'] = max(budget['blockedUntil'], now + float(retry_after))
+            except ValueError:
+                pass
+
+
+def _delay(budget: Dict, priority: str, now: float) -> float:
+    """Seconds until this priority may call; 0 means go now"""
+    delay = max(0.0, budget['blockedUntil'] - now)
+
+    remaining = budget['remaining']
+    if remaining is not None and budget['reset'] > now:
+        floor = get_settings().github.rate_limit_reserve if priority == 'background' else 0
+        if remaining <= floor:
+            delay = max(delay, budget['reset'] - now)
+    return delay
+
+
+def _max_wait(priority: str) -> float:
+    if priority == 'critical':
+        return get_settings().github.rate_limit_max_wait
+    return MAX_WAIT.get(priority, 0.0)
+
+
+def acquire(token: Optional[str], priority: str = 'normal') -> None:
+    """
+    Wait until a call at this priority fits the token's budget
+
+    Raises:
+        RateLimitExceeded: if that would take longer than MAX_WAIT[priority],
+            or at all inside no_wait()
+    """
+    max_wait = _max_wait(priority) if waits_allowed() else 0.0
+    now = time.time()
+    with _lock:
+        budget = _get(token, now)
+        if budget is None:
+            return
+        delay = _delay(budget, priority, now)
+        if delay <= 0:
+            # Spend the call now so concurrent callers see it
+            if budget['remaining'] is not None:
+                budget['remaining'] -= 1
+            return
+        if delay > max_wait:
+            _stats['rejections'][priority] = _stats['rejections'].get(priority, 0) + 1
+            raise RateLimitExceeded(f'GitHub rate limit reached, retry in {int(delay)}s', delay)
+        _stats['waits'] += 1
+        _stats['waitSeconds'] += delay
+
+    time.sleep(delay)
+
+
+def ensure_budget(token: Optional[str], calls: int) -> None:
+    """
+    Reject a multi-call operation up front if the token can't afford it
+
+    Used before deploys so they don't stop partway through a push.
+    """
+    now = time.time()
+    with _lock:
+        budget = _get(token, now)
+        if budget is None:
+            return
+        if budget['blockedUntil'] > now:
+            _stats['rejections']['critical'] += 1
+            raise RateLimitExceeded('GitHub rate limit reached', budget['blockedUntil'] - now)
+        remaining = budget['remaining']
+        if remaining is not None and budget['reset'] > now and remaining < calls:
+            _stats['rejections']['critical'] += 1
+            raise RateLimitExceeded(
+                f'Not enough GitHub API budget for this deploy ({remaining} left, ~{calls} needed)',
+                budget['reset'] - now
+            )
+
+
+def get_stats() -> Dict:
+    with _lock:
+        _evict(time.time())
+        return {
+            'waits': _stats['waits'],
+            'waitSeconds': round(_stats['waitSeconds'], 1),
+            'rejections': dict(_stats['rejections']),
+            'trackedTokens': len(_budgets)
+        }
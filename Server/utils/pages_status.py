@@ -0,0 +1,197 @@
+"""
+GitHub Pages build status, pushed by webhooks
+
+A deploy's push starts a Pages build that finishes some time later. Rather
+than asking GitHub on every status poll, repos we deploy to send page_build
+and deployment_status webhooks to POST /api/github/webhook, which update the
+SiteDeployment record; status reads are local.
+
+A slow background reconciler covers missed deliveries (and runs on its own
+when webhooks aren't configured): it checks builds that have not reported an
+outcome, one claimed record at a time so several workers don't repeat calls.
+"""
+import hashlib
+import hmac
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+import requests
+
+from config.settings import get_settings
+from models.github_token import GitHubTokenStore
+from models.site_deployment import SiteDeployment, PAGES_BUILD_STATES
+from utils import github_client
+from utils.github_ratelimit import RateLimitExceeded
+
+# Repos get a hook for these events pointing at pages.webhook_url (the public
+# URL of the receiver) on deploy, signed with pages.webhook_secret
+WEBHOOK_EVENTS = ['page_build', 'deployment_status']
+
+# Builds that never report an outcome are given up on after this long
+RECONCILE_GIVE_UP_SECONDS = 24 * 3600
+
+# Most records checked per pass
+RECONCILE_BATCH = 50
+
+# deployment_status states (Pages built by Actions) as page_build states
+_DEPLOYMENT_STATES = {
+    'queued': 'queued', 'pending': 'building', 'in_progress': 'building',
+    'success': 'built', 'failure': 'errored', 'error': 'errored'
+}
+
+_reconciler = None
+_reconciler_pid = None
+_reconciler_lock = threading.Lock()
+
+
+def verify_signature(body: bytes, signature: Optional[str], secret: Optional[str] = None) -> bool:
+    """Check a delivery's X-Hub-Signature-256 header against the raw request body"""
+    secret = get_settings().pages.webhook_secret if secret is None else secret
+    if not secret or not signature or not signature.startswith('sha256='):
+        return False
+    expected = hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(signature[len('sha256='):], expected)
+
+
+def _parse_time(value: Optional[str]) -> datetime:
+    """GitHub timestamp as naive UTC (like the rest of the records)"""
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).astimezone(timezone.utc).replace(tzinfo=None)
+    except (AttributeError, ValueError):
+        return datetime.utcnow()
+
+
+def _build_fields(build: Dict) -> Dict:
+    fields = { 'commit': build.get('commit') }
+    error = (build.get('error') or {}).get('message')
+    if error:
+        fields['error'] = error
+    return fields
+
+
+def handle_event(event: str, payload: Dict) -> int:
+    """
+    Apply a verified webhook delivery
+
+    Returns:
+        Number of deployment records updated (0 for events we don't track)
+    """
+    repository = payload.get('repository') or {}
+    owner = (repository.get('owner') or {}).get('login')
+    repo = repository.get('name')
+    if not owner or not repo:
+        return 0
+
+    if event == 'page_build':
+        build = payload.get('build') or {}
+        if build.get('status') not in PAGES_BUILD_STATES:
+            return 0
+        return SiteDeployment.apply_pages_event(
+            owner, repo, build['status'], _parse_time(build.get('updated_at')), 'webhook', **_build_fields(build)
+        )
+
+    if event == 'deployment_status':
+        deployment = payload.get('deployment') or {}
+        deployment_status = payload.get('deployment_status') or {}
+        status = _DEPLOYMENT_STATES.get(deployment_status.get('state'))
+        if deployment.get('environment') != 'github-pages' or not status:
+            return 0
+        fields = { 'commit': deployment.get('sha') }
+        if deployment_status.get('environment_url'):
+            fields['htmlUrl'] = deployment_status['environment_url']
+        if status == 'errored':
+            fields['error'] = deployment_status.get('description') or 'Pages deployment failed'
+        return SiteDeployment.apply_pages_event(
+            owner, repo, status, _parse_time(deployment_status.get('updated_at')), 'webhook', **fields
+        )
+
+    return 0
+
+
+def check_build(doc: Dict) -> bool:
+    """
+    Ask GitHub how a record's latest Pages build went and store the answer
+
+    Returns:
+        True if the record was updated
+    """
+    token_doc = GitHubTokenStore.get_for_user(str(doc['userId']))
+    if not token_doc:
+        return False
+    token = token_doc['access_token']
+    owner, repo = doc['owner'], doc['repo']
+
+    res = github_client.cached_get(f'/repos/{owner}/{repo}/pages/builds/latest', token, priority='background')
+    if res.status_code == 404:
+        # Pages was turned off (or the repo deleted); nothing will ever build
+        return SiteDeployment.apply_pages_event(
+            owner, repo, 'errored', datetime.utcnow(), 'reconciler', error='GitHub Pages is not enabled for this repository'
+        ) > 0
+    if res.status_code != 200:
+        return False
+    build = res.json()
+    expected = (doc.get('pages') or {}).get('commit')
+    # Still reporting the previous build; ours hasn't been picked up yet
+    if build.get('status') not in PAGES_BUILD_STATES or (expected and build.get('commit') != expected):
+        return False
+
+    fields = _build_fields(build)
+    info = github_client.cached_get(f'/repos/{owner}/{repo}/pages', token, priority='background')
+    if info.status_code == 200:
+        fields['cname'] = info.json().get('cname')
+        fields['htmlUrl'] = info.json().get('html_url')
+    return SiteDeployment.apply_pages_event(
+        owner, repo, build['status'], _parse_time(build.get('updated_at')), 'reconciler', **fields
+    ) > 0
+
+
+def reconcile_once(limit: int = RECONCILE_BATCH) -> int:
+    """
+    Check unfinished builds that are due
+
+    A build is first checked once it has gone pages.reconcile_seconds without
+    a webhook delivery, then again at that interval until it finishes.
+
+    Returns:
+        Number of records updated
+    """
+    now = datetime.utcnow()
+    interval = timedelta(seconds=get_settings().pages.reconcile_seconds)
+    updated = 0
+    for _ in range(limit):
+        doc = SiteDeployment.claim_pages_check(
+            now - interval, now - interval, now - timedelta(seconds=RECONCILE_GIVE_UP_SECONDS)
+        )
+        if not doc:
+            break
+        try:
+            if check_build(doc):
+                updated += 1
+        except RateLimitExceeded:
+            break  # background budget is spent; try again next pass
+        except requests.RequestException as e:
+            print(f"⚠️ Pages status check failed for {doc['owner']}/{doc['repo']}: {e}")
+    return updated
+
+
+def _run():
+    while True:
+        time.sleep(get_settings().pages.reconcile_seconds)
+        try:
+            reconcile_once()
+        except Exception as e:
+            print(f"⚠️ Pages reconciler pass failed: {e}")
+
+
+def start_reconciler():
+    """Start the background reconciler for this worker process (no-op if running)"""
+    global _reconciler, _reconciler_pid
+    with _reconciler_lock:
+        if _reconciler is not None and _reconciler_pid == os.getpid():
+            return
+        _reconciler = threading.Thread(target=_run, name='pages-reconciler', daemon=True)
+        _reconciler_pid = os.getpid()
+        _reconciler.start()
@@ -0,0 +1,144 @@
+"""
+Compact deltas for portfolio revisions
+
+JSON Patch (RFC 6902 subset: add/remove/replace) for structured data and a
+line-based opcode delta for HTML.
+"""
+import copy
+import difflib
+from typing import Any, Dict, List
+
+
+def _escape(token: str) -> str:
+    return str(token).replace('~', '~0').replace('/', '~1')
+
+
+def _unescape(token: str) -> str:
+    return token.replace('~1', '/').replace('~0', '~')
+
+
+def json_diff(old: Any, new: Any, path: str = '') -> List[Dict]:
+    """
+    Build a JSON Patch that turns old into new
+
+    Args:
+        old: Previous JSON value
+        new: Updated JSON value
+        path: JSON Pointer prefix (used for recursion)
+
+    Returns:
+        List of patch operations
+    """
+    if old == new:
+        return []
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append({'op': 'remove', 'path': f"{path}/{_escape(key)}"})
+        for key, value in new.items():
+            child = f"{path}/{_escape(key)}"
+            if key not in old:
+                ops.append({'op': 'add', 'path': child, 'value': value})
+            else:
+                ops.extend(json_diff(old[key], value, child))
+        return ops
+
+    if isinstance(old, list) and isinstance(new, list):
+        ops = []
+        common = min(len(old), len(new))
+        for i in range(common):
+            ops.extend(json_diff(old[i], new[i], f"{path}/{i}"))
+        # Remove from the end so earlier indexes stay valid
+        for i in range(len(old) - 1, common - 1, -1):
+            ops.append({'op': 'remove', 'path': f"{path}/{i}"})
+        for i in range(common, len(new)):
+            ops.append({'op': 'add', 'path': f"{path}/{i}", 'value': new[i]})
+        return ops
+
+    return [{'op': 'replace', 'path': path, 'value': new}]
+
+
+def json_patch_apply(doc: Any, ops: List[Dict]) -> Any:
+    """
+    Apply a JSON Patch produced by json_diff
+
+    Args:
+        doc: JSON value to patch (not modified)
+        ops: Patch operations
+
+    Returns:
+        Patched JSON value
+    """
+    doc = copy.deepcopy(doc)
+
+    for op in ops:
+        if op['path'] == '':
+            doc = copy.deepcopy(op.get('value'))
+            continue
+
+        tokens = [_unescape(t) for t in op['path'].split('/')[1:]]
+        parent = doc
+        for token in tokens[:-1]:
+            parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+        last = tokens[-1]
+
+        if isinstance(parent, list):
+            index = int(last)
+            if op['op'] == 'add':
+                parent.insert(index, copy.deepcopy(op['value']))
+            elif op['op'] == 'remove':
+                del parent[index]
+            else:
+                parent[index] = copy.deepcopy(op['value'])
+        else:
+            if op['op'] == 'remove':
+                del parent[last]
+            else:
+                parent[last] = copy.deepcopy(op['value'])
+
+    return doc
+
+
+def text_diff(old: str, new: str) -> List:
+    """
+    Build a line-based delta that turns old into new
+
+    Returns:
+        Opcode list: ['=', n] keeps n lines, ['-', n] drops n lines,
+        ['+', [lines]] inserts lines
+    """
+    old_lines = (old or '').splitlines(keepends=True)
+    new_lines = (new or '').splitlines(keepends=True)
+    delta = []
+
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            delta.append(['=', i2 - i1])
+            continue
+        if tag in ('replace', 'delete'):
+            delta.append(['-', i2 - i1])
+        if tag in ('replace', 'insert'):
+            delta.append(['+', new_lines[j1:j2]])
+
+    return delta
+
+
+def text_patch_apply(old: str, delta: List) -> str:
+    """Apply a delta produced by text_diff"""
+    old_lines = (old or '').splitlines(keepends=True)
+    result = []
+    pos = 0
+
+    for op, arg in delta:
+        if op == '=':
+            result.extend(old_lines[pos:pos + arg])
+            pos += arg
+        elif op == '-':
+            pos += arg
+        else:
+            result.extend(arg)
+
+    return ''.join(result)
@@ -0,0 +1,211 @@
+"""
+Static-site build stage run before a deploy is pushed
+
+Minifies HTML and CSS, moves inline <style> blocks into one content-hashed
+stylesheet per distinct CSS (shared by every page that uses it), and can add
+precompressed .gz/.br variants. Generated portfolios are a single HTML file
+with a large inline stylesheet, so this mostly shrinks the push and lets
+browsers cache the CSS across pages and redeploys.
+
+GitHub Pages sends its own Cache-Control, so the long-lived caching of
+assets/ is declared in a _headers file for hosts/CDNs that honour it; the
+hashed file names make that safe.
+"""
+import base64
+import gzip
+import hashlib
+import posixpath
+import re
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from config.settings import get_settings
+
+ASSET_DIR = 'assets'
+
+# Files at least this big get .gz/.br variants when precompressing
+PRECOMPRESS_MIN_BYTES = 1024
+PRECOMPRESS_EXTENSIONS = ('.html', '.css', '.js', '.svg', '.json', '.txt')
+
+HEADERS_FILE = f"""/{ASSET_DIR}/*
+  Cache-Control: public, max-age=31536000, immutable
+"""
+
+_CSS_STRING = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'')
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+
+# Elements whose contents must be left byte-for-byte
+_HTML_RAW = re.compile(r'(<(pre|textarea|script|style)\b[^>]*>)(.*?)(</\2\s*>)', re.S | re.I)
+_HTML_COMMENT = re.compile(r'<!--(?!\[if).*?-->', re.S)
+_HTML_TAG = re.compile(r'<[A-Za-z][^\s/>]*(?:"[^"]*"|\'[^\']*\'|[^\'">])*>')
+_ATTR_VALUE_OR_SPACE = re.compile(r'("[^"]*"|\'[^\']*\')|\s+')
+# CSS that makes whitespace significant (pre, pre-wrap, pre-line, break-spaces)
+_CSS_PRE = re.compile(r'white-space\s*:\s*(?:pre|break-spaces)', re.I)
+_STYLE_BLOCK = re.compile(r'<style(\s+type\s*=\s*["\']?text/css["\']?)?\s*>(.*?)</style\s*>', re.S | re.I)
+
+
+def minify_css(css: str) -> str:
+    """Strip comments and insignificant whitespace (strings are left alone)"""
+    strings = []
+
+    def stash(m):
+        strings.append(m.group(0))
+        return f'\0{len(strings) - 1}\0'
+
+    css = _CSS_STRING.sub(stash, css)
+    css = _CSS_COMMENT.sub('', css)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    # Only after ':' - a space before it is a descendant combinator (a :hover)
+    css = re.sub(r':\s+', ':', css)
+    css = css.replace(';}', '}')
+    css = re.sub(r'\0(\d+)\0', lambda m: strings[int(m.group(1))], css)
+    return css.strip()
+
+
+def minify_html(html: str, collapse_whitespace: bool = True) -> str:
+    """
+    Drop comments and collapse whitespace outside pre/textarea/script/style
+    and attribute values; minify inline CSS
+
+    Whitespace is left as is when collapse_whitespace is False or the page's
+    CSS sets white-space: pre* on anything (it may apply to any element).
+    """
+    raw = []
+
+    def stash(m):
+        open_tag, tag, body, close_tag = m.groups()
+        if tag.lower() == 'style':
+            body = minify_css(body)
+        raw.append(open_tag + body + close_tag)
+        return f'\0{len(raw) - 1}\0'
+
+    def stash_tag(m):
+        # Collapse whitespace between attributes, never inside their values
+        raw.append(_ATTR_VALUE_OR_SPACE.sub(lambda t: t.group(1) or ' ', m.group(0)))
+        return f'\0{len(raw) - 1}\0'
+
+    collapse_whitespace = collapse_whitespace and not _CSS_PRE.search(html)
+    html = _HTML_RAW.sub(stash, html)
+    html = _HTML_COMMENT.sub('', html)
+    if collapse_whitespace:
+        html = _HTML_TAG.sub(stash_tag, html)
+        html = re.sub(r'\s+', ' ', html)
+    html = re.sub(r'\0(\d+)\0', lambda m: raw[int(m.group(1))], html)
+    return html.strip() if collapse_whitespace else html
+
+
+def extract_styles(html: str, page_path: str) -> Tuple[str, str | None]:
+    """
+    Move a page's plain <style> blocks into one stylesheet
+
+    Returns:
+        (html with a <link> in place of the first block, minified CSS or None)
+    """
+    blocks = [m.group(2) for m in _STYLE_BLOCK.finditer(html)]
+    if not blocks:
+        return html, None
+    css = minify_css('\n'.join(blocks))
+    placeholder = '\0stylesheet\0'
+    html = _STYLE_BLOCK.sub('', _STYLE_BLOCK.sub(placeholder, html, count=1))
+    return html, css
+
+
+def css_asset_path(css: str) -> str:
+    digest = hashlib.sha256(css.encode('utf-8')).hexdigest()[:12]
+    return f'{ASSET_DIR}/site.{digest}.css'
+
+
+def relative_href(from_page: str, target: str) -> str:
+    return posixpath.relpath(target, posixpath.dirname(from_page) or '.')
+
+
+def precompressed(f: Dict) -> List[Dict]:
+    """.gz (and .br, if brotli is installed) variants of a text file"""
+    data = f['content'].encode('utf-8') if f.get('encoding', 'utf-8') == 'utf-8' else base64.b64decode(f['content'])
+    variants = [(f"{f['path']}.gz", gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append((f"{f['path']}.br", brotli.compress(data)))
+    return [{ 'path': path, 'content': base64.b64encode(body).decode('ascii'), 'encoding': 'base64' }
+            for path, body in variants if len(body) < len(data)]
+
+
+def _size(f: Dict) -> int:
+    if f.get('encoding', 'utf-8') == 'base64':
+        return len(f['content']) * 3 // 4
+    return len(f['content'].encode('utf-8'))
+
+
+def build_site(files: List[Dict], precompress: Optional[bool] = None) -> Tuple[List[Dict], Dict]:
+    """
+    Run the build stage over a deploy's files
+
+    Args:
+        files: Deploy files ({ path, content, encoding? })
+        precompress: Add .gz/.br variants of text files (default deploy.precompress)
+
+    Returns:
+        (built files, report with byte counts before and after)
+    """
+    if precompress is None:
+        precompress = get_settings().deploy.precompress
+    built = []
+    stylesheets = {}
+
+    for f in files:
+        path = f['path']
+        if f.get('encoding', 'utf-8') != 'utf-8':
+            built.append(f)
+        elif path.endswith(('.html', '.htm')):
+            html, css = extract_styles(f['content'], path)
+            # The page's CSS is no longer inline here, so check the original
+            html = minify_html(html, collapse_whitespace=not _CSS_PRE.search(f['content']))
+            if css:
+                asset = css_asset_path(css)
+                stylesheets[asset] = css
+                html = html.replace('\0stylesheet\0', f'<link rel="stylesheet" href="{relative_href(path, asset)}">')
+            built.append({ **f, 'content': html })
+        elif path.endswith('.css'):
+            built.append({ **f, 'content': minify_css(f['content']) })
+        else:
+            built.append(f)
+
+    built.extend({ 'path': asset, 'content': css } for asset, css in sorted(stylesheets.items()))
+    if stylesheets and not any(f['path'] == '_headers' for f in built):
+        built.append({ 'path': '_headers', 'content': HEADERS_FILE })
+
+    if precompress:
+        built.extend(v for f in list(built)
+                     if f['path'].endswith(PRECOMPRESS_EXTENSIONS) and _size(f) >= PRECOMPRESS_MIN_BYTES
+                     for v in precompressed(f))
+
+    report = {
+        'files': len(built),
+        'bytesIn': sum(_size(f) for f in files),
+        'bytesOut': sum(_size(f) for f in built if not f['path'].endswith(('.gz', '.br'))),
+        'stylesheets': sorted(stylesheets)
+    }
+    return built, report
+
+
+def build_for_request(files: List[Dict], body: Dict, from_portfolio: bool) -> Tuple[List[Dict], Optional[Dict]]:
+    """
+    Run the build stage as a deploy request asks (shared by the deploy routes)
+
+    Args:
+        files: Deploy files
+        body: Request body; build (default: whether the files were generated
+            from a stored portfolio, client-supplied files are pushed as sent)
+            and precompress (default deploy.precompress)
+        from_portfolio: The files were generated from a stored portfolio
+
+    Returns:
+        (files to push, build report or None if not built)
+    """
+    if not body.get('build', from_portfolio):
+        return files, None
+    return build_site(files, precompress=body.get('precompress'))
@@ -0,0 +1,115 @@
+"""
+Server-side assembly of a portfolio's deploy files
+
+Builds the file set for GitHub Pages straight from the stored portfolio, so
+clients deploy by id instead of posting the HTML back:
+
+    index.html      the portfolio HTML, with large data: URIs moved to assets/
+    404.html        a not-found page using the portfolio's stylesheet
+    assets/*        images and fonts extracted from the HTML (content-hashed)
+    .nojekyll       serve files as-is, skipping Jekyll
+
+The result still goes through utils.site_build before it is pushed.
+"""
+import base64
+import hashlib
+import html as html_lib
+import re
+from typing import Dict, List, Tuple
+
+from utils.site_build import ASSET_DIR
+
+# data: URIs smaller than this stay inline (not worth a request)
+INLINE_ASSET_MAX_BYTES = 2048
+
+# Only src/href attributes: url() in inline CSS would resolve relative to the
+# extracted stylesheet instead of the page
+_DATA_URI = re.compile(r'(\b(?:src|href)\s*=\s*["\']?)data:(image/(?:png|jpeg|gif|webp|svg\+xml)|font/(?:woff2?|ttf|otf));base64,([A-Za-z0-9+/=]+)')
+_EXTENSIONS = {
+    'image/png': 'png', 'image/jpeg': 'jpg', 'image/gif': 'gif', 'image/webp': 'webp', 'image/svg+xml': 'svg',
+    'font/woff': 'woff', 'font/woff2': 'woff2', 'font/ttf': 'ttf', 'font/otf': 'otf'
+}
+_STYLE_BLOCK = re.compile(r'<style\b[^>]*>.*?</style\s*>', re.S | re.I)
+_TITLE = re.compile(r'<title>(.*?)</title>', re.S | re.I)
+
+
+def repo_name(portfolio_name: str) -> str:
+    """GitHub repository name for a portfolio"""
+    name = re.sub(r'[^a-z0-9._-]+', '-', portfolio_name.lower()).strip('-.')
+    return name or 'skillslate-portfolio'
+
+
+def extract_assets(html: str) -> Tuple[str, List[Dict]]:
+    """Move large base64 data: URIs in src/href attributes into asset files (paths relative to the site root)"""
+    assets = {}
+
+    def replace(m):
+        attr, mime, payload = m.groups()
+        if len(payload) * 3 // 4 < INLINE_ASSET_MAX_BYTES:
+            return m.group(0)
+        try:
+            data = base64.b64decode(payload, validate=True)
+        except ValueError:
+            return m.group(0)
+        path = f"{ASSET_DIR}/{hashlib.sha256(data).hexdigest()[:12]}.{_EXTENSIONS[mime]}"
+        assets[path] = payload
+        return attr + path
+
+    html = _DATA_URI.sub(replace, html)
+    files = [{ 'path': path, 'content': payload, 'encoding': 'base64' } for path, payload in sorted(assets.items())]
+    return html, files
+
+
+def not_found_page(index_html: str, title: str, base_href: str | None = None) -> str:
+    """
+    404 page reusing the portfolio's inline styles (so the build shares its stylesheet)
+
+    Pages serves it for any missing path, so relative links need base_href
+    (the site's root path, e.g. '/my-portfolio/') to resolve.
+    """
+    styles = '\n'.join(_STYLE_BLOCK.findall(index_html))
+    base = f'<base href="{html_lib.escape(base_href)}">\n' if base_href else ''
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+{base}<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>Page not found - {html_lib.escape(title)}</title>
+{styles}
+</head>
+<body>
+<main style="min-height:100vh;display:flex;flex-direction:column;align-items:center;justify-content:center;text-align:center">
+<h1>404</h1>
+<p>This page doesn't exist.</p>
+<p><a href="./">Back to {html_lib.escape(title)}</a></p>
+</main>
+</body>
+</html>
+"""
+
+
+def portfolio_files(portfolio: Dict, base_href: str | None = None) -> List[Dict]:
+    """
+    Deploy files for a stored portfolio
+
+    Args:
+        portfolio: Portfolio document
+        base_href: Root path the site is served from (for the 404 page)
+
+    Raises:
+        ValueError: if the portfolio has no generated HTML
+    """
+    html = portfolio.get('html') or portfolio.get('content')
+    if not html:
+        raise ValueError('Portfolio has no generated HTML to deploy')
+
+    title_match = _TITLE.search(html)
+    title = html_lib.unescape(title_match.group(1).strip()) if title_match else portfolio.get('name', 'Portfolio')
+
+    html, assets = extract_assets(html)
+    return [
+        { 'path': 'index.html', 'content': html },
+        { 'path': '404.html', 'content': not_found_page(html, title, base_href) },
+        *assets,
+        { 'path': '.nojekyll', 'content': '' }
+    ]
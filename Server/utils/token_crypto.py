@@ -0,0 +1,111 @@
+"""
+Encryption at rest for stored credentials (GitHub access tokens)
+
+Envelope encryption: tokens are encrypted with a data key, and the data key
+is stored in MongoDB encrypted with the master key (TOKEN_ENCRYPTION_KEY, a
+Fernet key). Each process unwraps a data key once and keeps it in memory, so
+encrypting or decrypting a token is local CPU work, not a KMS or DB call.
+
+The master key is validated with the other settings (config/settings.py) and
+handed over by create_app() through configure(). Without it (allowed in
+development only) tokens are stored in plaintext, as before.
+
+Generate a master key with:
+    python -c "from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())"
+"""
+import threading
+from typing import Dict, Tuple
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:
+    Fernet = None
+    InvalidToken = ValueError
+
+from models.data_key import DataKey
+
+# Set by configure() from Settings.token_encryption_key
+MASTER_KEY = ''
+
+# Name of the data key new tokens are encrypted with
+DATA_KEY_NAME = 'github_tokens'
+
+_keys: Dict[object, 'Fernet'] = {}
+_active_id = None
+_lock = threading.Lock()
+
+
+class TokenDecryptionError(Exception):
+    """A stored token can't be decrypted (missing or wrong master key)"""
+
+
+def configure(master_key: str):
+    """Use master_key (TOKEN_ENCRYPTION_KEY) from now on; forgets data keys unwrapped with another one"""
+    global MASTER_KEY, _active_id
+    with _lock:
+        if master_key != MASTER_KEY:
+            MASTER_KEY = master_key
+            _keys.clear()
+            _active_id = None
+
+
+def enabled() -> bool:
+    return Fernet is not None and bool(MASTER_KEY)
+
+
+def _unwrap(doc) -> 'Fernet':
+    try:
+        return Fernet(Fernet(MASTER_KEY.encode('ascii')).decrypt(bytes(doc['wrappedKey'])))
+    except InvalidToken:
+        raise TokenDecryptionError('Data key does not match TOKEN_ENCRYPTION_KEY')
+
+
+def new_wrapped_key() -> bytes:
+    """A new data key, encrypted with the master key (as stored in data_keys)"""
+    return Fernet(MASTER_KEY.encode('ascii')).encrypt(Fernet.generate_key())
+
+
+def _active_key() -> Tuple[object, 'Fernet']:
+    global _active_id
+    with _lock:
+        if _active_id is not None:
+            return _active_id, _keys[_active_id]
+        doc = DataKey.get_or_create(DATA_KEY_NAME, new_wrapped_key())
+        _keys[doc['_id']] = _unwrap(doc)
+        _active_id = doc['_id']
+        return _active_id, _keys[_active_id]
+
+
+def _key(key_id) -> 'Fernet':
+    with _lock:
+        key = _keys.get(key_id)
+    if key is None:
+        doc = DataKey.get(key_id)
+        if not doc:
+            raise TokenDecryptionError(f'Unknown data key {key_id}')
+        key = _unwrap(doc)
+        with _lock:
+            _keys[key_id] = key
+    return key
+
+
+def encrypt(plaintext: str) -> Tuple[bytes, object]:
+    """
+    Returns:
+        (ciphertext, data key id)
+    """
+    key_id, key = _active_key()
+    return key.encrypt(plaintext.encode('utf-8')), key_id
+
+
+def decrypt(ciphertext: bytes, key_id) -> str:
+    """
+    Raises:
+        TokenDecryptionError: if encryption isn't configured or the key is wrong
+    """
+    if not enabled():
+        raise TokenDecryptionError('Token is encrypted but TOKEN_ENCRYPTION_KEY is not set')
+    try:
+        return _key(key_id).decrypt(bytes(ciphertext)).decode('utf-8')
+    except InvalidToken:
+        raise TokenDecryptionError('Token does not match its data key')
@@ -1,9 +1,9 @@
 import re
 import jwt
-import os
 from datetime import datetime
 from functools import wraps
 from flask import request, jsonify
+from config.settings import get_settings
 
 def validate_email(email):
     """Validate email format"""
@@ -90,8 +90,7 @@ def validate_auth_token(f):
         
         try:
             # Decode the token
-            secret_key = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
-            data = jwt.decode(token, secret_key, algorithms=['HS256'])
+            data = jwt.decode(token, get_settings().secret_key, algorithms=['HS256'])
             
             # Add current user info to kwargs
             kwargs['current_user'] = data
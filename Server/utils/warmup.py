@@ -0,0 +1,132 @@
+"""
+Worker warm-up
+
+Opens the connections and loads the libraries the first requests of a new
+worker would otherwise pay for: MongoDB pool connections, the OpenAI client
+(and its TLS connection), the shared GitHub session, and the resume parsers.
+gunicorn runs it in post_fork before the worker accepts requests; the
+development servers run it at startup. /api/ready answers 503 until it has
+finished in the worker serving the probe.
+
+Steps are chosen with WARMUP_STEPS (comma-separated, default all; empty
+turns warm-up off). A failed step is logged and reported, not fatal: the
+request that needs it will retry the work.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from config.database import db_instance
+from config.settings import get_settings
+from utils import ai_service, document_parser, github_client
+
+# warmup.mongo_connections is the number of pool connections opened ahead of
+# time; warmup.timeout_seconds bounds each network step, so a slow dependency
+# can't hold a worker's boot past gunicorn's timeout
+
+_state = { 'ready': False, 'pid': None, 'steps': {}, 'durationMs': None }
+_lock = threading.Lock()
+
+
+def _warm_mongo():
+    """Ping from several threads at once so each opens its own pool connection"""
+    n = max(1, get_settings().warmup.mongo_connections)
+    barrier = threading.Barrier(n)
+
+    def ping(_):
+        barrier.wait(timeout=get_settings().warmup.timeout_seconds)
+        db_instance.client.admin.command('ping')
+
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        list(pool.map(ping, range(n)))
+    return f'{n} connections'
+
+
+def _warm_openai():
+    if not os.getenv('OPENAI_API_KEY'):
+        return 'skipped (OPENAI_API_KEY not set)'
+    client = ai_service.get_client()
+    # Free call; leaves a TLS connection in the client's pool
+    client.with_options(timeout=get_settings().warmup.timeout_seconds, max_retries=0).models.list()
+    return 'client ready'
+
+
+def _warm_github():
+    # /rate_limit doesn't count against the rate limit
+    res = github_client.get('/rate_limit', priority='background', timeout=get_settings().warmup.timeout_seconds)
+    return f'HTTP {res.status_code}'
+
+
+def _warm_parsers():
+    return ', '.join(document_parser.load_backends()) or 'none installed'
+
+
+_STEP_FUNCS = {
+    'mongo': _warm_mongo,
+    'openai': _warm_openai,
+    'github': _warm_github,
+    'parsers': _warm_parsers
+}
+
+
+def _run_step(name: str):
+    start = time.perf_counter()
+    try:
+        detail, ok = _STEP_FUNCS[name](), True
+    except Exception as e:
+        detail, ok = str(e), False
+        print(f"⚠️ Warm-up step {name} failed: {e}")
+    return name, { 'ok': ok, 'detail': detail, 'ms': round((time.perf_counter() - start) * 1000, 1) }
+
+
+def run(steps: Optional[List[str]] = None) -> Dict:
+    """
+    Run the warm-up steps (concurrently) and mark this process ready
+
+    Args:
+        steps: Step names (defaults to warmup.steps)
+
+    Returns:
+        status()
+    """
+    steps = get_settings().warmup.steps if steps is None else steps
+    unknown = [s for s in steps if s not in _STEP_FUNCS]
+    if unknown:
+        print(f"⚠️ Unknown warm-up steps ignored: {', '.join(unknown)}")
+    steps = [s for s in steps if s in _STEP_FUNCS]
+
+    start = time.perf_counter()
+    results = {}
+    if steps:
+        with ThreadPoolExecutor(max_workers=len(steps)) as pool:
+            results = dict(pool.map(_run_step, steps))
+
+    with _lock:
+        _state.update({
+            'ready': True,
+            'pid': os.getpid(),
+            'steps': results,
+            'durationMs': round((time.perf_counter() - start) * 1000, 1)
+        })
+    if steps:
+        print(f"🔥 Worker {os.getpid()} warmed up in {_state['durationMs']} ms")
+    return status()
+
+
+def start():
+    """Run warm-up in a background thread (for servers that shouldn't wait for it)"""
+    threading.Thread(target=run, name='warmup', daemon=True).start()
+
+
+def status() -> Dict:
+    """Warm-up state of this process (ready is False until run() finished here)"""
+    with _lock:
+        ready = _state['ready'] and _state['pid'] == os.getpid()
+        return {
+            'ready': ready,
+            'pid': os.getpid(),
+            'durationMs': _state['durationMs'] if ready else None,
+            'steps': dict(_state['steps']) if ready else {}
+        }
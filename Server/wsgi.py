@@ -0,0 +1,41 @@
+"""
+WSGI entry point for production servers
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The app is built at import (settings are validated here, so a bad config
+stops the master before any worker forks). Database connections are not
+fork-safe, so each worker opens its own in init_worker() (gunicorn.conf.py
+calls it from post_fork), then warms up before taking requests.
+"""
+from app import create_app, db_instance
+from models.indexes import ensure_indexes
+from utils.deploy_pipeline import resume_jobs, start_sweeper
+from utils.pages_status import start_reconciler
+from utils import warmup
+
+app = create_app()
+
+
+def prepare_database() -> bool:
+    """One-off startup work in the master: create indexes, then drop the connection before forking"""
+    if not db_instance.connect():
+        return False
+    try:
+        ensure_indexes()
+    finally:
+        db_instance.disconnect()
+    return True
+
+
+def init_worker() -> bool:
+    """Per-worker startup: connect, resume interrupted deploys, start background checks, warm up"""
+    if not db_instance.connect():
+        return False
+    # Safe in every worker: jobs are leased, so each runs on one worker only
+    resume_jobs()
+    start_sweeper()
+    start_reconciler()
+    # Before the worker accepts requests, so none of them hits a cold dependency
+    warmup.run()
+    return True